@@ -0,0 +1,83 @@
+"""Add knowledge content hash and LSH bucket table
+
+Revision ID: 3b7c9a1d52e4
+Revises: f0df713de8d8
+Create Date: 2026-10-19 14:37:05.220941
+
+"""
+import hashlib
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b7c9a1d52e4'
+down_revision: Union[str, None] = 'f0df713de8d8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH_SIZE = 5000
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("knowledgeitem", sa.Column("content_hash", sa.String(64), nullable=True))
+
+    op.create_table(
+        "knowledge_lsh_bucket",
+        sa.Column("bucket", sa.BigInteger, primary_key=True),
+        sa.Column(
+            "knowledge_id", sa.Integer,
+            sa.ForeignKey("knowledgeitem.id", ondelete="CASCADE"), primary_key=True
+        ),
+    )
+    op.create_index("ix_knowledge_lsh_bucket_knowledge_id", "knowledge_lsh_bucket", ["knowledge_id"])
+
+    # Backfill content hashes in id-ordered batches. Existing duplicates keep
+    # their rows; only the oldest copy gets the hash, so the index can be unique.
+    # LSH buckets are filled by the application on startup.
+    bind = op.get_bind()
+    items = sa.table(
+        "knowledgeitem",
+        sa.column("id", sa.Integer),
+        sa.column("content", sa.String),
+        sa.column("content_hash", sa.String),
+    )
+    seen = set()
+    last_id = 0
+    while True:
+        batch = bind.execute(
+            sa.select(items.c.id, items.c.content)
+            .where(items.c.id > last_id)
+            .order_by(items.c.id)
+            .limit(BACKFILL_BATCH_SIZE)
+        ).fetchall()
+        if not batch:
+            break
+        updates = []
+        for item_id, content in batch:
+            digest = hashlib.sha256(" ".join((content or "").split()).encode("utf-8")).hexdigest()
+            if digest not in seen:
+                seen.add(digest)
+                updates.append({"item_id": item_id, "digest": digest})
+        if updates:
+            bind.execute(
+                items.update()
+                .where(items.c.id == sa.bindparam("item_id"))
+                .values(content_hash=sa.bindparam("digest")),
+                updates
+            )
+        last_id = batch[-1][0]
+
+    op.create_index("ix_knowledgeitem_content_hash", "knowledgeitem", ["content_hash"], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_knowledgeitem_content_hash", table_name="knowledgeitem")
+    op.drop_index("ix_knowledge_lsh_bucket_knowledge_id", table_name="knowledge_lsh_bucket")
+    op.drop_table("knowledge_lsh_bucket")
+    with op.batch_alter_table("knowledgeitem") as batch_op:
+        batch_op.drop_column("content_hash")
@@ -0,0 +1,75 @@
+"""Add full-text index over knowledge item contents
+
+Revision ID: 8d2f61c4a0b7
+Revises: 3b7c9a1d52e4
+Create Date: 2026-10-19 16:05:18.734052
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d2f61c4a0b7'
+down_revision: Union[str, None] = '3b7c9a1d52e4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _upgrade_sqlite() -> None:
+    # External-content FTS5 table: the text lives only in knowledgeitem
+    op.execute(
+        "CREATE VIRTUAL TABLE knowledge_fts USING fts5("
+        "content, content='knowledgeitem', content_rowid='id', tokenize='unicode61')"
+    )
+    op.execute(
+        "CREATE TRIGGER knowledge_fts_insert AFTER INSERT ON knowledgeitem BEGIN "
+        "INSERT INTO knowledge_fts(rowid, content) VALUES (new.id, new.content); "
+        "END"
+    )
+    op.execute(
+        "CREATE TRIGGER knowledge_fts_delete AFTER DELETE ON knowledgeitem BEGIN "
+        "INSERT INTO knowledge_fts(knowledge_fts, rowid, content) VALUES ('delete', old.id, old.content); "
+        "END"
+    )
+    op.execute(
+        "CREATE TRIGGER knowledge_fts_update AFTER UPDATE OF content ON knowledgeitem BEGIN "
+        "INSERT INTO knowledge_fts(knowledge_fts, rowid, content) VALUES ('delete', old.id, old.content); "
+        "INSERT INTO knowledge_fts(rowid, content) VALUES (new.id, new.content); "
+        "END"
+    )
+    op.execute("INSERT INTO knowledge_fts(knowledge_fts) VALUES ('rebuild')")
+
+
+def _upgrade_postgresql() -> None:
+    # 'simple' skips stemming and stopwords, so error messages and keys match as written
+    op.execute("ALTER TABLE knowledgeitem ADD COLUMN content_tsv tsvector")
+    op.execute(
+        "CREATE TRIGGER knowledge_tsv_update BEFORE INSERT OR UPDATE OF content ON knowledgeitem "
+        "FOR EACH ROW EXECUTE FUNCTION tsvector_update_trigger(content_tsv, 'pg_catalog.simple', content)"
+    )
+    op.execute("UPDATE knowledgeitem SET content_tsv = to_tsvector('pg_catalog.simple', content)")
+    op.execute("CREATE INDEX ix_knowledgeitem_content_tsv ON knowledgeitem USING gin (content_tsv)")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    dialect = op.get_bind().dialect.name
+    if dialect == "sqlite":
+        _upgrade_sqlite()
+    elif dialect == "postgresql":
+        _upgrade_postgresql()
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    dialect = op.get_bind().dialect.name
+    if dialect == "sqlite":
+        for trigger in ("knowledge_fts_insert", "knowledge_fts_delete", "knowledge_fts_update"):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS knowledge_fts")
+    elif dialect == "postgresql":
+        op.execute("DROP INDEX IF EXISTS ix_knowledgeitem_content_tsv")
+        op.execute("DROP TRIGGER IF EXISTS knowledge_tsv_update ON knowledgeitem")
+        op.execute("ALTER TABLE knowledgeitem DROP COLUMN IF EXISTS content_tsv")
@@ -0,0 +1,128 @@
+"""Add normalized knowledge tag tables
+
+Revision ID: f0df713de8d8
+Revises: 596ae28e39ad
+Create Date: 2026-10-19 10:12:41.508113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.models.knowledge import normalize_tags
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f0df713de8d8'
+down_revision: Union[str, None] = '596ae28e39ad'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH_SIZE = 5000
+
+
+def _create_knowledge_tables() -> None:
+    """Create the knowledge tables on databases that predate migrations for them."""
+    op.create_table(
+        "knowledgeitem",
+        sa.Column("id", sa.Integer, primary_key=True, index=True),
+        sa.Column("content", sa.String(4000), nullable=False),
+        sa.Column("type", sa.String(50), nullable=False, index=True),
+        sa.Column("subtype", sa.String(100), nullable=True, index=True),
+        sa.Column("source_type", sa.String(50), nullable=False, index=True),
+        sa.Column("source_identifier", sa.String(255), nullable=False, index=True),
+        sa.Column("source_url", sa.String(1000), nullable=True),
+        sa.Column("source_author", sa.String(255), nullable=True, index=True),
+        sa.Column("source_timestamp", sa.DateTime, nullable=True, index=True),
+        sa.Column("confidence", sa.Float, default=1.0, index=True),
+        sa.Column("is_validated", sa.Boolean, default=False, index=True),
+        sa.Column("embedding_id", sa.String(255), nullable=True, index=True),
+        sa.Column("tags", sa.JSON, nullable=True),
+        sa.Column("item_metadata", sa.JSON, nullable=True),
+        sa.Column("created_at", sa.DateTime, nullable=False),
+        sa.Column("updated_at", sa.DateTime, nullable=False),
+    )
+
+    op.create_table(
+        "knowledge_relation",
+        sa.Column("source_id", sa.Integer, sa.ForeignKey("knowledgeitem.id"), primary_key=True),
+        sa.Column("target_id", sa.Integer, sa.ForeignKey("knowledgeitem.id"), primary_key=True),
+        sa.Column("relation_type", sa.String(255), nullable=False),
+        sa.Column("confidence", sa.Float, default=1.0),
+        sa.Column("metadata_json", sa.JSON, nullable=True),
+        sa.Column("created_at", sa.DateTime, nullable=True),
+    )
+
+    op.create_table(
+        "entity_knowledge",
+        sa.Column("entity_id", sa.String(255), primary_key=True),
+        sa.Column("entity_type", sa.String(50), primary_key=True),
+        sa.Column("knowledge_id", sa.Integer, sa.ForeignKey("knowledgeitem.id"), primary_key=True),
+        sa.Column("relation_type", sa.String(255), nullable=False),
+        sa.Column("created_at", sa.DateTime, nullable=True),
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    if not sa.inspect(bind).has_table("knowledgeitem"):
+        _create_knowledge_tables()
+
+    op.create_table(
+        "knowledge_tag",
+        sa.Column("tag", sa.String(255), primary_key=True),
+        sa.Column(
+            "knowledge_id", sa.Integer,
+            sa.ForeignKey("knowledgeitem.id", ondelete="CASCADE"), primary_key=True
+        ),
+    )
+    op.create_index("ix_knowledge_tag_knowledge_id", "knowledge_tag", ["knowledge_id"])
+
+    op.create_table(
+        "knowledge_tag_count",
+        sa.Column("tag", sa.String(255), primary_key=True),
+        sa.Column("item_count", sa.Integer, nullable=False, server_default="0"),
+    )
+    op.create_index("ix_knowledge_tag_count_item_count", "knowledge_tag_count", ["item_count"])
+
+    # Backfill from the JSON tags column in id-ordered batches
+    items = sa.table("knowledgeitem", sa.column("id", sa.Integer), sa.column("tags", sa.JSON))
+    knowledge_tag = sa.table("knowledge_tag", sa.column("tag", sa.String), sa.column("knowledge_id", sa.Integer))
+    last_id = 0
+    while True:
+        batch = bind.execute(
+            sa.select(items.c.id, items.c.tags)
+            .where(items.c.id > last_id)
+            .order_by(items.c.id)
+            .limit(BACKFILL_BATCH_SIZE)
+        ).fetchall()
+        if not batch:
+            break
+        normalized = {item_id: normalize_tags(tags) for item_id, tags in batch if isinstance(tags, list)}
+        rows = [
+            {"tag": tag, "knowledge_id": item_id}
+            for item_id, tags in normalized.items()
+            for tag in tags
+        ]
+        if rows:
+            bind.execute(knowledge_tag.insert(), rows)
+        # Keep the JSON column in step with the tag rows backfilled from it
+        for item_id, tags in batch:
+            if item_id in normalized and normalized[item_id] != tags:
+                bind.execute(items.update().where(items.c.id == item_id).values(tags=normalized[item_id]))
+        last_id = batch[-1][0]
+
+    op.execute(
+        "INSERT INTO knowledge_tag_count (tag, item_count) "
+        "SELECT tag, COUNT(*) FROM knowledge_tag GROUP BY tag"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_knowledge_tag_count_item_count", table_name="knowledge_tag_count")
+    op.drop_table("knowledge_tag_count")
+    op.drop_index("ix_knowledge_tag_knowledge_id", table_name="knowledge_tag")
+    op.drop_table("knowledge_tag")
@@ -0,0 +1,334 @@
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+from ..config import get_settings
+from .monitoring import CACHE_HITS, CACHE_MISSES, CACHE_BYTES
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# (st_mtime_ns, st_size) of the file an entry was derived from
+Fingerprint = Tuple[int, int]
+
+_MISS = object()
+
+
+def _estimate_size(value: Any) -> int:
+    """
+    Rough in-memory size of a cached value, without serializing it
+    """
+    if isinstance(value, (str, bytes)):
+        return len(value) + 64
+    if isinstance(value, BaseModel):
+        return _estimate_size(value.__dict__)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_estimate_size(item) for item in value.items())
+    if isinstance(value, (list, tuple, set)):
+        return sys.getsizeof(value) + sum(_estimate_size(item) for item in value)
+    return sys.getsizeof(value)
+
+
+def file_fingerprint(path: str) -> Optional[Fingerprint]:
+    """
+    Stat-based fingerprint used to validate file-backed entries
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class _LRUTier:
+    """
+    In-process LRU of plain objects, bounded by the estimated size of its values
+    """
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        # Map of full key -> (value, expires_at, size, fingerprint)
+        self.entries: "OrderedDict[str, Tuple[Any, float, int, Optional[Fingerprint]]]" = OrderedDict()
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Tuple[Any, Optional[Fingerprint]]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return _MISS, None
+            value, expires_at, _, fingerprint = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                return _MISS, None
+            self.entries.move_to_end(key)
+            return value, fingerprint
+
+    def set(self, key: str, value: Any, ttl: float, size: int, fingerprint: Optional[Fingerprint]) -> None:
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (value, time.monotonic() + ttl, size, fingerprint)
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+            CACHE_BYTES.set(self.total_bytes)
+
+    def delete(self, key: str) -> None:
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+                CACHE_BYTES.set(self.total_bytes)
+
+    def _remove(self, key: str) -> None:
+        _, _, size, _ = self.entries.pop(key)
+        self.total_bytes -= size
+
+
+class CacheManager:
+    """
+    Two-tier cache: an in-process LRU bounded by bytes, backed by an optional Redis tier.
+
+    Entries live in namespaces with their own TTLs. File-backed entries carry
+    the source file's mtime/size fingerprint and are treated as misses once the
+    file changes, so cached file contents never go stale.
+
+    Redis values are JSON, never pickles, so whoever can write to Redis cannot
+    run code here. Values must be JSON-serializable unless their namespace has
+    a type registered with ``register_type``, which (de)serializes them through
+    pydantic; values that cannot be encoded stay in the in-process tier only.
+    """
+    def __init__(
+        self,
+        max_bytes: int,
+        default_ttl: float,
+        namespace_ttls: Optional[Dict[str, float]] = None,
+        redis_client: Optional[Any] = None,
+        key_prefix: str = "a-ui",
+        namespace_types: Optional[Dict[str, Any]] = None
+    ):
+        self.memory = _LRUTier(max_bytes)
+        self.default_ttl = default_ttl
+        self.namespace_ttls = dict(namespace_ttls or {})
+        self.redis = redis_client
+        self.key_prefix = key_prefix
+        # Map of namespace -> pydantic adapter for values stored in Redis
+        self.adapters: Dict[str, TypeAdapter] = {}
+        for namespace, value_type in (namespace_types or {}).items():
+            self.register_type(namespace, value_type)
+        # Map of namespace -> [hits, misses] for hit-ratio reporting
+        self.counts: Dict[str, List[int]] = {}
+
+    def _key(self, namespace: str, key: str) -> str:
+        return f"{self.key_prefix}:{namespace}:{key}"
+
+    def register_type(self, namespace: str, value_type: Any) -> None:
+        """
+        Declare the type of values in a namespace, e.g. ``List[CodeChunk]``
+        """
+        self.adapters[namespace] = TypeAdapter(value_type)
+
+    def _encode(self, namespace: str, value: Any, fingerprint: Optional[Fingerprint]) -> Optional[bytes]:
+        adapter = self.adapters.get(namespace)
+        try:
+            data = adapter.dump_python(value, mode="json") if adapter else value
+            return json.dumps({"fingerprint": fingerprint, "value": data}).encode("utf-8")
+        except (TypeError, ValueError) as e:
+            logger.debug(f"Not caching {namespace} value in Redis: {e}")
+            return None
+
+    def _decode(self, namespace: str, blob: bytes) -> Tuple[Any, Optional[Fingerprint]]:
+        """
+        Decode a Redis value; anything malformed is treated as a miss
+        """
+        try:
+            entry = json.loads(blob)
+            fingerprint = tuple(entry["fingerprint"]) if entry["fingerprint"] is not None else None
+            adapter = self.adapters.get(namespace)
+            value = adapter.validate_python(entry["value"]) if adapter else entry["value"]
+        except (ValueError, TypeError, KeyError, ValidationError) as e:
+            logger.warning(f"Ignoring unreadable {namespace} entry in Redis: {e}")
+            return _MISS, None
+        return value, fingerprint
+
+    def ttl_for(self, namespace: str) -> float:
+        """
+        TTL in seconds for entries in a namespace
+        """
+        return self.namespace_ttls.get(namespace, self.default_ttl)
+
+    def _record(self, namespace: str, hit: bool, tier: str = "memory") -> None:
+        counts = self.counts.setdefault(namespace, [0, 0])
+        if hit:
+            counts[0] += 1
+            CACHE_HITS.labels(namespace=namespace, tier=tier).inc()
+        else:
+            counts[1] += 1
+            CACHE_MISSES.labels(namespace=namespace).inc()
+
+    async def get(self, key: str, namespace: str = "default", path: Optional[str] = None) -> Any:
+        """
+        Get a value, or None on a miss. Pass ``path`` to validate a file-backed entry
+        """
+        values = await self.get_many([key], namespace=namespace, paths={key: path} if path else None)
+        return values.get(key)
+
+    async def get_many(
+        self,
+        keys: Iterable[str],
+        namespace: str = "default",
+        paths: Optional[Dict[str, str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Batch get; returns only the keys that hit. ``paths`` maps keys to the
+        files they were derived from, for fingerprint validation
+        """
+        paths = paths or {}
+        results: Dict[str, Any] = {}
+        fingerprints = {key: file_fingerprint(path) for key, path in paths.items()}
+        remote_keys = []
+
+        for key in keys:
+            full_key = self._key(namespace, key)
+            value, fingerprint = self.memory.get(full_key)
+            if value is not _MISS and (key not in paths or fingerprint == fingerprints[key]):
+                results[key] = value
+                self._record(namespace, True)
+            elif self.redis is not None:
+                remote_keys.append(key)
+            else:
+                self._record(namespace, False)
+
+        if remote_keys:
+            try:
+                blobs = await self.redis.mget([self._key(namespace, key) for key in remote_keys])
+            except Exception as e:
+                logger.warning(f"Redis cache read failed: {e}")
+                blobs = [None] * len(remote_keys)
+
+            for key, blob in zip(remote_keys, blobs):
+                if blob is not None:
+                    value, fingerprint = self._decode(namespace, blob)
+                    if value is not _MISS and (key not in paths or fingerprint == fingerprints[key]):
+                        # Promote to the in-process tier
+                        self.memory.set(
+                            self._key(namespace, key), value, self.ttl_for(namespace),
+                            _estimate_size(value), fingerprint
+                        )
+                        results[key] = value
+                        self._record(namespace, True, tier="redis")
+                        continue
+                self._record(namespace, False)
+
+        return results
+
+    async def set(
+        self,
+        key: str,
+        value: Any,
+        namespace: str = "default",
+        ttl: Optional[float] = None,
+        path: Optional[str] = None
+    ) -> None:
+        """
+        Store a value. Pass ``path`` to tie the entry to a file's current mtime/size
+        """
+        await self.set_many({key: value}, namespace=namespace, ttl=ttl, paths={key: path} if path else None)
+
+    async def set_many(
+        self,
+        values: Dict[str, Any],
+        namespace: str = "default",
+        ttl: Optional[float] = None,
+        paths: Optional[Dict[str, str]] = None
+    ) -> None:
+        """
+        Batch set into both tiers
+        """
+        paths = paths or {}
+        ttl = ttl if ttl is not None else self.ttl_for(namespace)
+        blobs = {}
+
+        for key, value in values.items():
+            fingerprint = file_fingerprint(paths[key]) if key in paths else None
+            self.memory.set(self._key(namespace, key), value, ttl, _estimate_size(value), fingerprint)
+            if self.redis is not None:
+                blob = self._encode(namespace, value, fingerprint)
+                if blob is not None:
+                    blobs[self._key(namespace, key)] = blob
+
+        if self.redis is not None and blobs:
+            try:
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    for full_key, blob in blobs.items():
+                        pipe.set(full_key, blob, ex=max(1, int(ttl)))
+                    await pipe.execute()
+            except Exception as e:
+                logger.warning(f"Redis cache write failed: {e}")
+
+    async def delete(self, key: str, namespace: str = "default") -> None:
+        """
+        Remove a value from both tiers
+        """
+        full_key = self._key(namespace, key)
+        self.memory.delete(full_key)
+        if self.redis is not None:
+            try:
+                await self.redis.delete(full_key)
+            except Exception as e:
+                logger.warning(f"Redis cache delete failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Hit ratio per namespace plus in-process tier usage
+        """
+        return {
+            "memory_bytes": self.memory.total_bytes,
+            "memory_entries": len(self.memory.entries),
+            "namespaces": {
+                namespace: {
+                    "hits": hits,
+                    "misses": misses,
+                    "hit_ratio": hits / (hits + misses) if hits + misses else 0.0,
+                }
+                for namespace, (hits, misses) in self.counts.items()
+            },
+        }
+
+
+def _create_redis_client() -> Optional[Any]:
+    """
+    Create the Redis tier client if enabled and available
+    """
+    if not settings.CACHE_REDIS_ENABLED:
+        return None
+    try:
+        import redis.asyncio as redis
+    except ImportError:
+        logger.warning("CACHE_REDIS_ENABLED is set but the redis package is not installed")
+        return None
+    return redis.from_url(settings.REDIS_URL)
+
+
+# Global cache manager instance
+cache_manager = CacheManager(
+    max_bytes=settings.CACHE_MAX_BYTES,
+    default_ttl=settings.CACHE_DEFAULT_TTL_SECONDS,
+    namespace_ttls=settings.CACHE_NAMESPACE_TTLS,
+    redis_client=_create_redis_client(),
+)
+
+
+def get_cache_manager() -> CacheManager:
+    """
+    Dependency to get the shared cache manager
+    """
+    return cache_manager
@@ -1,7 +1,7 @@
 import time
 from typing import Callable
 from fastapi import FastAPI, Request, Response
-from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client import Counter, Gauge, Histogram, generate_latest, CONTENT_TYPE_LATEST
 
 # Define metrics
 REQUEST_COUNT = Counter(
@@ -22,6 +22,75 @@ EXCEPTION_COUNT = Counter(
     ["method", "endpoint", "exception_type"]
 )
 
+SEARCH_CACHE_HITS = Counter(
+    "search_cache_hits_total",
+    "Count of search result cache hits",
+    ["collection"]
+)
+
+SEARCH_CACHE_MISSES = Counter(
+    "search_cache_misses_total",
+    "Count of search result cache misses",
+    ["collection"]
+)
+
+SEARCH_CACHE_ENTRIES = Gauge(
+    "search_cache_entries",
+    "Number of entries held in the search result cache"
+)
+
+CACHE_HITS = Counter(
+    "cache_hits_total",
+    "Count of tiered cache hits",
+    ["namespace", "tier"]
+)
+
+CACHE_MISSES = Counter(
+    "cache_misses_total",
+    "Count of tiered cache misses",
+    ["namespace"]
+)
+
+CACHE_BYTES = Gauge(
+    "cache_memory_bytes",
+    "Bytes held in the in-process cache tier"
+)
+
+PIPELINE_ITEMS = Counter(
+    "ingest_pipeline_items_total",
+    "Count of items processed by each ingestion pipeline stage",
+    ["stage"]
+)
+
+PIPELINE_ERRORS = Counter(
+    "ingest_pipeline_errors_total",
+    "Count of items dropped by each ingestion pipeline stage after an error",
+    ["stage"]
+)
+
+PIPELINE_STAGE_LATENCY = Histogram(
+    "ingest_pipeline_stage_seconds",
+    "Time spent handling a single item in each ingestion pipeline stage",
+    ["stage"]
+)
+
+PIPELINE_QUEUE_DEPTH = Gauge(
+    "ingest_pipeline_queue_depth",
+    "Items waiting in the input queue of each ingestion pipeline stage",
+    ["stage"]
+)
+
+
+QUERY_REFINEMENTS = Counter(
+    "query_refinements_total",
+    "Count of query refinements by outcome (refined, unchanged, timeout, error)",
+    ["outcome"]
+)
+
+QUERY_REFINEMENT_LATENCY = Histogram(
+    "query_refinement_seconds",
+    "Time spent waiting on query refinement, bounded by the refinement budget"
+)
 
 async def metrics_middleware(request: Request, call_next: Callable) -> Response:
     """
@@ -34,12 +34,14 @@ class ProgressManager:
         operation_type: str, 
         channel_id: str, 
         total_steps: int = 100,
-        metadata: Optional[Dict[str, Any]] = None
+        metadata: Optional[Dict[str, Any]] = None,
+        task_id: Optional[str] = None
     ) -> str:
         """
         Create a new task and return its ID
+        An explicit task_id lets a resumed job keep the ID its clients know
         """
-        task_id = str(uuid4())
+        task_id = task_id or str(uuid4())
         task_data = {
             "task_id": task_id,
             "operation_type": operation_type,
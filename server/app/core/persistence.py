@@ -0,0 +1,51 @@
+import atexit
+import logging
+import threading
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class DeferredSave:
+    """
+    Coalesces writes to an in-memory index into one background save.
+
+    ``schedule`` marks the index dirty and starts a timer; writes arriving
+    before it fires share the same save, which runs on the timer thread so
+    callers on the event loop never serialize the index themselves.
+    ``flush`` saves pending changes immediately and also runs at exit.
+    """
+    def __init__(self, save: Callable[[], None], delay: float):
+        self._save = save
+        self.delay = delay
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+        self._dirty = False
+        atexit.register(self.flush)
+
+    def schedule(self) -> None:
+        """Mark the index dirty, saving it within ``delay`` seconds"""
+        with self._lock:
+            self._dirty = True
+            if self._timer is None:
+                self._timer = threading.Timer(self.delay, self._run)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _run(self) -> None:
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Deferred index save failed: {e}")
+
+    def flush(self) -> None:
+        """Save now if anything changed since the last save"""
+        with self._save_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                dirty, self._dirty = self._dirty, False
+            if dirty:
+                self._save()
@@ -0,0 +1,168 @@
+import json
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from ..config import get_settings
+from .monitoring import SEARCH_CACHE_ENTRIES, SEARCH_CACHE_HITS, SEARCH_CACHE_MISSES
+
+settings = get_settings()
+
+_MISS = object()
+
+
+def _estimate_size(value: Any) -> int:
+    """
+    Rough byte size of a cached result list, dominated by document text
+    """
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(_estimate_size(item) for item in value)
+    text = getattr(value, "content", None) or getattr(value, "text", None)
+    if isinstance(text, str):
+        return len(text) + 512
+    return sys.getsizeof(value)
+
+
+class QueryResultCache:
+    """
+    LRU cache for search results, invalidated by per-collection write generations.
+
+    Every write to a collection bumps its generation; entries remember the
+    generation they were computed under and are discarded once it moves on,
+    so a single counter increment invalidates all results for a collection.
+    """
+    def __init__(self, ttl_seconds: float, max_entries: int, max_bytes: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # Map of (collection, key) -> (generation, expires_at, size, value)
+        self.entries: "OrderedDict[Tuple[str, str], Tuple[int, float, int, Any]]" = OrderedDict()
+        # Map of collection -> write generation
+        self.generations: Dict[str, int] = {}
+        self.total_bytes = 0
+        # Lock for thread-safe access from worker threads
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def make_key(query: str, *parts: Any) -> str:
+        """
+        Build a cache key from a whitespace-normalized query plus filters/limits
+        """
+        normalized = " ".join(query.split())
+        return json.dumps([normalized, *parts], sort_keys=True, default=str)
+
+    def generation(self, collection: str) -> int:
+        """
+        Current write generation of a collection
+        """
+        return self.generations.get(collection, 0)
+
+    def bump(self, collection: str) -> None:
+        """
+        Record a write to a collection, invalidating its cached results
+        """
+        with self.lock:
+            self.generations[collection] = self.generations.get(collection, 0) + 1
+
+    def get(self, collection: str, key: str) -> Any:
+        """
+        Return a cached value, or the module-level miss sentinel
+        """
+        with self.lock:
+            entry = self.entries.get((collection, key))
+            if entry is not None:
+                generation, expires_at, size, value = entry
+                if generation == self.generation(collection) and expires_at > time.monotonic():
+                    self.entries.move_to_end((collection, key))
+                    SEARCH_CACHE_HITS.labels(collection=collection).inc()
+                    return value
+                self._evict((collection, key))
+
+        SEARCH_CACHE_MISSES.labels(collection=collection).inc()
+        return _MISS
+
+    def set(self, collection: str, key: str, value: Any, generation: int) -> None:
+        """
+        Store a value computed while the collection was at ``generation``
+        """
+        if generation != self.generation(collection):
+            # A write landed while the value was being computed
+            return
+
+        size = _estimate_size(value)
+        if size > self.max_bytes:
+            return
+
+        with self.lock:
+            if (collection, key) in self.entries:
+                self._evict((collection, key))
+            self.entries[(collection, key)] = (
+                generation, time.monotonic() + self.ttl_seconds, size, value
+            )
+            self.total_bytes += size
+            while self.entries and (
+                len(self.entries) > self.max_entries or self.total_bytes > self.max_bytes
+            ):
+                self._evict(next(iter(self.entries)))
+            SEARCH_CACHE_ENTRIES.set(len(self.entries))
+
+    def _evict(self, entry_key: Tuple[str, str]) -> None:
+        _, _, size, _ = self.entries.pop(entry_key)
+        self.total_bytes -= size
+        SEARCH_CACHE_ENTRIES.set(len(self.entries))
+
+    async def get_or_compute(
+        self,
+        collection: str,
+        key: str,
+        compute: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """
+        Return the cached value for a key, computing and storing it on a miss
+        """
+        value = self.get(collection, key)
+        if value is not _MISS:
+            return list(value)
+
+        generation = self.generation(collection)
+        value = await compute()
+        self.set(collection, key, value, generation)
+        return value
+
+    async def get_many_or_compute(
+        self,
+        collection: str,
+        keys: Sequence[str],
+        compute: Callable[[List[int]], Awaitable[List[Any]]]
+    ) -> List[Any]:
+        """
+        Batch variant of get_or_compute; ``compute`` receives the indices of
+        the missing keys and returns their values in the same order
+        """
+        results: List[Optional[Any]] = [None] * len(keys)
+        missing = []
+        for i, key in enumerate(keys):
+            value = self.get(collection, key)
+            if value is _MISS:
+                missing.append(i)
+            else:
+                results[i] = list(value)
+
+        if missing:
+            generation = self.generation(collection)
+            computed = await compute(missing)
+            for i, value in zip(missing, computed):
+                self.set(collection, keys[i], value, generation)
+                results[i] = value
+
+        return results
+
+
+# Global query result cache instance
+query_cache = QueryResultCache(
+    ttl_seconds=settings.SEARCH_CACHE_TTL_SECONDS,
+    max_entries=settings.SEARCH_CACHE_MAX_ENTRIES,
+    max_bytes=settings.SEARCH_CACHE_MAX_BYTES,
+)
@@ -129,6 +129,13 @@ class SSEManager:
 sse_manager = SSEManager()
 
 
+def format_sse(event: str, data: Any) -> str:
+    """
+    Format a single event in the SSE wire format
+    """
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
 async def sse_event_generator(request: Request, queue: asyncio.Queue) -> AsyncIterable[str]:
     """
     Generator for SSE events
@@ -142,12 +149,9 @@ async def sse_event_generator(request: Request, queue: asyncio.Queue) -> AsyncIt
             # Get message from queue with timeout to check for disconnection periodically
             try:
                 message = await asyncio.wait_for(queue.get(), timeout=30.0)
-                event = message.get("event", "message")
-                data = json.dumps(message.get("data", {}))
                 
                 # Format as SSE
-                yield f"event: {event}\n"
-                yield f"data: {data}\n\n"
+                yield format_sse(message.get("event", "message"), message.get("data", {}))
             except asyncio.TimeoutError:
                 # Send a keep-alive comment to maintain the connection
                 yield ": ping\n\n"
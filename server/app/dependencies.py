@@ -35,10 +35,18 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     # For now, return the username
     return {"username": username}
 
+def get_vector_store():
+    """Dependency to get the configured vector store backend"""
+    if settings.VECTOR_DB_BACKEND == "local":
+        from .services.vector_index import VectorIndex
+        return VectorIndex()
+
+    from .services.vector_store import VectorStoreService
+    return VectorStoreService()
+
 # Add more dependencies as needed for:
 # - Database sessions
 # - Redis connections
-# - Vector store connections
 # - Ollama client
 # - Command History Service
 from .services.CommandHistoryService import CommandHistoryService
@@ -46,14 +54,14 @@ from .services.CommandExecutionService import CommandExecutionService
 from .services.CommandTemplateService import CommandTemplateService
 from .services.CommandSchedulerService import CommandSchedulerService
 
-def get_command_history_service() -> CommandHistoryService:
-    return CommandHistoryService()
+def get_command_history_service(db: AsyncSession = Depends(get_db)) -> CommandHistoryService:
+    return CommandHistoryService(db)
 
 def get_command_execution_service() -> CommandExecutionService:
     return CommandExecutionService()
 
-def get_command_template_service() -> CommandTemplateService:
-    return CommandTemplateService()
+def get_command_template_service(db: AsyncSession = Depends(get_db)) -> CommandTemplateService:
+    return CommandTemplateService(db)
 
-def get_command_scheduler_service() -> CommandSchedulerService:
-    return CommandSchedulerService()
\ No newline at end of file
+def get_command_scheduler_service(db: AsyncSession = Depends(get_db)) -> CommandSchedulerService:
+    return CommandSchedulerService(db)
\ No newline at end of file
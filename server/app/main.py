@@ -12,6 +12,10 @@ from app.core.monitoring import setup_monitoring
 from app.core.websocket import setup_websocket
 from app.core.sse import setup_sse
 from app.routes import progress, api, knowledge, auth, chat, code
+from app.services.ingestion import ingestion_manager
+from app.services.knowledge import KnowledgeService
+from app.services.knowledge_graph import knowledge_graph
+from app.db.session import AsyncSessionLocal
 from app.config import get_settings
 
 # Configure logging
@@ -73,10 +77,38 @@ app.include_router(progress.router)
 app.include_router(api.router)
 app.include_router(knowledge.router)
 app.include_router(chat.router)
+app.include_router(code.router)
 # Command History routes
 # from app.routes import command_history
 # app.include_router(command_history.router)
 
+@app.on_event("startup")
+async def resume_ingestion_jobs():
+    """Resume code ingestion jobs interrupted by a restart"""
+    await ingestion_manager.resume_pending()
+
+@app.on_event("startup")
+async def index_knowledge_duplicates():
+    """Add knowledge items created before near-duplicate detection to its index"""
+    try:
+        async with AsyncSessionLocal() as db:
+            indexed = await KnowledgeService(db, None).index_near_duplicates()
+        if indexed:
+            logger.info(f"Indexed {indexed} knowledge items for near-duplicate detection")
+    except Exception as e:
+        logger.warning(f"Near-duplicate indexing skipped: {e}")
+
+@app.on_event("startup")
+async def load_knowledge_graph():
+    """Build the in-process knowledge graph index"""
+    if not settings.KNOWLEDGE_GRAPH_CACHE_ENABLED:
+        return
+    try:
+        async with AsyncSessionLocal() as db:
+            await knowledge_graph.load(db)
+    except Exception as e:
+        logger.warning(f"Knowledge graph cache not loaded: {e}")
+
 # Custom OpenAPI documentation
 @app.get("/docs", response_class=HTMLResponse)
 async def get_swagger_documentation():
@@ -27,6 +27,7 @@ class CodeChunk(BaseModel):
     line_start: int
     line_end: int
     language: str
+    repository: Optional[str] = None  # Repository name, used to pick the storage shard
     metadata: CodeMetadata = Field(default_factory=CodeMetadata)
     embedding: Optional[List[float]] = None
     ast: Optional[str] = None
@@ -35,6 +36,12 @@ class CodeChunkRequest(BaseModel):
     """Request model for processing code files"""
     file_paths: List[str]
     
+class IngestionJobResponse(BaseModel):
+    """Response model for a submitted ingestion job"""
+    task_id: str
+    status: str
+    total_files: int
+    
 class CodeChunkResponse(BaseModel):
     """Response model for code chunks"""
     chunks: List[CodeChunk]
@@ -49,4 +56,55 @@ class CodeSearchRequest(BaseModel):
 class CodeSearchResponse(BaseModel):
     """Response model for code search results"""
     results: List[CodeChunk]
-    count: int 
\ No newline at end of file
+    count: int
+
+class CodeBatchSearchRequest(BaseModel):
+    """Request model for running several code searches at once"""
+    queries: List[str]
+    limit: int = 10
+    filters: Optional[Dict[str, Any]] = None
+
+class CodeBatchSearchResponse(BaseModel):
+    """Response model for batch code search, one result set per query"""
+    results: List[CodeSearchResponse]
+    count: int
+
+class SymbolCompletion(BaseModel):
+    """A symbol suggested for a partially typed name"""
+    name: str
+    qualified_name: str
+    type: str
+    file_path: str
+    line_start: int
+    chunk_id: str
+    match: str  # "exact", "prefix", "qualified" or "fuzzy"
+    references: int
+
+class SymbolCompletionResponse(BaseModel):
+    """Response model for symbol autocomplete"""
+    results: List[SymbolCompletion]
+    count: int
+
+class StructuralSearchRequest(BaseModel):
+    """Request model for tree-sitter pattern search"""
+    pattern: str  # tree-sitter query, e.g. '(call function: (attribute) @fn (#eq? @fn "subprocess.Popen"))'
+    language: str = "python"
+    path: str = "."
+    calls: Optional[List[str]] = None  # Only search files calling one of these targets
+    limit: int = 1000
+
+class StructuralMatch(BaseModel):
+    """A node captured by a structural search pattern"""
+    file_path: str
+    capture: str
+    node_type: str
+    line_start: int
+    line_end: int
+    text: str
+
+class StructuralSearchResponse(BaseModel):
+    """Response model for structural search"""
+    results: List[StructuralMatch]
+    count: int
+    files_indexed: int
+    files_searched: int
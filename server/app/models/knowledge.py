@@ -1,7 +1,7 @@
 from datetime import datetime
-from typing import Dict, List, Optional, Any, Literal
-from pydantic import BaseModel, Field
-from sqlalchemy import Column, String, Float, Boolean, DateTime, ForeignKey, Table, JSON, MetaData
+from typing import Dict, Iterable, List, Optional, Any, Literal
+from pydantic import BaseModel, Field, field_validator
+from sqlalchemy import Column, String, Float, Boolean, DateTime, ForeignKey, Table, JSON, MetaData, Index, Integer, BigInteger
 from sqlalchemy.orm import relationship
 from .base import Base
 
@@ -28,6 +28,42 @@ entity_knowledge = Table(
     Column('created_at', DateTime, default=datetime.utcnow)
 )
 
+# Width of the tag key columns; longer tags are cut to it
+TAG_MAX_LENGTH = 255
+
+
+def normalize_tags(tags: Optional[Iterable[Any]]) -> List[str]:
+    """Tags as stored: strings cut to TAG_MAX_LENGTH, without duplicates, in order"""
+    return list(dict.fromkeys(str(tag)[:TAG_MAX_LENGTH] for tag in tags or []))
+
+
+# Normalized item tags; the (tag, knowledge_id) primary key serves tag lookups
+knowledge_tag = Table(
+    'knowledge_tag',
+    Base.metadata,
+    Column('tag', String(TAG_MAX_LENGTH), primary_key=True),
+    Column('knowledge_id', ForeignKey('knowledgeitem.id', ondelete='CASCADE'), primary_key=True),
+    Index('ix_knowledge_tag_knowledge_id', 'knowledge_id')
+)
+
+# Items per tag, kept in step with knowledge_tag so facets never scan it
+knowledge_tag_count = Table(
+    'knowledge_tag_count',
+    Base.metadata,
+    Column('tag', String(TAG_MAX_LENGTH), primary_key=True),
+    Column('item_count', Integer, nullable=False, default=0),
+    Index('ix_knowledge_tag_count_item_count', 'item_count')
+)
+
+# MinHash LSH band keys of item contents, for near-duplicate lookups
+knowledge_lsh_bucket = Table(
+    'knowledge_lsh_bucket',
+    Base.metadata,
+    Column('bucket', BigInteger, primary_key=True),
+    Column('knowledge_id', ForeignKey('knowledgeitem.id', ondelete='CASCADE'), primary_key=True),
+    Index('ix_knowledge_lsh_bucket_knowledge_id', 'knowledge_id')
+)
+
 class KnowledgeSource(BaseModel):
     """Source information for a knowledge item"""
     type: str  # "documentation", "code", "conversation", "issue", etc.
@@ -50,6 +86,7 @@ class KnowledgeItem(Base):
     confidence = Column(Float, default=1.0, index=True)
     is_validated = Column(Boolean, default=False, index=True)
     embedding_id = Column(String(255), nullable=True, index=True)  # ID in vector database
+    content_hash = Column(String(64), nullable=True, unique=True, index=True)  # SHA-256 of whitespace-normalized content
     
     # JSON fields for flexible storage
     tags = Column(JSON, default=list)
@@ -59,8 +96,8 @@ class KnowledgeItem(Base):
     related_items = relationship(
         "KnowledgeItem",
         secondary=knowledge_relation,
-        primaryjoin=(id == knowledge_relation.c.source_id),
-        secondaryjoin=(id == knowledge_relation.c.target_id),
+        primaryjoin=lambda: KnowledgeItem.id == knowledge_relation.c.source_id,
+        secondaryjoin=lambda: KnowledgeItem.id == knowledge_relation.c.target_id,
         backref="referenced_by"
     )
 
@@ -94,6 +131,7 @@ class KnowledgeItemModel(BaseModel):
     item_metadata: Dict[str, Any] = Field(default_factory=dict)
     relations: List[KnowledgeRelationModel] = []
     embedding_id: Optional[str] = None
+    score: Optional[float] = None  # Similarity to the query, set on search results
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
     
@@ -109,6 +147,11 @@ class KnowledgeItemCreateRequest(BaseModel):
     tags: List[str] = []
     item_metadata: Dict[str, Any] = Field(default_factory=dict)
     relations: List[KnowledgeRelationModel] = []
+    
+    @field_validator("tags")
+    @classmethod
+    def _normalize_tags(cls, tags: List[str]) -> List[str]:
+        return normalize_tags(tags)
 
 class KnowledgeItemResponse(BaseModel):
     """Response model for knowledge items"""
@@ -126,12 +169,34 @@ class KnowledgeSearchRequest(BaseModel):
     limit: int = 10
     include_relations: bool = False
     time_range: Optional[Dict[str, datetime]] = None
+    mode: Literal["lexical", "vector", "hybrid"] = "vector"
+    
+    @field_validator("tags")
+    @classmethod
+    def _normalize_tags(cls, tags: Optional[List[str]]) -> Optional[List[str]]:
+        return None if tags is None else normalize_tags(tags)
 
 class KnowledgeSearchResponse(BaseModel):
     """Response model for knowledge search results"""
     results: List[KnowledgeItemModel]
     count: int
 
+class TagFacet(BaseModel):
+    """Number of knowledge items carrying a tag"""
+    tag: str
+    count: int
+
+class TagFacetResponse(BaseModel):
+    """Response model for tag facet counts"""
+    facets: List[TagFacet]
+
+class KnowledgeIngestResponse(BaseModel):
+    """Response model for streamed document ingestion"""
+    task_id: str
+    bytes_read: int
+    sections: int
+    items: int
+
 class KnowledgeRelationRequest(BaseModel):
     """Request model for creating knowledge relations"""
     source_id: str
@@ -111,14 +111,14 @@ async def get_command_history(limit: int = 10) -> List[str]:
 
 from ..services.knowledge import KnowledgeService
 from ..models.knowledge import KnowledgeSearchRequest, KnowledgeSearchResponse, KnowledgeItem
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from ..dependencies import get_db, get_vector_store
 from ..services.vector_store import VectorStoreService
 
 @router.post("/command_history/search", response_model=KnowledgeSearchResponse)
 async def search_command_history(
     search_request: KnowledgeSearchRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     vector_store: VectorStoreService = Depends(get_vector_store)
 ) -> KnowledgeSearchResponse:
     """
@@ -145,7 +145,7 @@ async def search_command_history(
 @router.post("/command_history/execute")
 async def execute_command_history(
     item_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ) -> Dict[str, Any]:
     """
     Execute command history
@@ -155,11 +155,13 @@ async def execute_command_history(
     if not item:
         return {"error": "Item not found"}
 
-    # Execute the command
-    import subprocess
+    # Execute the command without blocking the event loop
+    import asyncio
     try:
-        process = subprocess.Popen(item.content, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        stdout, stderr = process.communicate()
+        process = await asyncio.create_subprocess_shell(
+            item.content, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+        )
+        stdout, stderr = await process.communicate()
         return {"result": stdout.decode(), "error": stderr.decode()}
     except Exception as e:
         return {"error": str(e)}
@@ -177,7 +179,7 @@ async def create_command_template(
     """
     Create a new command template
     """
-    return command_template_service.create_template(name=name, template=template, user_id=user_id)
+    return await command_template_service.create_template(name=name, template=template, user_id=user_id)
 
 
 @router.get("/command_templates/{template_id}", response_model=CommandTemplate)
@@ -189,7 +191,7 @@ async def get_command_template(
     """
     Get a command template by ID
     """
-    return command_template_service.get_template(template_id=template_id, user_id=user_id)
+    return await command_template_service.get_template(template_id=template_id, user_id=user_id)
 
 
 @router.get("/command_templates", response_model=List[CommandTemplate])
@@ -202,7 +204,7 @@ async def get_command_templates(
     """
     Get all command templates for a user
     """
-    return command_template_service.get_templates(user_id=user_id, skip=skip, limit=limit)
+    return await command_template_service.get_templates(user_id=user_id, skip=skip, limit=limit)
 
 
 @router.put("/command_templates/{template_id}", response_model=CommandTemplate)
@@ -216,7 +218,7 @@ async def update_command_template(
     """
     Update an existing command template
     """
-    return command_template_service.update_template(template_id=template_id, name=name, template=template, user_id=user_id)
+    return await command_template_service.update_template(template_id=template_id, name=name, template=template, user_id=user_id)
 
 
 @router.delete("/command_templates/{template_id}")
@@ -228,7 +230,7 @@ async def delete_command_template(
     """
     Delete a command template
     """
-    command_template_service.delete_template(template_id=template_id, user_id=user_id)
+    await command_template_service.delete_template(template_id=template_id, user_id=user_id)
     return {"message": "Command template deleted successfully"}
 
 
@@ -245,7 +247,7 @@ async def create_command_schedule(
     """
     Create a new command schedule
     """
-    return command_scheduler_service.create_schedule(command=command, schedule=schedule, user_id=user_id)
+    return await command_scheduler_service.create_schedule(command=command, schedule=schedule, user_id=user_id)
 
 
 @router.get("/command_schedules/{schedule_id}", response_model=CommandSchedule)
@@ -257,7 +259,7 @@ async def get_command_schedule(
     """
     Get a command schedule by ID
     """
-    return command_scheduler_service.get_schedule(schedule_id=schedule_id, user_id=user_id)
+    return await command_scheduler_service.get_schedule(schedule_id=schedule_id, user_id=user_id)
 
 
 @router.get("/command_schedules", response_model=List[CommandSchedule])
@@ -270,7 +272,7 @@ async def get_command_schedules(
     """
     Get all command schedules for a user
     """
-    return command_scheduler_service.get_schedules(user_id=user_id, skip=skip, limit=limit)
+    return await command_scheduler_service.get_schedules(user_id=user_id, skip=skip, limit=limit)
 
 
 @router.put("/command_schedules/{schedule_id}", response_model=CommandSchedule)
@@ -284,7 +286,7 @@ async def update_command_schedule(
     """
     Update an existing command schedule
     """
-    return command_scheduler_service.update_schedule(schedule_id=schedule_id, command=command, schedule=schedule, user_id=user_id)
+    return await command_scheduler_service.update_schedule(schedule_id=schedule_id, command=command, schedule=schedule, user_id=user_id)
 
 
 @router.delete("/command_schedules/{schedule_id}")
@@ -296,7 +298,7 @@ async def delete_command_schedule(
     """
     Delete a command schedule
     """
-    command_scheduler_service.delete_schedule(schedule_id=schedule_id, user_id=user_id)
+    await command_scheduler_service.delete_schedule(schedule_id=schedule_id, user_id=user_id)
     return {"message": "Command schedule deleted successfully"}
 
 from ..services.CommandHistoryService import CommandHistoryService
@@ -310,11 +312,9 @@ async def share_command(
     """
     Share a command
     """
-    command = command_history_service.get_command(command_id)
+    command = await command_history_service.share_command(command_id)
     if not command:
         return {"error": "Command not found"}
-    command.is_shared = True
-    command_history_service.db.commit()
     return {"message": "Command shared successfully"}
 
 @router.get("/command_history/shared")
@@ -324,7 +324,7 @@ async def get_shared_commands(
     """
     Get all shared commands
     """
-    return command_history_service.get_shared_commands()
+    return await command_history_service.get_shared_commands()
 from fastapi import APIRouter
 from server.app.routes import auth, chat, knowledge, progress, code
 
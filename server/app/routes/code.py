@@ -1,32 +1,51 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import StreamingResponse
 from typing import List, Dict, Any, Optional
 import os
-from ..services import code_tokenizer, code_embedding_generator, similarity_search, source_management
+import time
+from ..services import code_chunker, code_embedding_generator
 
 from ..models.code import (
     CodeChunkRequest, 
     CodeChunkResponse, 
+    IngestionJobResponse,
+    SymbolCompletion,
+    SymbolCompletionResponse,
+    StructuralSearchRequest,
+    StructuralSearchResponse,
     CodeSearchRequest, 
     CodeSearchResponse,
+    CodeBatchSearchRequest,
+    CodeBatchSearchResponse,
     CodeChunk,
     CodeMetadata
 )
 from ..services.code_chunker import CodeChunkerService
-from ..services.vector_store import VectorStoreService
+from ..services.vector_store import CODE_COLLECTION, VectorStoreService, progressive_code_search
+from ..services.lexical_index import get_lexical_index
+from ..services.symbol_index import get_symbol_index
+from ..services.structural_search import get_structural_index
 from ..services.code_embedding import CodeEmbeddingService
-from ..services.code_tokenizer import tokenize_code
 from ..services.code_embedding_generator import CodeEmbeddingGenerator
-from ..services.similarity_search import find_similar_codes
-from ..core.cache import get_cache_manager
+from ..services.ingestion import ingestion_manager
+from ..services.ingest_pipeline import IngestPipeline
+from ..core.cache import CacheManager, cache_manager, get_cache_manager
+from ..core.notifications import ProgressStatus
+from ..core.sse import format_sse
+from ..dependencies import get_vector_store
 
 router = APIRouter(prefix="/code", tags=["code"])
 
+# Lets cached chunk lists round-trip through the Redis tier as JSON
+cache_manager.register_type("file_chunks", List[code_chunker.CodeChunk])
+
 # Services dependency injection
 async def get_code_chunker_service():
     return CodeChunkerService()
     
 async def get_vector_store_service():
-    service = VectorStoreService()
+    service = get_vector_store()
     await service.initialize()
     return service
     
@@ -36,61 +55,55 @@ async def get_code_embedding_service():
 async def get_code_embedding_generator():
     return code_embedding_generator.CodeEmbeddingGenerator()
 
-@router.post("/process", response_model=CodeChunkResponse)
-async def process_code_files(
-    request: CodeChunkRequest,
-    background_tasks: BackgroundTasks,
-    code_chunker_service: CodeChunkerService = Depends(get_code_chunker_service),
-    vector_store: VectorStoreService = Depends(get_vector_store_service),
-    embedding_service: CodeEmbeddingService = Depends(get_code_embedding_service)
-):
+@router.post("/process", response_model=IngestionJobResponse, status_code=202)
+async def process_code_files(request: CodeChunkRequest):
     """
     Process code files to extract chunks and metadata.
     
-    This endpoint:
+    Returns a task id immediately; a background job then:
     1. Extracts code chunks from the provided files
     2. Extracts metadata for each chunk
-    3. Generates embeddings for the chunks
-    4. Stores chunks and embeddings in vector DB
+    3. Stores chunks and embeddings in vector DB in batches
+    
+    Progress, throughput and ETA are reported on /progress/{task_id} and
+    the progress SSE/WebSocket channels.
     """
-    all_chunks = []
-    
-    # Process each file to extract chunks
-    for file_path in request.file_paths:
-        if not os.path.exists(file_path):
-            raise HTTPException(status_code=404, detail=f"File not found: {file_path}")
-        
-        # Extract code chunks
-        chunks = await code_chunker_service.process_file(file_path)
-        
-        # Generate embeddings for chunks
-        for chunk in chunks:
-            embedding = await embedding_service.generate_embedding(chunk.content)
-            chunk.embedding = embedding
-            
-        all_chunks.extend(chunks)
-    
-    # Store chunks in vector database in background
-    if all_chunks:
-        background_tasks.add_task(
-            vector_store.batch_process_code_chunks,
-            all_chunks,
-            batch_size=100
-        )
+    missing = [file_path for file_path in request.file_paths if not os.path.exists(file_path)]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"File not found: {missing[0]}")
     
-    return CodeChunkResponse(chunks=all_chunks, count=len(all_chunks))
+    task_id = await ingestion_manager.submit(request.file_paths)
+    
+    return IngestionJobResponse(
+        task_id=task_id,
+        status=ProgressStatus.PENDING,
+        total_files=len(request.file_paths)
+    )
+
+@router.post("/process/{task_id}/cancel")
+async def cancel_code_processing(task_id: str):
+    """Cancel a running ingestion job"""
+    if not await ingestion_manager.cancel(task_id):
+        raise HTTPException(status_code=404, detail=f"No running ingestion job: {task_id}")
+    
+    return {"task_id": task_id, "status": ProgressStatus.CANCELED}
 
 @router.get("/metadata/{file_path:path}", response_model=List[CodeChunk])
 async def get_file_metadata(
     file_path: str,
-    code_chunker_service: CodeChunkerService = Depends(get_code_chunker_service)
+    code_chunker_service: CodeChunkerService = Depends(get_code_chunker_service),
+    cache_manager: CacheManager = Depends(get_cache_manager)
 ):
     """Get code chunks and metadata for a specific file"""
     if not os.path.exists(file_path):
         raise HTTPException(status_code=404, detail=f"File not found: {file_path}")
     
-    # Process the file to extract chunks and metadata
-    chunks = await code_chunker_service.process_file(file_path)
+    # Reuse chunks while the file's mtime and size are unchanged
+    chunks = await cache_manager.get(file_path, namespace="file_chunks", path=file_path)
+    if chunks is None:
+        # Process the file to extract chunks and metadata
+        chunks = await code_chunker_service.process_file(file_path)
+        await cache_manager.set(file_path, chunks, namespace="file_chunks", path=file_path)
     
     if not chunks:
         raise HTTPException(status_code=404, detail=f"No code chunks found in file: {file_path}")
@@ -100,108 +113,180 @@ async def get_file_metadata(
 @router.post("/search", response_model=CodeSearchResponse)
 async def search_code(
     request: CodeSearchRequest,
-    vector_store: VectorStoreService = Depends(get_vector_store_service),
-    code_embedding_generator: CodeEmbeddingGenerator = Depends(get_code_embedding_generator),
-    cache_manager = Depends(get_cache_manager)
+    vector_store: VectorStoreService = Depends(get_vector_store_service)
 ):
     """
     Semantic search for code based on query.
     
     This endpoint:
-    1. Generates embeddings for the search query
-    2. Finds similar code chunks using cosine similarity
+    1. Embeds only the search query
+    2. Searches the persisted chunk index (vector + lexical)
     3. Returns ranked results with metadata
+    
+    Files are never read or embedded at query time, so latency does not
+    depend on repository size; use /code/process to index them.
     """
-    # Tokenize the query
-    query_tokens = tokenize_code(request.query)
-    
-    # Get all files in the project
-    all_files = await source_management.get_all_files()
-    
-    # Create a code chunk for each file
-    all_chunks = []
-    for file_path in all_files:
-        try:
-            # Check if the file is in the cache
-            cached_content = await cache_manager.get(file_path)
-            if cached_content:
-                content = cached_content
-            else:
-                # Check if the file is a binary file
-                if file_path.endswith((".png", ".jpg", ".jpeg", ".gif", ".bmp", ".pdf", ".ico")):
-                    print(f"Skipping binary file: {file_path}")
-                    continue
-                    
-                # Read the file contents
-                with open(file_path, "r") as f:
-                    content = f.read()
-                    
-                # Store the file contents in the cache
-                await cache_manager.set(file_path, content)
-                
-            chunk = CodeChunk(file_path=file_path, content=content)
-            all_chunks.append(chunk)
-        except Exception as e:
-            print(f"Error reading file {file_path}: {e}")
-            continue
-    
-    # Find similar code chunks using AST-based search
-    top_indices, similarities = find_similar_codes(request.query, all_chunks, top_n=request.limit)
-    
-    # Prepare the results
-    results = [all_chunks[i] for i in top_indices]
-    
-    response = CodeSearchResponse(results=results, count=len(results))
-    
-    return response
+    results = await vector_store.search_code_chunks(
+        request.query,
+        filters=request.filters,
+        limit=request.limit
+    )
+    
+    return CodeSearchResponse(results=results, count=len(results))
+
+@router.post("/search/stream")
+async def search_code_stream(
+    request: CodeSearchRequest,
+    http_request: Request,
+    vector_store: VectorStoreService = Depends(get_vector_store_service)
+):
+    """
+    Progressive code search streamed as Server-Sent Events.
+    
+    Emits one ``results`` event per phase as soon as it is ready:
+    1. ``lexical`` - BM25/exact identifier hits, no embedding required
+    2. ``vector`` - semantic hits once the query is embedded
+    3. ``reranked`` - final fused ranking, identical to /code/search
+    
+    A ``done`` event closes the stream.
+    """
+    async def event_stream():
+        start_time = time.perf_counter()
+        async for phase, chunks in progressive_code_search(
+            vector_store,
+            request.query,
+            filters=request.filters,
+            k=request.limit
+        ):
+            if await http_request.is_disconnected():
+                return
+            yield format_sse("results", {
+                "phase": phase,
+                "results": jsonable_encoder(chunks),
+                "count": len(chunks),
+                "elapsed_ms": round((time.perf_counter() - start_time) * 1000, 2)
+            })
+        yield format_sse("done", {
+            "elapsed_ms": round((time.perf_counter() - start_time) * 1000, 2)
+        })
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+@router.post("/search/structural", response_model=StructuralSearchResponse)
+async def search_code_structural(request: StructuralSearchRequest):
+    """
+    Search code with a tree-sitter query pattern.
+    
+    This endpoint:
+    1. Incrementally refreshes the per-file index of node types, identifiers
+       and call targets (only changed files are reparsed)
+    2. Prunes files lacking the node types or #eq? identifiers the pattern requires
+    3. Runs the pattern over the remaining files in parallel worker processes
+    """
+    if not os.path.isdir(request.path):
+        raise HTTPException(status_code=404, detail=f"Directory not found: {request.path}")
+    
+    try:
+        result = await get_structural_index().search(
+            request.pattern,
+            language=request.language,
+            root=request.path,
+            calls=request.calls,
+            limit=request.limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return StructuralSearchResponse(**result)
+
+@router.post("/search/batch", response_model=CodeBatchSearchResponse)
+async def search_code_batch(
+    request: CodeBatchSearchRequest,
+    vector_store: VectorStoreService = Depends(get_vector_store_service)
+):
+    """
+    Run several semantic code searches in a single pass.
+    
+    All queries are embedded together and executed as one multi-query
+    call against the vector store; results are returned per query in
+    request order.
+    """
+    batches = await vector_store.search_many(
+        request.queries,
+        filters=request.filters,
+        k=request.limit
+    )
+    
+    results = [
+        CodeSearchResponse(results=chunks, count=len(chunks))
+        for chunks in batches
+    ]
+    
+    return CodeBatchSearchResponse(results=results, count=len(results))
+
+@router.get("/symbols/complete", response_model=SymbolCompletionResponse)
+async def complete_symbols(
+    q: str = Query(..., min_length=1, description="Partial symbol name or dotted path"),
+    limit: int = Query(10, ge=1, le=100),
+    fuzzy: bool = Query(True, description="Fall back to subsequence matching")
+):
+    """
+    Autocomplete function/class names from the in-memory symbol index.
+    
+    Matches are case-insensitive: exact names first, then name prefixes,
+    qualified-path prefixes and fuzzy subsequences, each ranked by how many
+    indexed chunks reference the symbol. No embedding is involved.
+    """
+    lexical_index = get_lexical_index(CODE_COLLECTION)
+    matches = get_symbol_index(CODE_COLLECTION).complete(
+        q,
+        limit=limit,
+        fuzzy=fuzzy,
+        references=lexical_index.document_frequency
+    )
+    
+    results = [
+        SymbolCompletion(
+            name=match.symbol.name,
+            qualified_name=match.symbol.qualified_name,
+            type=match.symbol.type,
+            file_path=match.symbol.file_path,
+            line_start=match.symbol.line_start,
+            chunk_id=match.symbol.chunk_id,
+            match=match.match,
+            references=match.references
+        )
+        for match in matches
+    ]
+    
+    return SymbolCompletionResponse(results=results, count=len(results))
 
 @router.post("/batch-process")
 async def batch_process_code(
     request: CodeChunkRequest,
-    background_tasks: BackgroundTasks,
-    code_chunker_service: CodeChunkerService = Depends(get_code_chunker_service),
-    vector_store: VectorStoreService = Depends(get_vector_store_service),
-    embedding_service: CodeEmbeddingService = Depends(get_code_embedding_service)
+    vector_store: VectorStoreService = Depends(get_vector_store_service)
 ):
     """
     Process large codebases in batches.
     
     This endpoint:
-    1. Accepts multiple file paths
-    2. Processes them in batches
+    1. Accepts multiple file paths (directories are expanded)
+    2. Streams them through overlapping read/parse/dedupe/embed/upsert stages
     3. Stores results incrementally
+    
+    Per-stage throughput and queue depths are exported on /metrics. Files
+    that could not be processed are listed under ``failed`` with their errors.
     """
-    total_chunks = 0
-    batch_size = 100
-    
-    for i in range(0, len(request.file_paths), batch_size):
-        batch = request.file_paths[i:i + batch_size]
-        
-        # Process batch
-        chunks = []
-        for file_path in batch:
-            if os.path.exists(file_path):
-                file_chunks = await code_chunker_service.process_file(file_path)
-                chunks.extend(file_chunks)
-                
-        # Generate embeddings
-        if chunks:
-            contents = [chunk.content for chunk in chunks]
-            embeddings = await embedding_service.generate_batch_embeddings(contents)
-            
-            for chunk, embedding in zip(chunks, embeddings):
-                chunk.embedding = embedding
-                
-            # Store in vector DB
-            background_tasks.add_task(
-                vector_store.batch_process_code_chunks,
-                chunks,
-                batch_size=100
-            )
-            
-            total_chunks += len(chunks)
-            
-    return {"message": f"Successfully processed {total_chunks} code chunks"}
+    stats = await IngestPipeline(vector_store).run(request.file_paths)
+    
+    if stats['failed']:
+        message = f"Processed {stats['chunks']} code chunks; {len(stats['failed'])} files failed"
+    else:
+        message = f"Successfully processed {stats['chunks']} code chunks"
+    return {
+        "message": message,
+        **stats
+    }
 
 @router.get("/stats", response_model=Dict[str, Any])
 async def get_code_stats(
@@ -209,17 +294,18 @@ async def get_code_stats(
 ):
     """Get statistics about indexed code"""
     stats = await vector_store.get_code_stats()
-    return stats 
-from fastapi import APIRouter, HTTPException
-from server.app.services import create_python_agent
-
-router = APIRouter()
+    return stats
 
 @router.post("/analyze_code")
 async def analyze_code(code: str):
+    """Analyze a code snippet with the Python agent"""
+    # Imported lazily so the route table does not depend on dspy being installed
+    from ..services.dspy_agents import create_python_agent
+
     try:
         agent = create_python_agent()
         analysis = agent(code)
         return {"analysis": analysis}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
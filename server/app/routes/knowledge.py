@@ -1,6 +1,6 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..models.knowledge import (
     KnowledgeItemCreateRequest,
@@ -8,18 +8,26 @@ from ..models.knowledge import (
     KnowledgeSearchRequest,
     KnowledgeSearchResponse,
     KnowledgeRelationRequest,
+    KnowledgeRelationModel,
     EntityKnowledgeRequest,
-    KnowledgeItemModel
+    KnowledgeItemModel,
+    KnowledgeSourceModel,
+    KnowledgeIngestResponse,
+    TagFacet,
+    TagFacetResponse
 )
 from ..services.knowledge import KnowledgeService
 from ..services.vector_store import VectorStoreService
-from ..dependencies import get_db, get_current_user
+from ..dependencies import get_db, get_current_user, get_vector_store
+from ..core.notifications import progress_manager, ProgressStatus
 
 router = APIRouter(prefix="/knowledge", tags=["knowledge"])
 
+KNOWLEDGE_INGESTION_OPERATION = "knowledge_ingestion"
+
 def get_knowledge_service(
-    db: Session = Depends(get_db),
-    vector_store: VectorStoreService = Depends(VectorStoreService)
+    db: AsyncSession = Depends(get_db),
+    vector_store: VectorStoreService = Depends(get_vector_store)
 ) -> KnowledgeService:
     """Dependency to get the knowledge service"""
     return KnowledgeService(db, vector_store)
@@ -101,12 +109,15 @@ async def get_knowledge_item(
         updated_at=item.updated_at
     )
     
-    # Get related items if requested
+    # Get related items if requested (a single traversal query at any depth)
     related_items = []
     if include_related:
         related_data = await service.get_related_knowledge(item_id, max_depth=max_depth)
         
-        for data in related_data:
+        # Flatten the tree depth-first; each item records how it was reached
+        stack = [(data, item_id) for data in reversed(related_data)]
+        while stack:
+            data, parent_id = stack.pop()
             related_item = data["item"]
             related_items.append(
                 KnowledgeItemModel(
@@ -124,16 +135,19 @@ async def get_knowledge_item(
                     tags=related_item.tags,
                     confidence=related_item.confidence,
                     is_validated=related_item.is_validated,
-                    metadata={
-                        **related_item.metadata,
+                    item_metadata={
+                        **(related_item.item_metadata or {}),
                         "relation_type": data["relation_type"],
-                        "relation_confidence": data["confidence"]
+                        "relation_confidence": data["confidence"],
+                        "relation_depth": data["depth"],
+                        "related_to": parent_id
                     },
                     embedding_id=related_item.embedding_id,
                     created_at=related_item.created_at,
                     updated_at=related_item.updated_at
                 )
             )
+            stack.extend((child, related_item.id) for child in reversed(data["related_items"]))
     
     return KnowledgeItemResponse(item=response, related_items=related_items)
 
@@ -143,8 +157,13 @@ async def search_knowledge(
     service: KnowledgeService = Depends(get_knowledge_service),
     _: dict = Depends(get_current_user)
 ):
-    """Search for knowledge items"""
-    items = await service.search_knowledge(
+    """Search for knowledge items by similarity, full text (``lexical``) or both (``hybrid``)"""
+    search = {
+        "vector": service.search_knowledge_scored,
+        "lexical": service.search_knowledge_lexical,
+        "hybrid": service.search_knowledge_hybrid
+    }[request.mode]
+    results = await search(
         query=request.query,
         types=request.types,
         subtypes=request.subtypes,
@@ -152,12 +171,13 @@ async def search_knowledge(
         source_types=request.source_types,
         min_confidence=request.min_confidence,
         limit=request.limit,
-        include_relations=request.include_relations
+        include_relations=request.include_relations,
+        time_range=request.time_range
     )
     
     # Convert to response models
     result_items = []
-    for item in items:
+    for item, score in results:
         result_items.append(
             KnowledgeItemModel(
                 id=item.id,
@@ -174,8 +194,9 @@ async def search_knowledge(
                 tags=item.tags,
                 confidence=item.confidence,
                 is_validated=item.is_validated,
-                metadata=item.metadata,
+                item_metadata=item.item_metadata or {},
                 embedding_id=item.embedding_id,
+                score=score,
                 created_at=item.created_at,
                 updated_at=item.updated_at
             )
@@ -183,6 +204,17 @@ async def search_knowledge(
     
     return KnowledgeSearchResponse(results=result_items, count=len(result_items))
 
+@router.get("/tags", response_model=TagFacetResponse)
+async def get_tag_facets(
+    prefix: Optional[str] = None,
+    limit: int = Query(default=50, ge=1, le=1000),
+    service: KnowledgeService = Depends(get_knowledge_service),
+    _: dict = Depends(get_current_user)
+):
+    """Tag facet counts: the most used tags and how many items carry each"""
+    facets = await service.get_tag_facets(prefix=prefix, limit=limit)
+    return TagFacetResponse(facets=[TagFacet(tag=tag, count=count) for tag, count in facets])
+
 @router.post("/relations", status_code=201)
 async def create_knowledge_relation(
     request: KnowledgeRelationRequest,
@@ -194,18 +226,49 @@ async def create_knowledge_relation(
     await service.create_knowledge_relations(
         request.source_id,
         [
-            {
-                "target_id": request.target_id,
-                "relation_type": request.relation_type,
-                "confidence": request.confidence,
-                "metadata": request.metadata
-            }
+            KnowledgeRelationModel(
+                target_id=request.target_id,
+                relation_type=request.relation_type,
+                confidence=request.confidence,
+                metadata=request.metadata
+            )
         ]
     )
     
     await create_notification(user_id=user_id, message="New knowledge relation created")
     return {"message": "Relation created successfully"}
 
+@router.get("/graph/path")
+async def get_knowledge_path(
+    source_id: int,
+    target_id: int,
+    relation_types: List[str] = Query(default=[]),
+    directed: bool = True,
+    service: KnowledgeService = Depends(get_knowledge_service),
+    _: dict = Depends(get_current_user)
+):
+    """Get the shortest chain of relations from one knowledge item to another"""
+    path = await service.get_knowledge_path(
+        source_id,
+        target_id,
+        relation_types=relation_types or None,
+        directed=directed
+    )
+    
+    if path is None:
+        raise HTTPException(status_code=404, detail="No path between knowledge items")
+    
+    return {"path": [str(item_id) for item_id in path]}
+
+@router.get("/items/{item_id}/degree")
+async def get_knowledge_degree(
+    item_id: int,
+    service: KnowledgeService = Depends(get_knowledge_service),
+    _: dict = Depends(get_current_user)
+):
+    """Get relation and entity link counts for a knowledge item"""
+    return await service.get_knowledge_degree(item_id)
+
 @router.post("/entity-links", status_code=201)
 async def link_entity_to_knowledge(
     request: EntityKnowledgeRequest,
@@ -277,12 +340,12 @@ async def extract_knowledge_from_text(
     _: dict = Depends(get_current_user)
 ):
     """Extract knowledge items from text content"""
-    source = {
-        "type": source_type,
-        "identifier": source_identifier,
-        "url": source_url,
-        "author": source_author
-    }
+    source = KnowledgeSourceModel(
+        type=source_type,
+        identifier=source_identifier,
+        url=source_url,
+        author=source_author
+    )
     
     items = await service.extract_knowledge_from_text(
         content=content,
@@ -320,6 +383,82 @@ async def extract_knowledge_from_text(
     
     return result_items
 
+@router.post("/extract/stream", response_model=KnowledgeIngestResponse)
+async def ingest_knowledge_stream(
+    request: Request,
+    source_type: str,
+    source_identifier: str,
+    source_url: Optional[str] = None,
+    source_author: Optional[str] = None,
+    knowledge_type: str = "explicit",
+    subtype: Optional[str] = None,
+    tags: List[str] = Query(default=[]),
+    channel_id: str = KNOWLEDGE_INGESTION_OPERATION,
+    service: KnowledgeService = Depends(get_knowledge_service),
+    _: dict = Depends(get_current_user)
+):
+    """
+    Extract knowledge items from a Markdown or text document sent as the raw request body.
+    
+    The body is split into sections as it arrives and ingested in batches,
+    so large documents are never held in memory. Progress (bytes read out of
+    Content-Length, when given) is published as a task on ``channel_id``.
+    """
+    source = KnowledgeSourceModel(
+        type=source_type,
+        identifier=source_identifier,
+        url=source_url,
+        author=source_author
+    )
+    
+    total = int(request.headers.get("content-length") or 0)
+    task_id = await progress_manager.create_task(
+        KNOWLEDGE_INGESTION_OPERATION,
+        channel_id,
+        total_steps=max(total, 1),
+        metadata={"source_identifier": source_identifier, "bytes_total": total}
+    )
+    await progress_manager.update_progress(
+        task_id, status=ProgressStatus.RUNNING, message="Ingestion started"
+    )
+    
+    async def report(counts: dict) -> None:
+        await progress_manager.update_progress(
+            task_id,
+            progress=counts["bytes"] if total else None,
+            message=f"Ingested {counts['sections']} sections",
+            metadata=counts
+        )
+    
+    try:
+        counts = await service.ingest_text_stream(
+            request.stream(),
+            source=source,
+            type=knowledge_type,
+            subtype=subtype,
+            tags=tags,
+            progress=report
+        )
+    except Exception as e:
+        await progress_manager.update_progress(
+            task_id, status=ProgressStatus.FAILED, message=f"Ingestion failed: {e}"
+        )
+        raise
+    
+    await progress_manager.update_progress(
+        task_id,
+        status=ProgressStatus.COMPLETED,
+        message=f"Ingested {counts['sections']} sections into {counts['items']} items",
+        metadata=counts
+    )
+    
+    return KnowledgeIngestResponse(
+        task_id=task_id,
+        bytes_read=counts["bytes"],
+        sections=counts["sections"],
+        items=counts["items"]
+    )
+
 @router.post("/extract/conversation", response_model=List[KnowledgeItemModel])
 async def extract_knowledge_from_conversation(
     content: str,
@@ -332,12 +471,12 @@ async def extract_knowledge_from_conversation(
     _: dict = Depends(get_current_user)
 ):
     """Extract knowledge from conversation content"""
-    source = {
-        "type": source_type,
-        "identifier": source_identifier,
-        "url": source_url,
-        "author": source_author
-    }
+    source = KnowledgeSourceModel(
+        type=source_type,
+        identifier=source_identifier,
+        url=source_url,
+        author=source_author
+    )
     
     items = await service.extract_knowledge_from_conversation(
         content=content,
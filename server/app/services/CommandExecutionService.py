@@ -1,16 +1,14 @@
-import subprocess
-
-import subprocess
-import subprocess
-import subprocess
+import asyncio
 from fastapi import Depends, HTTPException
 from ..core.auth import get_current_active_user, TokenData
 import time
 import logging
 from .CommandHistoryService import CommandHistoryService
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from ..dependencies import get_db
 from ..models.audit_log import AuditLog
+from ..models.command_history import CommandHistory
 
 # Configure logging
 logging.basicConfig(filename="command_history.log", level=logging.INFO,
@@ -42,7 +40,7 @@ class CommandExecutionService:
             return False
         return True
 
-    def execute_command(self, command: str, user: TokenData = Depends(get_current_active_user), command_history_service: CommandHistoryService = Depends(), db: Session = Depends(get_db)) -> str:
+    async def execute_command(self, command: str, user: TokenData = Depends(get_current_active_user), command_history_service: CommandHistoryService = Depends(), db: AsyncSession = Depends(get_db)) -> str:
         """
         Executes a shell command and returns the output.
         """
@@ -63,32 +61,39 @@ class CommandExecutionService:
         #self._user_last_executed[user.username] = current_time
 
         # Rate limiting
-        last_executed = db.query(CommandHistory).filter(CommandHistory.user_id == user.id).order_by(CommandHistory.execution_time.desc()).first()
+        result = await db.execute(
+            select(CommandHistory)
+            .where(CommandHistory.user_id == user.id)
+            .order_by(CommandHistory.execution_time.desc())
+            .limit(1)
+        )
+        last_executed = result.scalars().first()
         if last_executed and time.time() - last_executed.execution_time.timestamp() < self.RATE_LIMIT_SECONDS:
             logging.warning(f"Rate limit exceeded for user {user.username}")
             raise HTTPException(status_code=429, detail="Rate limit exceeded")
 
         try:
-            process = subprocess.Popen(command, shell=True,
-                                    stdout=subprocess.PIPE,
-                                    stderr=subprocess.PIPE,
-                                    universal_newlines=True)
-            stdout, stderr = process.communicate()
+            # Run without blocking the event loop while the command executes
+            process = await asyncio.create_subprocess_shell(command,
+                                    stdout=asyncio.subprocess.PIPE,
+                                    stderr=asyncio.subprocess.PIPE)
+            stdout_bytes, stderr_bytes = await process.communicate()
+            stdout, stderr = stdout_bytes.decode(), stderr_bytes.decode()
             if stderr:
                 logging.error(f"Error executing command for user {user.username}: {command} - {stderr}")
-                db_audit_log = AuditLog(user_id=user.id, username=user.username, command=command, status="failure", output=stderr, error=str(e))
+                db_audit_log = AuditLog(user_id=user.id, username=user.username, command=command, status="failure", output=stderr, error=stderr)
                 db.add(db_audit_log)
-                db.commit()
+                await db.commit()
                 return f"Error: {stderr}"
             logging.info(f"Command executed successfully by user {user.username}: {command} - {stdout}")
             db_audit_log = AuditLog(user_id=user.id, username=user.username, command=command, status="success", output=stdout)
             db.add(db_audit_log)
-            db.commit()
-            command_history_service.log_command(command=command, user_id=user.id)
+            await db.commit()
+            await command_history_service.log_command(command=command, user_id=user.id)
             return stdout
         except Exception as e:
             logging.exception(f"Exception executing command for user {user.username}: {command} - {e}")
             db_audit_log = AuditLog(user_id=user.id, username=user.username, command=command, status="exception", error=str(e))
             db.add(db_audit_log)
-            db.commit()
-            return str(e)
\ No newline at end of file
+            await db.commit()
+            return str(e)
@@ -1,34 +1,48 @@
 from fastapi import Depends
-from sqlalchemy.orm import Session
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from ..dependencies import get_db
 from ..models.command_history import CommandHistory
-from typing import List
+from typing import List, Optional
 
 class CommandHistoryService:
-    def __init__(self, db: Session = Depends(get_db)):
+    def __init__(self, db: AsyncSession = Depends(get_db)):
         self.db = db
 
-    def log_command(self, command: str, user_id: int) -> CommandHistory:
+    async def log_command(self, command: str, user_id: int) -> CommandHistory:
         """Logs a command to the command history."""
         db_command = CommandHistory(command=command, user_id=user_id)
         self.db.add(db_command)
-        self.db.commit()
-        self.db.refresh(db_command)
+        await self.db.commit()
+        await self.db.refresh(db_command)
         return db_command
 
-    def get_command_history(self, user_id: int, skip: int = 0, limit: int = 100):
+    async def get_command_history(self, user_id: int, skip: int = 0, limit: int = 100) -> List[CommandHistory]:
         """Retrieves command history for a user."""
-        return self.db.query(CommandHistory).filter(CommandHistory.user_id == user_id).offset(skip).limit(limit).all()
+        result = await self.db.execute(
+            select(CommandHistory).where(CommandHistory.user_id == user_id).offset(skip).limit(limit)
+        )
+        return list(result.scalars().all())
 
-    def delete_command_history(self, user_id: int):
+    async def delete_command_history(self, user_id: int):
         """Deletes command history for a user."""
-        self.db.query(CommandHistory).filter(CommandHistory.user_id == user_id).delete()
-        self.db.commit()
+        await self.db.execute(delete(CommandHistory).where(CommandHistory.user_id == user_id))
+        await self.db.commit()
 
-    def get_command(self, command_id: int) -> CommandHistory:
+    async def get_command(self, command_id: int) -> Optional[CommandHistory]:
         """Retrieves a command by ID."""
-        return self.db.query(CommandHistory).filter(CommandHistory.id == command_id).first()
+        return await self.db.get(CommandHistory, command_id)
 
-    def get_shared_commands(self) -> List[CommandHistory]:
+    async def share_command(self, command_id: int) -> Optional[CommandHistory]:
+        """Marks a command as shared."""
+        db_command = await self.get_command(command_id)
+        if db_command is None:
+            return None
+        db_command.is_shared = True
+        await self.db.commit()
+        return db_command
+
+    async def get_shared_commands(self) -> List[CommandHistory]:
         """Retrieves all shared commands."""
-        return self.db.query(CommandHistory).filter(CommandHistory.is_shared == True).all()
\ No newline at end of file
+        result = await self.db.execute(select(CommandHistory).where(CommandHistory.is_shared == True))
+        return list(result.scalars().all())
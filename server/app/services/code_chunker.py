@@ -1,3 +1,4 @@
+import asyncio
 import os
 import re
 import ast
@@ -17,7 +18,7 @@ class CodeMetadata(BaseModel):
     name: Optional[str] = None             # Name (e.g., function name, class name)
     documentation: Optional[str] = None    # Associated documentation
     imports: List[str] = []                # Import statements
-    complexity: Optional[int] = None       # Cyclomatic complexity
+    complexity: Optional[Union[int, Dict[str, int]]] = None  # Cyclomatic complexity, or metrics from _calculate_complexity
     last_modified: Optional[datetime] = None  # Last modification timestamp
     author: Optional[str] = None           # Author from git blame
     relations: List[CodeRelation] = []     # Related code chunks
@@ -32,10 +33,21 @@ class CodeChunk(BaseModel):
     line_start: int
     line_end: int
     language: str
+    repository: Optional[str] = None  # Repository name, used to pick the storage shard
     metadata: CodeMetadata = CodeMetadata()
     embedding: Optional[List[float]] = None
     ast: Optional[str] = None
     
+def _python_docstring(source: str) -> Optional[str]:
+    """Docstring of the single top-level definition in ``source``, if any"""
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        return None
+    if tree.body and isinstance(tree.body[0], (ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+        return ast.get_docstring(tree.body[0])
+    return None
+    
 class CodeChunkerService:
     """Service for extracting code chunks and metadata from source code files"""
     
@@ -57,12 +69,16 @@ class CodeChunkerService:
         }
     
     async def process_file(self, file_path: str) -> List[CodeChunk]:
-        """Process a file to extract code chunks"""
+        """Process a file to extract code chunks, parsing on a worker thread"""
+        return await asyncio.to_thread(self._process_file, file_path)
+    
+    def _process_file(self, file_path: str) -> List[CodeChunk]:
+        """Process a file to extract code chunks; blocks on file I/O, parsing and git"""
         ext = os.path.splitext(file_path)[1].lower()
         language = self.supported_languages.get(ext)
         
         if not language:
-            return await self._process_generic_file(file_path, ext[1:] if ext else 'unknown')
+            return self._process_generic_file(file_path, ext[1:] if ext else 'unknown')
             
         processor_map = {
             'python': self._process_python_file,
@@ -71,25 +87,25 @@ class CodeChunkerService:
         }
         
         processor = processor_map.get(language, self._process_generic_file)
-        chunks = await processor(file_path)
+        chunks = processor(file_path)
         
         # Extract additional metadata for each chunk
         for chunk in chunks:
             # Get Git metadata
-            git_metadata = await self._extract_git_metadata(chunk)
+            git_metadata = self._extract_git_metadata(chunk)
             chunk.metadata.git = git_metadata
             
             # Extract relations
-            relations = await self._extract_relations(chunk)
+            relations = self._extract_relations(chunk)
             chunk.metadata.relations = [relation.dict() for relation in relations]
             
             # Extract complexity metrics
-            complexity = await self._calculate_complexity(chunk)
+            complexity = self._calculate_complexity(chunk)
             chunk.metadata.complexity = complexity
             
         return chunks
         
-    async def _calculate_complexity(self, chunk: CodeChunk) -> Dict[str, Any]:
+    def _calculate_complexity(self, chunk: CodeChunk) -> Dict[str, Any]:
         """Calculate complexity metrics for a code chunk"""
         metrics = {
             'lines': len(chunk.content.splitlines()),
@@ -113,6 +129,9 @@ class CodeChunkerService:
     
     async def extract_metadata(self, code_chunk: CodeChunk) -> CodeMetadata:
         """Extract metadata from a code chunk"""
+        return await asyncio.to_thread(self._extract_metadata, code_chunk)
+    
+    def _extract_metadata(self, code_chunk: CodeChunk) -> CodeMetadata:
         metadata = CodeMetadata()
         
         # Extract various metadata based on the language
@@ -125,19 +144,19 @@ class CodeChunkerService:
         metadata.documentation = self._extract_documentation(code_chunk)
         
         # Extract imports
-        metadata.imports = await self._extract_imports(code_chunk)
+        metadata.imports = self._extract_imports(code_chunk)
         
         # Extract complexity
-        metadata.complexity = await self._calculate_complexity(code_chunk)
+        metadata.complexity = self._calculate_complexity(code_chunk)
         
         # Git metadata (if available)
-        git_metadata = await self._extract_git_metadata(code_chunk)
+        git_metadata = self._extract_git_metadata(code_chunk)
         if git_metadata:
             metadata.last_modified = git_metadata.get('last_modified')
             metadata.author = git_metadata.get('author')
             
         # Extract relations
-        metadata.relations = await self._extract_relations(code_chunk)
+        metadata.relations = self._extract_relations(code_chunk)
         
         return metadata
     
@@ -165,7 +184,7 @@ class CodeChunkerService:
         
         return None
     
-    async def _extract_imports(self, code_chunk: CodeChunk) -> List[str]:
+    def _extract_imports(self, code_chunk: CodeChunk) -> List[str]:
         """Extract import statements from code chunk"""
         content = code_chunk.content
         language = code_chunk.language
@@ -208,7 +227,7 @@ class CodeChunkerService:
         
         return imports
     
-    async def _extract_git_metadata(self, code_chunk: CodeChunk) -> Dict[str, Any]:
+    def _extract_git_metadata(self, code_chunk: CodeChunk) -> Dict[str, Any]:
         """Extract Git metadata for the code chunk"""
         try:
             file_path = os.path.abspath(code_chunk.file_path)
@@ -239,13 +258,13 @@ class CodeChunkerService:
             
         return {}
     
-    async def _extract_relations(self, code_chunk: CodeChunk) -> List[CodeRelation]:
+    def _extract_relations(self, code_chunk: CodeChunk) -> List[CodeRelation]:
         """Extract relationships between this chunk and other code elements"""
         # This would be expanded based on the codebase's specific needs
         # For example, detecting function calls, class inheritance, etc.
         return []
         
-    async def _process_python_file(self, file_path: str) -> List[CodeChunk]:
+    def _process_python_file(self, file_path: str) -> List[CodeChunk]:
         """Process Python file to extract code chunks"""
         chunks = []
         
@@ -253,70 +272,50 @@ class CodeChunkerService:
             with open(file_path, 'r', encoding='utf-8') as f:
                 content = f.read()
             
-            from tree_sitter import Parser
+            from tree_sitter_languages import get_parser
             
-            parser = Parser()
-            parser.set_language("python")
-            tree = parser.parse(bytes(content, "utf8"))
+            tree = get_parser("python").parse(bytes(content, "utf8"))
             root_node = tree.root_node
+            lines = content.split('\n')
+            occurrences: Dict[str, int] = {}
 
             for node in root_node.children:
-                chunk_id = f"{file_path}:{id(node)}"
+                definition = node.child_by_field_name("definition") if node.type == "decorated_definition" else node
+                if definition is None or definition.type not in ("class_definition", "function_definition"):
+                    continue
                 
-                if node.type == "class_definition":
-                    # Extract class definition
-                    start_line = node.start_point[0] + 1
-                    end_line = node.end_point[0] + 1
-                    class_content = '\\n'.join(content.split('\\n')[start_line-1:end_line])
-                    
-                    # Extract docstring
-                    docstring = ast.get_docstring(node)
-                    
-                    chunks.append(CodeChunk(
-                        id=chunk_id,
-                        content=class_content,
-                        type="class",
-                        file_path=file_path,
-                        line_start=start_line,
-                        line_end=end_line,
-                        language="python",
-                        metadata=CodeMetadata(
-                            name=node.name,
-                            documentation=docstring
-                        ),
-                        ast=str(node.sexp())  # Store AST as string
-                    ))
-                    
-                elif node.type == "function_definition":
-                    # Extract function definition
-                    start_line = node.start_point[0] + 1
-                    end_line = node.end_lineno if hasattr(node, 'end_lineno') else start_line
-                    func_content = '\\n'.join(content.split('\\n')[start_line-1:end_line])
-                    
-                    # Extract docstring
-                    docstring = ast.get_docstring(node)
-                    
-                    chunks.append(CodeChunk(
-                        id=chunk_id,
-                        content=func_content,
-                        type="function",
-                        file_path=file_path,
-                        line_start=start_line,
-                        line_end=end_line,
-                        language="python",
-                        metadata=CodeMetadata(
-                            name=node.name,
-                            documentation=docstring
-                        ),
-                        ast=str(node.sexp())
-                    ))
+                name = definition.child_by_field_name("name").text.decode()
+                start_line = node.start_point[0] + 1
+                end_line = node.end_point[0] + 1
+                chunk_content = '\n'.join(lines[start_line-1:end_line])
+                
+                # Ids come from the symbol name rather than the parse, so re-processing
+                # a file overwrites its chunks even when their lines move
+                occurrence = occurrences.get(name, 0)
+                occurrences[name] = occurrence + 1
+                chunk_id = f"{file_path}:{name}" + (f"#{occurrence}" if occurrence else "")
+                
+                chunks.append(CodeChunk(
+                    id=chunk_id,
+                    content=chunk_content,
+                    type="class" if definition.type == "class_definition" else "function",
+                    file_path=file_path,
+                    line_start=start_line,
+                    line_end=end_line,
+                    language="python",
+                    metadata=CodeMetadata(
+                        name=name,
+                        documentation=_python_docstring(chunk_content)
+                    ),
+                    ast=str(node.sexp())  # Store AST as string
+                ))
                     
         except Exception as e:
             print(f"Error processing file: {file_path} - {e}")
             
         return chunks
 
-    async def _process_js_file(self, file_path: str) -> List[CodeChunk]:
+    def _process_js_file(self, file_path: str) -> List[CodeChunk]:
         """Process JavaScript/TypeScript file to extract code chunks"""
         chunks = []
         
@@ -385,7 +384,7 @@ class CodeChunkerService:
             
         return chunks
 
-    async def _process_generic_file(self, file_path: str, language: str) -> List[CodeChunk]:
+    def _process_generic_file(self, file_path: str, language: str) -> List[CodeChunk]:
         """Process any supported file to extract basic code chunks"""
         chunks = []
         
@@ -1,5 +1,12 @@
 import tokenize
 import io
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+_IDENTIFIER = re.compile(r'[A-Za-z_][A-Za-z0-9_]*')
+_CAMEL_PART = re.compile(r'[A-Z]+(?=[A-Z][a-z]|[0-9]|$)|[A-Z]?[a-z]+|[A-Z]+|[0-9]+')
 
 def tokenize_code(code_string):
     """
@@ -11,14 +18,43 @@ def tokenize_code(code_string):
         for token in tokenize.generate_tokens(string_io.readline):
             tokens.append(token.string)
     except tokenize.TokenError as e:
-        print(f"Error tokenizing code: {e}")
+        # Expected for non-Python input; callers fall back to a regex scan
+        logger.debug(f"Error tokenizing code: {e}")
         return []
     return tokens
 
-if __name__ == '__main__':
-    test_code = """
-    def hello_world():
-        print("Hello, world!")
+def split_identifier(identifier):
+    """
+    Splits a camelCase, PascalCase or snake_case identifier into lowercase parts.
+    """
+    parts = []
+    for piece in identifier.split('_'):
+        parts.extend(match.group(0).lower() for match in _CAMEL_PART.finditer(piece))
+    return parts
+
+def tokenize_identifiers(code_string):
     """
-    tokens = tokenize_code(test_code)
-    print(tokens)
\ No newline at end of file
+    Tokenizes code (or a search query) into lowercase terms for lexical indexing.
+
+    Each identifier is emitted whole and as its camelCase/snake_case parts, so
+    `get_knowledge_item` matches queries for `get_knowledge_item`, `knowledge`
+    or `KnowledgeItem`. Falls back to a regex scan when the input is not valid
+    Python.
+    """
+    try:
+        tokens = tokenize_code(code_string)
+    except (SyntaxError, IndentationError):
+        tokens = []
+    if not tokens:
+        tokens = _IDENTIFIER.findall(code_string)
+
+    terms = []
+    for token in tokens:
+        for identifier in _IDENTIFIER.findall(token):
+            lowered = identifier.lower()
+            terms.append(lowered)
+            parts = split_identifier(identifier)
+            if len(parts) > 1:
+                terms.extend(parts)
+    return terms
+
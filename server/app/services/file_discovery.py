@@ -0,0 +1,279 @@
+import fnmatch
+import os
+import queue
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, NamedTuple, Optional, Pattern, Sequence, Tuple
+
+from ..config import get_settings
+
+settings = get_settings()
+
+# Bytes that commonly appear in text files besides printable ASCII
+_TEXT_CHARACTERS = bytes(range(32, 127)) + b'\n\r\t\f\b\x1b'
+
+
+class DiscoveredFile(NamedTuple):
+    """A source file found during discovery, with the stat info from the directory scan"""
+    path: str
+    stat: os.stat_result
+
+
+class _IgnoreRule(NamedTuple):
+    regex: Pattern[str]
+    negate: bool
+    dir_only: bool
+
+
+# (directory relative to the discovery root, rules from that directory's .gitignore)
+_IgnoreLayer = Tuple[str, List[_IgnoreRule]]
+
+
+def _glob_to_regex(pattern: str) -> str:
+    """Translate a gitignore glob into a regex over '/'-separated relative paths"""
+    regex = []
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith('**/', i):
+            regex.append('(?:.*/)?')
+            i += 3
+        elif pattern.startswith('/**', i) and i + 3 == len(pattern):
+            regex.append('/.*')
+            i += 3
+        elif pattern[i] == '*':
+            regex.append('[^/]*')
+            i += 1
+        elif pattern[i] == '?':
+            regex.append('[^/]')
+            i += 1
+        elif pattern[i] == '[':
+            end = pattern.find(']', i + 1)
+            if end == -1:
+                regex.append(re.escape(pattern[i]))
+                i += 1
+            else:
+                regex.append(pattern[i:end + 1].replace('[!', '[^'))
+                i = end + 1
+        else:
+            regex.append(re.escape(pattern[i]))
+            i += 1
+    return ''.join(regex)
+
+
+def parse_gitignore(lines: Sequence[str]) -> List[_IgnoreRule]:
+    """Parse .gitignore lines into match rules"""
+    rules = []
+    for line in lines:
+        line = line.rstrip('\n').rstrip()
+        if not line or line.startswith('#'):
+            continue
+
+        negate = line.startswith('!')
+        if negate:
+            line = line[1:]
+        line = line.replace('\\#', '#').replace('\\!', '!')
+
+        dir_only = line.endswith('/')
+        line = line.rstrip('/')
+        if not line:
+            continue
+
+        # Patterns containing a slash are anchored to the .gitignore's directory
+        if '/' in line:
+            regex = '^' + _glob_to_regex(line.lstrip('/')) + '$'
+        else:
+            regex = '^(?:.*/)?' + _glob_to_regex(line) + '$'
+        rules.append(_IgnoreRule(re.compile(regex), negate, dir_only))
+    return rules
+
+
+def _is_ignored(relative_path: str, is_dir: bool, layers: Sequence[_IgnoreLayer]) -> bool:
+    """Apply .gitignore layers from the root down; the last matching rule wins"""
+    ignored = False
+    for base, rules in layers:
+        if base:
+            if not relative_path.startswith(base + '/'):
+                continue
+            path = relative_path[len(base) + 1:]
+        else:
+            path = relative_path
+        for rule in rules:
+            if rule.dir_only and not is_dir:
+                continue
+            if rule.regex.match(path):
+                ignored = not rule.negate
+    return ignored
+
+
+def is_binary_file(path: str, sniff_bytes: int) -> bool:
+    """Guess whether a file is binary from its first ``sniff_bytes`` bytes"""
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(sniff_bytes)
+    except OSError:
+        return True
+
+    if not head:
+        return False
+    if b'\0' in head:
+        return True
+    # Treat as binary when more than 30% of bytes are non-text (UTF-8 multibyte allowed)
+    non_text = head.translate(None, _TEXT_CHARACTERS + bytes(range(128, 256)))
+    return len(non_text) / len(head) > 0.3
+
+
+class FileDiscovery:
+    """Fast, .gitignore-aware source file enumerator built on os.scandir.
+
+    Directories matching the exclude list or any .gitignore rule are pruned
+    without being descended into. Files larger than the size cap or that look
+    binary are skipped. Top-level directories can be walked in parallel, and
+    results are yielded lazily together with the stat info from the scan.
+    """
+
+    def __init__(
+        self,
+        exclude: Optional[Sequence[str]] = None,
+        max_file_size: Optional[int] = None,
+        sniff_bytes: Optional[int] = None,
+        workers: Optional[int] = None,
+        use_gitignore: bool = True
+    ):
+        self.exclude = list(settings.DISCOVERY_EXCLUDE if exclude is None else exclude)
+        self.max_file_size = settings.DISCOVERY_MAX_FILE_SIZE if max_file_size is None else max_file_size
+        self.sniff_bytes = settings.DISCOVERY_SNIFF_BYTES if sniff_bytes is None else sniff_bytes
+        self.workers = settings.DISCOVERY_WORKERS if workers is None else workers
+        self.use_gitignore = use_gitignore
+
+    def _excluded(self, name: str) -> bool:
+        return any(fnmatch.fnmatch(name, pattern) for pattern in self.exclude)
+
+    def _layers_for(
+        self,
+        directory: str,
+        relative_dir: str,
+        layers: List[_IgnoreLayer]
+    ) -> List[_IgnoreLayer]:
+        """Extend the inherited layers with this directory's .gitignore, if any"""
+        if not self.use_gitignore:
+            return layers
+        gitignore = os.path.join(directory, '.gitignore')
+        try:
+            with open(gitignore, 'r', encoding='utf-8', errors='ignore') as f:
+                rules = parse_gitignore(f.readlines())
+        except OSError:
+            return layers
+        return layers + [(relative_dir, rules)] if rules else layers
+
+    def _scan(
+        self,
+        directory: str,
+        relative_dir: str,
+        layers: List[_IgnoreLayer],
+        recurse: bool = True
+    ) -> Iterator[Tuple[os.DirEntry, str]]:
+        """Yield (entry, relative path) for every non-ignored entry below a directory"""
+        layers = self._layers_for(directory, relative_dir, layers)
+        try:
+            with os.scandir(directory) as entries:
+                entries = list(entries)
+        except OSError:
+            return
+
+        for entry in entries:
+            if self._excluded(entry.name):
+                continue
+            relative_path = f"{relative_dir}/{entry.name}" if relative_dir else entry.name
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                continue
+            if _is_ignored(relative_path, is_dir, layers):
+                continue
+            if is_dir:
+                if recurse:
+                    yield from self._scan(entry.path, relative_path, layers)
+                else:
+                    yield entry, relative_path
+            elif entry.is_file(follow_symlinks=False):
+                yield entry, relative_path
+
+    def _accept(self, entry: os.DirEntry) -> Optional[DiscoveredFile]:
+        """Apply the size cap and binary sniff to a file entry"""
+        try:
+            stat = entry.stat(follow_symlinks=False)
+        except OSError:
+            return None
+        if stat.st_size > self.max_file_size:
+            return None
+        if is_binary_file(entry.path, self.sniff_bytes):
+            return None
+        return DiscoveredFile(entry.path, stat)
+
+    def _walk(self, directory: str, relative_dir: str, layers: List[_IgnoreLayer]) -> Iterator[DiscoveredFile]:
+        for entry, _ in self._scan(directory, relative_dir, layers):
+            discovered = self._accept(entry)
+            if discovered is not None:
+                yield discovered
+
+    def discover(self, root: str = ".") -> Iterator[DiscoveredFile]:
+        """Lazily yield source files below ``root``"""
+        if self.workers <= 1:
+            yield from self._walk(root, "", [])
+            return
+
+        # Handle top-level files here and fan top-level directories out to workers
+        layers = self._layers_for(root, "", [])
+        directories = []
+        for entry, relative_path in self._scan(root, "", [], recurse=False):
+            if entry.is_dir(follow_symlinks=False):
+                directories.append((entry.path, relative_path))
+            else:
+                discovered = self._accept(entry)
+                if discovered is not None:
+                    yield discovered
+
+        if not directories:
+            return
+
+        results: "queue.Queue[Optional[DiscoveredFile]]" = queue.Queue(maxsize=1024)
+        stop = threading.Event()
+
+        def put(item: Optional[DiscoveredFile]) -> bool:
+            # Give up once the consumer has stopped iterating
+            while not stop.is_set():
+                try:
+                    results.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def walk_directory(directory: str, relative_dir: str) -> None:
+            try:
+                for discovered in self._walk(directory, relative_dir, layers):
+                    if not put(discovered):
+                        return
+            finally:
+                put(None)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for directory, relative_dir in directories:
+                executor.submit(walk_directory, directory, relative_dir)
+
+            try:
+                remaining = len(directories)
+                while remaining:
+                    discovered = results.get()
+                    if discovered is None:
+                        remaining -= 1
+                    else:
+                        yield discovered
+            finally:
+                stop.set()
+
+
+def discover_files(root: str = ".", **options) -> Iterator[DiscoveredFile]:
+    """Lazily yield source files below ``root`` using the configured discovery settings"""
+    return FileDiscovery(**options).discover(root)
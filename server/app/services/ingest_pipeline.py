@@ -0,0 +1,209 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Set
+
+from ..config import get_settings
+from ..core.monitoring import (
+    PIPELINE_ERRORS,
+    PIPELINE_ITEMS,
+    PIPELINE_QUEUE_DEPTH,
+    PIPELINE_STAGE_LATENCY,
+)
+from ..models.code import CodeChunk
+from .code_chunker import CodeChunkerService
+from .file_discovery import discover_files
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Sentinel telling a stage worker that its input is exhausted
+_DONE = object()
+
+
+def _item_files(item: Any) -> List[str]:
+    """Files a stage input was derived from: a path, a chunk or a batch of chunks"""
+    if isinstance(item, str):
+        return [item]
+    if isinstance(item, list):
+        return sorted({chunk.file_path for chunk in item})
+    return [item.file_path]
+
+
+class _Stage(NamedTuple):
+    name: str
+    # Handle one input item and return the items to pass downstream
+    handler: Callable[[Any], Awaitable[List[Any]]]
+    workers: int
+    # Called once all input is handled, to flush buffered items downstream
+    finish: Optional[Callable[[], Awaitable[List[Any]]]] = None
+
+
+class IngestPipeline:
+    """Streams files through discover -> read -> parse -> dedupe -> embed -> upsert.
+
+    Stages are connected by bounded asyncio queues and each runs its own pool
+    of workers, so parsing, embedding and storing overlap instead of running
+    batch by batch. A full queue blocks the stage feeding it, which keeps
+    memory bounded when one stage is slower than the others. Blocking work
+    (parsing, the embedding model) runs on worker threads. A failing item is
+    dropped and its files are reported under ``failed`` in the result.
+    """
+
+    def __init__(
+        self,
+        vector_store: Any,
+        chunker: Optional[CodeChunkerService] = None,
+        read_workers: Optional[int] = None,
+        parse_workers: Optional[int] = None,
+        embed_workers: Optional[int] = None,
+        upsert_workers: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        embed_batch_size: Optional[int] = None
+    ):
+        self.vector_store = vector_store
+        self.chunker = chunker or CodeChunkerService()
+        self.queue_size = queue_size or settings.PIPELINE_QUEUE_SIZE
+        self.embed_batch_size = embed_batch_size or settings.PIPELINE_EMBED_BATCH_SIZE
+        self.stages = [
+            _Stage('discover', self._discover, 1),
+            _Stage('read', self._read, read_workers or settings.PIPELINE_READ_WORKERS),
+            _Stage('parse', self._parse, parse_workers or settings.PIPELINE_PARSE_WORKERS),
+            _Stage('dedupe', self._dedupe, 1, finish=self._flush_batch),
+            _Stage('embed', self._embed, embed_workers or settings.PIPELINE_EMBED_WORKERS),
+            _Stage('upsert', self._upsert, upsert_workers or settings.PIPELINE_UPSERT_WORKERS),
+        ]
+        self.seen_files: Set[str] = set()
+        self.seen_chunks: Set[str] = set()
+        self.batch: List[CodeChunk] = []
+        # Map of file path -> error for files a stage failed on
+        self.failed: Dict[str, str] = {}
+        # Map of stage name -> items handled, plus totals reported by run()
+        self.stats: Dict[str, int] = {}
+
+    async def _discover(self, path: str) -> List[str]:
+        if os.path.isdir(path):
+            discovered = await asyncio.to_thread(list, discover_files(path))
+            return [item.path for item in discovered]
+        if os.path.isfile(path):
+            return [path]
+        logger.warning(f"Skipping missing path: {path}")
+        return []
+
+    async def _read(self, path: str) -> List[str]:
+        path = os.path.abspath(path)
+        if path in self.seen_files:
+            return []
+        self.seen_files.add(path)
+        # Empty files have no chunks; the parse stage reads the file itself
+        size = await asyncio.to_thread(os.path.getsize, path)
+        if not size:
+            await self.vector_store.delete_stale_file_chunks(path, [])
+            return []
+        return [path]
+
+    async def _parse(self, path: str) -> List[CodeChunk]:
+        chunks = await self.chunker.process_file(path)
+        # Chunks of functions renamed or removed since the last ingest
+        await self.vector_store.delete_stale_file_chunks(path, [chunk.id for chunk in chunks])
+        return chunks
+
+    async def _dedupe(self, chunk: CodeChunk) -> List[List[CodeChunk]]:
+        if chunk.id in self.seen_chunks:
+            self.stats['duplicates'] = self.stats.get('duplicates', 0) + 1
+            return []
+        self.seen_chunks.add(chunk.id)
+        self.batch.append(chunk)
+        if len(self.batch) < self.embed_batch_size:
+            return []
+        return await self._flush_batch()
+
+    async def _flush_batch(self) -> List[List[CodeChunk]]:
+        batch, self.batch = self.batch, []
+        return [batch] if batch else []
+
+    async def _embed(self, batch: List[CodeChunk]) -> List[List[CodeChunk]]:
+        # Identical chunk bodies (copied helpers, boilerplate) are embedded once
+        unique: Dict[str, int] = {}
+        for chunk in batch:
+            unique.setdefault(chunk.content, len(unique))
+        embeddings = await self.vector_store.embed_documents(list(unique))
+        for chunk in batch:
+            chunk.embedding = embeddings[unique[chunk.content]]
+        return [batch]
+
+    async def _upsert(self, batch: List[CodeChunk]) -> List[Any]:
+        await self.vector_store.add_code_chunks(batch)
+        self.stats['chunks'] = self.stats.get('chunks', 0) + len(batch)
+        return []
+
+    async def _run_stage(
+        self,
+        stage: _Stage,
+        inbox: asyncio.Queue,
+        outbox: Optional[asyncio.Queue],
+        downstream_workers: int
+    ) -> None:
+        async def forward(items: List[Any]) -> None:
+            if outbox is not None:
+                for item in items:
+                    await outbox.put(item)
+
+        async def worker() -> None:
+            while True:
+                item = await inbox.get()
+                PIPELINE_QUEUE_DEPTH.labels(stage=stage.name).set(inbox.qsize())
+                if item is _DONE:
+                    return
+                start_time = time.perf_counter()
+                try:
+                    results = await stage.handler(item)
+                except Exception as e:
+                    PIPELINE_ERRORS.labels(stage=stage.name).inc()
+                    logger.error(f"Ingest pipeline stage {stage.name} failed: {e}")
+                    for file_path in _item_files(item):
+                        self.failed.setdefault(file_path, f"{stage.name}: {e}")
+                    continue
+                PIPELINE_STAGE_LATENCY.labels(stage=stage.name).observe(time.perf_counter() - start_time)
+                PIPELINE_ITEMS.labels(stage=stage.name).inc()
+                self.stats[stage.name] = self.stats.get(stage.name, 0) + 1
+                await forward(results)
+
+        await asyncio.gather(*[worker() for _ in range(stage.workers)])
+        if stage.finish is not None:
+            await forward(await stage.finish())
+        # Tell every downstream worker that this stage is done
+        if outbox is not None:
+            for _ in range(downstream_workers):
+                await outbox.put(_DONE)
+
+    async def run(self, paths: List[str]) -> Dict[str, Any]:
+        """Ingest files and directories, returning per-stage counts, timings and failed files"""
+        start_time = time.perf_counter()
+        source: asyncio.Queue = asyncio.Queue()
+        for path in paths:
+            source.put_nowait(path)
+        for _ in range(self.stages[0].workers):
+            source.put_nowait(_DONE)
+
+        queues = [source] + [asyncio.Queue(maxsize=self.queue_size) for _ in self.stages[1:]]
+        await asyncio.gather(*[
+            self._run_stage(
+                stage,
+                queues[i],
+                queues[i + 1] if i + 1 < len(queues) else None,
+                self.stages[i + 1].workers if i + 1 < len(self.stages) else 0
+            )
+            for i, stage in enumerate(self.stages)
+        ])
+
+        elapsed = time.perf_counter() - start_time
+        return {
+            'files': self.stats.get('parse', 0),
+            'chunks': self.stats.get('chunks', 0),
+            'duplicates': self.stats.get('duplicates', 0),
+            'failed': dict(self.failed),
+            'elapsed_seconds': round(elapsed, 3),
+            'stages': {stage.name: self.stats.get(stage.name, 0) for stage in self.stages},
+        }
@@ -0,0 +1,253 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Set
+
+from ..config import get_settings
+from ..core.notifications import ProgressStatus, progress_manager
+from ..models.code import CodeChunk
+from .code_chunker import CodeChunkerService
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+INGESTION_OPERATION = "code_ingestion"
+
+
+def _open_vector_store():
+    """Create the configured vector store backend"""
+    from ..dependencies import get_vector_store
+    return get_vector_store()
+
+
+class IngestionJobManager:
+    """Runs code ingestion as cancellable, resumable background jobs.
+
+    Each job chunks its files, writes the chunks to the vector store in
+    batches and reports per-file progress, throughput and ETA through the
+    ProgressManager. A JSON checkpoint of completed files is written after
+    every batch, so jobs interrupted by a restart resume where they left off.
+    """
+
+    def __init__(
+        self,
+        checkpoint_dir: Optional[str] = None,
+        max_concurrent_jobs: Optional[int] = None,
+        file_concurrency: Optional[int] = None,
+        batch_size: Optional[int] = None
+    ):
+        self.checkpoint_dir = checkpoint_dir or os.path.join(settings.VECTOR_DB_PATH, 'ingestion')
+        self.file_concurrency = file_concurrency or settings.INGESTION_FILE_CONCURRENCY
+        self.batch_size = batch_size or settings.INGESTION_BATCH_SIZE
+        self.max_concurrent_jobs = max_concurrent_jobs or settings.INGESTION_MAX_CONCURRENT_JOBS
+        self._slots: Optional[asyncio.Semaphore] = None
+        # Map of task_id -> running asyncio task
+        self.jobs: Dict[str, asyncio.Task] = {}
+        # Jobs canceled by a user, as opposed to interrupted by shutdown
+        self.canceled: Set[str] = set()
+
+    @property
+    def slots(self) -> asyncio.Semaphore:
+        # Created lazily so the semaphore binds to the running event loop
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrent_jobs)
+        return self._slots
+
+    def _checkpoint_path(self, task_id: str) -> str:
+        return os.path.join(self.checkpoint_dir, f"{task_id}.json")
+
+    def _save_checkpoint(self, checkpoint: Dict[str, Any]) -> None:
+        """Atomically persist a job checkpoint"""
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        path = self._checkpoint_path(checkpoint['task_id'])
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp_path, path)
+
+    def _remove_checkpoint(self, task_id: str) -> None:
+        try:
+            os.remove(self._checkpoint_path(task_id))
+        except FileNotFoundError:
+            pass
+
+    async def submit(self, file_paths: List[str], channel_id: str = INGESTION_OPERATION) -> str:
+        """Start an ingestion job and return its task id immediately"""
+        task_id = await progress_manager.create_task(
+            INGESTION_OPERATION,
+            channel_id,
+            total_steps=len(file_paths),
+            metadata={'files_total': len(file_paths)}
+        )
+        checkpoint = {
+            'task_id': task_id,
+            'channel_id': channel_id,
+            'file_paths': list(file_paths),
+            'completed': [],
+            'failed': {},
+            'chunks': 0,
+        }
+        self._save_checkpoint(checkpoint)
+        self._start(checkpoint)
+        return task_id
+
+    def _start(self, checkpoint: Dict[str, Any]) -> None:
+        task_id = checkpoint['task_id']
+        job = asyncio.create_task(self._run(checkpoint))
+        self.jobs[task_id] = job
+        job.add_done_callback(lambda _: self.jobs.pop(task_id, None))
+
+    async def cancel(self, task_id: str) -> bool:
+        """Cancel a queued or running job; returns False if it is not running"""
+        job = self.jobs.get(task_id)
+        if job is None or job.done():
+            return False
+        self.canceled.add(task_id)
+        job.cancel()
+        return True
+
+    async def resume_pending(self) -> int:
+        """Restart jobs left unfinished by a previous process; returns how many"""
+        if not os.path.isdir(self.checkpoint_dir):
+            return 0
+
+        resumed = 0
+        for name in sorted(os.listdir(self.checkpoint_dir)):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.checkpoint_dir, name), 'r', encoding='utf-8') as f:
+                    checkpoint = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.error(f"Unreadable ingestion checkpoint {name}: {e}")
+                continue
+
+            task_id = checkpoint['task_id']
+            if task_id in self.jobs:
+                continue
+            done = len(checkpoint['completed']) + len(checkpoint['failed'])
+            await progress_manager.create_task(
+                INGESTION_OPERATION,
+                checkpoint['channel_id'],
+                total_steps=len(checkpoint['file_paths']),
+                metadata={'files_total': len(checkpoint['file_paths']), 'resumed': True},
+                task_id=task_id
+            )
+            await progress_manager.update_progress(
+                task_id, progress=done, message=f"Resuming after {done} files"
+            )
+            self._start(checkpoint)
+            resumed += 1
+
+        if resumed:
+            logger.info(f"Resumed {resumed} ingestion jobs")
+        return resumed
+
+    async def _run(self, checkpoint: Dict[str, Any]) -> None:
+        task_id = checkpoint['task_id']
+        try:
+            async with self.slots:
+                await progress_manager.update_progress(
+                    task_id, status=ProgressStatus.RUNNING, message="Ingestion started"
+                )
+                await self._ingest(checkpoint)
+        except asyncio.CancelledError:
+            if task_id in self.canceled:
+                self.canceled.discard(task_id)
+                self._remove_checkpoint(task_id)
+                await progress_manager.update_progress(
+                    task_id, status=ProgressStatus.CANCELED, message="Ingestion canceled"
+                )
+            # Otherwise the server is shutting down; keep the checkpoint to resume
+            raise
+        except Exception as e:
+            logger.exception(f"Ingestion job {task_id} failed: {e}")
+            self._remove_checkpoint(task_id)
+            await progress_manager.update_progress(
+                task_id, status=ProgressStatus.FAILED, message=f"Ingestion failed: {e}"
+            )
+            return
+
+        self._remove_checkpoint(task_id)
+        await progress_manager.update_progress(
+            task_id,
+            status=ProgressStatus.COMPLETED,
+            message=(
+                f"Ingested {checkpoint['chunks']} chunks from "
+                f"{len(checkpoint['completed'])} files ({len(checkpoint['failed'])} failed)"
+            )
+        )
+
+    async def _ingest(self, checkpoint: Dict[str, Any]) -> None:
+        """Chunk pending files and write them to the vector store in batches"""
+        task_id = checkpoint['task_id']
+        done = set(checkpoint['completed']) | set(checkpoint['failed'])
+        pending = [path for path in checkpoint['file_paths'] if path not in done]
+        total = len(checkpoint['file_paths'])
+
+        chunker = CodeChunkerService()
+        vector_store = _open_vector_store()
+        await vector_store.initialize()
+
+        buffered: List[CodeChunk] = []
+        buffered_files: List[str] = []
+        processed = 0
+        start_time = time.monotonic()
+
+        async def chunk_file(file_path: str) -> Optional[List[CodeChunk]]:
+            try:
+                chunks = await chunker.process_file(file_path)
+                # Chunks of functions renamed or removed since the last ingest
+                await vector_store.delete_stale_file_chunks(file_path, [chunk.id for chunk in chunks])
+                return chunks
+            except Exception as e:
+                logger.warning(f"Failed to chunk {file_path}: {e}")
+                checkpoint['failed'][file_path] = str(e)
+                return None
+
+        async def flush() -> None:
+            # Files only count as completed once their chunks are stored
+            if buffered:
+                await vector_store.add_code_chunks(buffered)
+                checkpoint['chunks'] += len(buffered)
+            checkpoint['completed'].extend(buffered_files)
+            buffered.clear()
+            buffered_files.clear()
+            self._save_checkpoint(checkpoint)
+
+        for i in range(0, len(pending), self.file_concurrency):
+            window = pending[i:i + self.file_concurrency]
+            results = await asyncio.gather(*[chunk_file(path) for path in window])
+
+            for file_path, chunks in zip(window, results):
+                if chunks is not None:
+                    buffered.extend(chunks)
+                    buffered_files.append(file_path)
+            if len(buffered) >= self.batch_size:
+                await flush()
+
+            processed += len(window)
+            elapsed = time.monotonic() - start_time
+            files_per_second = processed / elapsed if elapsed > 0 else 0.0
+            remaining = len(pending) - processed
+            await progress_manager.update_progress(
+                task_id,
+                increment=len(window),
+                message=f"Processed {window[-1]}",
+                metadata={
+                    'current_file': window[-1],
+                    'files_done': total - remaining,
+                    'files_failed': len(checkpoint['failed']),
+                    'chunks': checkpoint['chunks'] + len(buffered),
+                    'files_per_second': round(files_per_second, 2),
+                    'eta_seconds': round(remaining / files_per_second, 1) if files_per_second else None,
+                }
+            )
+
+        await flush()
+
+
+# Global ingestion job manager instance
+ingestion_manager = IngestionJobManager()
@@ -1,25 +1,133 @@
-from typing import Dict, List, Optional, Any, Union
-from datetime import datetime
+from typing import AsyncIterable, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Any, Tuple, Union
+from datetime import datetime, timezone
 import re
 import json
 from uuid import uuid4
-from sqlalchemy.orm import Session
-from sqlalchemy import select, and_, or_, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from collections import Counter
+from sqlalchemy import Integer, Select, String, cast, column, delete, func, literal, literal_column, select, table, and_, or_, text, union_all
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
+from ..config import get_settings
 from ..models.knowledge import (
     KnowledgeItem, 
     KnowledgeSourceModel, 
     KnowledgeItemModel, 
     KnowledgeRelationModel, 
     knowledge_relation,
-    entity_knowledge
+    knowledge_tag,
+    knowledge_tag_count,
+    knowledge_lsh_bucket,
+    entity_knowledge,
+    normalize_tags
 )
-from .vector_store import VectorStoreService
+from .lexical_index import reciprocal_rank_fusion_scores
+from .knowledge_graph import knowledge_graph
+from .near_duplicates import content_hash, jaccard, minhasher
+from .section_splitter import SectionSplitter, iter_text_lines, split_sections
+from .vector_store import VectorDocument, VectorStoreService
+from ..core.query_cache import query_cache
+
+settings = get_settings()
+
+
+def _epoch(value: datetime) -> float:
+    """Seconds since the epoch, reading naive datetimes as UTC"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def build_knowledge_where(
+    types: Optional[List[str]] = None,
+    subtypes: Optional[List[str]] = None,
+    source_types: Optional[List[str]] = None,
+    min_confidence: float = 0.0,
+    time_range: Optional[Dict[str, datetime]] = None,
+    ids: Optional[List[int]] = None
+) -> Optional[dict]:
+    """Translate knowledge search filters into a Chroma-style where clause"""
+    conditions = []
+    if types:
+        conditions.append({"type": {"$in": types}})
+    if subtypes:
+        conditions.append({"subtype": {"$in": subtypes}})
+    if source_types:
+        conditions.append({"source_type": {"$in": source_types}})
+    if min_confidence > 0:
+        conditions.append({"confidence": {"$gte": min_confidence}})
+    if time_range:
+        if time_range.get("start"):
+            conditions.append({"source_timestamp": {"$gte": _epoch(time_range["start"])}})
+        if time_range.get("end"):
+            conditions.append({"source_timestamp": {"$lte": _epoch(time_range["end"])}})
+    if ids is not None:
+        conditions.append({"id": {"$in": ids}})
+
+    if not conditions:
+        return None
+    if len(conditions) == 1:
+        return conditions[0]
+    return {"$and": conditions}
+
+def _chunks(values, size: int = 500) -> List[list]:
+    """Split values into lists small enough for one IN clause (SQLite caps bound parameters)"""
+    values = list(values)
+    return [values[i:i + size] for i in range(0, len(values), size)]
+
+
+def apply_knowledge_filters(
+    statement: Select,
+    types: Optional[List[str]] = None,
+    subtypes: Optional[List[str]] = None,
+    tags: Optional[List[str]] = None,
+    source_types: Optional[List[str]] = None,
+    min_confidence: float = 0.0,
+    time_range: Optional[Dict[str, datetime]] = None
+) -> Select:
+    """Apply knowledge search filters to a SELECT over KnowledgeItem"""
+    if types:
+        statement = statement.where(KnowledgeItem.type.in_(types))
+    if subtypes:
+        statement = statement.where(KnowledgeItem.subtype.in_(subtypes))
+    if source_types:
+        statement = statement.where(KnowledgeItem.source_type.in_(source_types))
+    if min_confidence > 0:
+        statement = statement.where(KnowledgeItem.confidence >= min_confidence)
+    if time_range:
+        if time_range.get("start"):
+            statement = statement.where(KnowledgeItem.source_timestamp >= time_range["start"])
+        if time_range.get("end"):
+            statement = statement.where(KnowledgeItem.source_timestamp <= time_range["end"])
+    if tags:
+        # Items carrying any of the tags, via the knowledge_tag primary key
+        statement = statement.where(KnowledgeItem.id.in_(
+            select(knowledge_tag.c.knowledge_id).where(knowledge_tag.c.tag.in_(tags))
+        ))
+    return statement
+
+
+_FTS_TERM = re.compile(r'"([^"]+)"|(\S+)')
+
+
+def fts5_query(query: str) -> str:
+    """Quote a user query for FTS5 MATCH, so every word and "quoted phrase" must appear.
+    
+    Quoting keeps FTS5 operators and punctuation in error messages or config
+    keys from being parsed as query syntax.
+    """
+    terms = []
+    for phrase, word in _FTS_TERM.findall(query):
+        term = (phrase or word).replace('"', '""')
+        terms.append(f'"{term}"')
+    return " ".join(terms)
 
 class KnowledgeService:
     """Service for managing knowledge items, relationships, and extraction"""
     
-    def __init__(self, db: Session, vector_store: VectorStoreService):
+    def __init__(self, db: AsyncSession, vector_store: VectorStoreService):
         self.db = db
         self.vector_store = vector_store
         self.collection_name = "knowledge_items"
@@ -39,32 +147,16 @@ class KnowledgeService:
         confidence: float = 1.0,
         relations: List[KnowledgeRelationModel] = []
     ) -> KnowledgeItem:
-        """Create a new knowledge item"""
-        # Create knowledge item in database
-        item = KnowledgeItem(
-            content=content,
-            type=type,
-            subtype=subtype,
-            source_type=source.type,
-            source_identifier=source.identifier,
-            source_url=source.url,
-            source_author=source.author,
-            source_timestamp=source.timestamp,
-            tags=tags,
-            metadata=metadata,
-            confidence=confidence
-        )
-        
-        self.db.add(item)
-        self.db.commit()
-        self.db.refresh(item)
-        
-        # Generate embedding and store in vector DB
-        embedding_id = await self._add_to_vector_store(item)
-        
-        # Update with embedding ID
-        item.embedding_id = embedding_id
-        self.db.commit()
+        """Create a new knowledge item, or merge it into an existing duplicate"""
+        items = await self.create_knowledge_items_bulk([{
+            "content": content,
+            "type": type,
+            "subtype": subtype,
+            "tags": tags,
+            "metadata": metadata,
+            "confidence": confidence
+        }], source)
+        item = items[0]
         
         # Create relationships if provided
         if relations:
@@ -72,11 +164,8 @@ class KnowledgeService:
         
         return item
     
-    async def _add_to_vector_store(self, item: KnowledgeItem) -> str:
-        """Add knowledge item to vector store"""
-        embedding_id = str(uuid4())
-        
-        # Prepare metadata for vector store
+    def _vector_document(self, item: KnowledgeItem) -> VectorDocument:
+        """Build the vector store document for a knowledge item"""
         metadata = {
             "id": item.id,
             "type": item.type,
@@ -85,26 +174,317 @@ class KnowledgeService:
             "source_identifier": item.source_identifier,
             "tags": json.dumps(item.tags),
             "confidence": item.confidence,
+            # Epoch seconds, so time ranges can be filtered in the vector store
+            "source_timestamp": _epoch(item.source_timestamp) if item.source_timestamp else None,
             "created_at": item.created_at.isoformat()
         }
         
-        # Add to vector store
-        await self.vector_store.add_documents(
-            self.collection_name,
-            [
-                {
-                    "id": embedding_id,
-                    "text": item.content,
-                    "metadata": metadata
-                }
+        # Vector stores only accept scalar, non-null metadata values
+        return VectorDocument(
+            id=item.embedding_id,
+            text=item.content,
+            metadata={key: value for key, value in metadata.items() if value is not None}
+        )
+    
+    async def create_knowledge_items_bulk(
+        self,
+        items: List[Dict[str, Any]],
+        source: KnowledgeSourceModel
+    ) -> List[KnowledgeItem]:
+        """Create many knowledge items from one source in a single transaction.
+        
+        Each entry holds ``content`` plus optional ``type``, ``subtype``,
+        ``tags``, ``metadata`` and ``confidence``. Entries duplicating an
+        existing item (same content hash, or shingle Jaccard similarity of at
+        least ``KNOWLEDGE_DEDUP_THRESHOLD``) are merged into that item instead
+        of creating a row and a vector. The remaining rows are inserted with
+        one flush, embedded in one batch and written to the vector store in
+        one call, and the transaction commits only once the vectors are
+        stored, so a failure leaves neither side half-written.
+        
+        Returns the created and merged items in input order, each once.
+        """
+        if not items:
+            return []
+        
+        targets = await self._find_duplicates([entry["content"] for entry in items])
+        
+        rows: List[KnowledgeItem] = []
+        keys_by_row: Dict[int, List[int]] = {}
+        merged_tags: Dict[int, List[str]] = {}
+        resolved: List[KnowledgeItem] = []
+        for entry, target in zip(items, targets):
+            if isinstance(target, KnowledgeItem):
+                self._merge_duplicate(target, entry, merged_tags)
+                resolved.append(target)
+                continue
+            if isinstance(target, int):
+                # Duplicate of an earlier entry in this batch
+                self._merge_duplicate(rows[target], entry, {})
+                resolved.append(rows[target])
+                continue
+            row = KnowledgeItem(
+                content=entry["content"],
+                type=entry.get("type", "explicit"),
+                subtype=entry.get("subtype"),
+                source_type=source.type,
+                source_identifier=source.identifier,
+                source_url=source.url,
+                source_author=source.author,
+                source_timestamp=source.timestamp,
+                tags=normalize_tags(entry.get("tags")),
+                item_metadata=entry.get("metadata", {}),
+                confidence=entry.get("confidence", 1.0),
+                content_hash=target["hash"],
+                embedding_id=str(uuid4())
+            )
+            keys_by_row[len(rows)] = target["keys"]
+            rows.append(row)
+            resolved.append(row)
+        
+        stored = False
+        try:
+            self.db.add_all(rows)
+            # Assigns ids and defaults with batched INSERTs inside the transaction
+            await self.db.flush()
+            await self._replace_tags({row.id: row.tags for row in rows}, new_items=True)
+            if merged_tags:
+                await self._replace_tags(merged_tags)
+            await self._index_lsh_keys({rows[i].id: keys for i, keys in keys_by_row.items()})
+            
+            if rows:
+                documents = [self._vector_document(row) for row in rows]
+                embeddings = await self.vector_store.embed_documents([doc.text for doc in documents])
+                await self.vector_store.add_documents(self.collection_name, documents, embeddings=embeddings)
+                stored = True
+            
+            await self.db.commit()
+        except Exception:
+            await self.db.rollback()
+            if stored:
+                await self.vector_store.delete_documents(
+                    self.collection_name, [row.embedding_id for row in rows]
+                )
+            raise
+        
+        return list({id(item): item for item in resolved}.values())
+    
+    async def _find_duplicates(self, contents: List[str]) -> List[Union[KnowledgeItem, int, Dict[str, Any]]]:
+        """Resolve each content to the item it duplicates, if any.
+        
+        Per content, returns the existing ``KnowledgeItem`` it duplicates,
+        the index of an earlier content in the list it duplicates, or, for
+        new content, a dict with its ``hash`` and LSH ``keys``. Exact matches
+        are one lookup on the unique content hash index; near-duplicate
+        candidates come from one LSH bucket lookup and are confirmed by
+        exact shingle Jaccard similarity.
+        """
+        hashes = [content_hash(content) for content in contents]
+        by_hash: Dict[str, Union[KnowledgeItem, int]] = {}
+        for chunk in _chunks(set(hashes)):
+            result = await self.db.execute(
+                select(KnowledgeItem).where(KnowledgeItem.content_hash.in_(chunk))
+            )
+            by_hash.update((item.content_hash, item) for item in result.scalars().all())
+        
+        resolved: List[Union[KnowledgeItem, int, Dict[str, Any]]] = [None] * len(contents)
+        pending: List[int] = []
+        for index, digest in enumerate(hashes):
+            if digest in by_hash:
+                resolved[index] = by_hash[digest]
+            else:
+                by_hash[digest] = index
+                pending.append(index)
+        
+        if not settings.KNOWLEDGE_DEDUP_ENABLED:
+            for index in pending:
+                resolved[index] = {"hash": hashes[index], "keys": []}
+            return resolved
+        
+        shingle_sets = {index: minhasher.shingles(contents[index]) for index in pending}
+        keys = {index: minhasher.band_keys(minhasher.signature(shingle_sets[index])) for index in pending}
+        
+        # Existing items sharing a band with any pending content
+        bucket_items: Dict[int, List[int]] = {}
+        for chunk in _chunks({key for index in pending for key in keys[index]}):
+            result = await self.db.execute(
+                select(knowledge_lsh_bucket.c.bucket, knowledge_lsh_bucket.c.knowledge_id)
+                .where(knowledge_lsh_bucket.c.bucket.in_(chunk))
+            )
+            for bucket, knowledge_id in result:
+                bucket_items.setdefault(bucket, []).append(knowledge_id)
+        
+        # Keep the candidates sharing the most bands with each content; near
+        # duplicates share many, and the cap bounds the work on templated text
+        shortlists = {
+            index: [
+                item_id for item_id, _ in Counter(
+                    item_id for key in keys[index] for item_id in bucket_items.get(key, [])
+                ).most_common(settings.KNOWLEDGE_DEDUP_MAX_CANDIDATES)
             ]
+            for index in pending
+        }
+        candidates: Dict[int, KnowledgeItem] = {}
+        for chunk in _chunks({item_id for shortlist in shortlists.values() for item_id in shortlist}):
+            result = await self.db.execute(select(KnowledgeItem).where(KnowledgeItem.id.in_(chunk)))
+            candidates.update((item.id, item) for item in result.scalars().all())
+        candidate_shingles = {item_id: minhasher.shingles(item.content) for item_id, item in candidates.items()}
+        
+        threshold = settings.KNOWLEDGE_DEDUP_THRESHOLD
+        batch_buckets: Dict[int, List[int]] = {}
+        for index in pending:
+            best, best_score = None, threshold
+            for item_id in shortlists[index]:
+                if item_id not in candidates:
+                    continue
+                score = jaccard(shingle_sets[index], candidate_shingles[item_id])
+                if score >= best_score:
+                    best, best_score = candidates[item_id], score
+            # Earlier new contents in this batch are candidates too
+            earlier_shortlist = Counter(
+                earlier for key in keys[index] for earlier in batch_buckets.get(key, [])
+            ).most_common(settings.KNOWLEDGE_DEDUP_MAX_CANDIDATES)
+            for earlier, _ in earlier_shortlist:
+                score = jaccard(shingle_sets[index], shingle_sets[earlier])
+                if score >= best_score:
+                    best, best_score = earlier, score
+            
+            if best is None:
+                resolved[index] = {"hash": hashes[index], "keys": keys[index]}
+                for key in keys[index]:
+                    batch_buckets.setdefault(key, []).append(index)
+            else:
+                resolved[index] = best
+        
+        # Point batch-internal matches at what the earlier content resolved to:
+        # an existing item, or its position among the new rows
+        row_positions: Dict[int, int] = {}
+        for index, target in enumerate(resolved):
+            if isinstance(target, dict):
+                row_positions[index] = len(row_positions)
+            elif isinstance(target, int):
+                earlier = resolved[target]
+                resolved[index] = earlier if isinstance(earlier, KnowledgeItem) else row_positions[target]
+        return resolved
+    
+    def _merge_duplicate(
+        self,
+        item: KnowledgeItem,
+        entry: Dict[str, Any],
+        merged_tags: Dict[int, List[str]]
+    ) -> None:
+        """Fold a duplicate entry's tags and metadata into an item, counting the repeat"""
+        tags = normalize_tags((item.tags or []) + (entry.get("tags") or []))
+        if tags != (item.tags or []):
+            item.tags = tags
+            if item.id is not None:
+                merged_tags[item.id] = tags
+        # Existing metadata wins; the entry only fills in missing keys
+        metadata = {**(entry.get("metadata") or {}), **(item.item_metadata or {})}
+        metadata["duplicate_count"] = metadata.get("duplicate_count", 0) + 1
+        item.item_metadata = metadata
+    
+    async def _index_lsh_keys(self, keys_by_item: Dict[int, List[int]]) -> None:
+        """Add items' LSH band keys to the near-duplicate index, within the caller's transaction"""
+        rows = [
+            {"bucket": key, "knowledge_id": item_id}
+            for item_id, keys in keys_by_item.items()
+            for key in set(keys)
+        ]
+        if rows:
+            await self.db.execute(knowledge_lsh_bucket.insert(), rows)
+    
+    async def index_near_duplicates(self, batch_size: int = 500) -> int:
+        """Add items missing from the near-duplicate index, returning how many were indexed"""
+        indexed = 0
+        while True:
+            result = await self.db.execute(
+                select(KnowledgeItem.id, KnowledgeItem.content)
+                .where(~select(knowledge_lsh_bucket.c.knowledge_id)
+                       .where(knowledge_lsh_bucket.c.knowledge_id == KnowledgeItem.id)
+                       .exists())
+                .order_by(KnowledgeItem.id)
+                .limit(batch_size)
+            )
+            batch = result.all()
+            if not batch:
+                return indexed
+            await self._index_lsh_keys({item_id: minhasher.keys_for(content) for item_id, content in batch})
+            await self.db.commit()
+            indexed += len(batch)
+    
+    async def _replace_tags(self, tags_by_item: Dict[int, List[str]], new_items: bool = False) -> None:
+        """Set the normalized tags of items and adjust the per-tag counts.
+        
+        Runs inside the caller's transaction. ``new_items`` skips looking up
+        previous tags for items that were just inserted.
+        """
+        counts: Counter = Counter()
+        item_ids = list(tags_by_item)
+        if not new_items and item_ids:
+            result = await self.db.execute(
+                select(knowledge_tag.c.tag).where(knowledge_tag.c.knowledge_id.in_(item_ids))
+            )
+            counts.subtract(tag for tag, in result)
+            await self.db.execute(delete(knowledge_tag).where(knowledge_tag.c.knowledge_id.in_(item_ids)))
+        
+        rows = [
+            {"tag": tag, "knowledge_id": item_id}
+            for item_id, tags in tags_by_item.items()
+            for tag in normalize_tags(tags)
+        ]
+        if rows:
+            await self.db.execute(knowledge_tag.insert(), rows)
+            counts.update(row["tag"] for row in rows)
+        
+        changed = [{"tag": tag, "item_count": delta} for tag, delta in counts.items() if delta]
+        if not changed:
+            return
+        
+        # Upsert the count deltas; both SQLite and Postgres support ON CONFLICT
+        dialect = self.db.get_bind().dialect.name
+        insert = postgresql_insert if dialect == "postgresql" else sqlite_insert
+        statement = insert(knowledge_tag_count)
+        await self.db.execute(
+            statement.on_conflict_do_update(
+                index_elements=[knowledge_tag_count.c.tag],
+                set_={"item_count": knowledge_tag_count.c.item_count + statement.excluded.item_count}
+            ),
+            changed
         )
+    
+    async def get_tag_facets(
+        self,
+        item_ids: Optional[List[int]] = None,
+        prefix: Optional[str] = None,
+        limit: int = 50
+    ) -> List[Tuple[str, int]]:
+        """Most used tags with their item counts, optionally within a set of items.
+        
+        Without ``item_ids`` the counts come straight from knowledge_tag_count;
+        with them, from a GROUP BY over just those items' knowledge_tag rows.
+        """
+        if item_ids is not None:
+            count = func.count().label("item_count")
+            statement = select(knowledge_tag.c.tag, count).where(
+                knowledge_tag.c.knowledge_id.in_(item_ids)
+            ).group_by(knowledge_tag.c.tag).order_by(count.desc(), knowledge_tag.c.tag)
+            tag_column = knowledge_tag.c.tag
+        else:
+            statement = select(knowledge_tag_count.c.tag, knowledge_tag_count.c.item_count).where(
+                knowledge_tag_count.c.item_count > 0
+            ).order_by(knowledge_tag_count.c.item_count.desc(), knowledge_tag_count.c.tag)
+            tag_column = knowledge_tag_count.c.tag
         
-        return embedding_id
+        if prefix:
+            statement = statement.where(tag_column.startswith(prefix, autoescape=True))
+        
+        result = await self.db.execute(statement.limit(limit))
+        return [(tag, count) for tag, count in result]
     
     async def get_knowledge_item(self, item_id: int) -> Optional[KnowledgeItem]:
         """Get a knowledge item by ID"""
-        return self.db.query(KnowledgeItem).filter(KnowledgeItem.id == item_id).first()
+        return await self.db.get(KnowledgeItem, item_id)
     
     async def search_knowledge(
         self,
@@ -118,68 +498,230 @@ class KnowledgeService:
         include_relations: bool = False,
         time_range: Optional[Dict[str, datetime]] = None
     ) -> List[KnowledgeItem]:
-        """Search for knowledge items by semantic similarity"""
-        # First, search in vector database
-        where_clause = {}
+        """Search for knowledge items by semantic similarity, most similar first"""
+        results = await self.search_knowledge_scored(
+            query,
+            types=types,
+            subtypes=subtypes,
+            tags=tags,
+            source_types=source_types,
+            min_confidence=min_confidence,
+            limit=limit,
+            include_relations=include_relations,
+            time_range=time_range
+        )
+        return [item for item, _ in results]
+    
+    async def search_knowledge_scored(
+        self,
+        query: str,
+        types: Optional[List[str]] = None,
+        subtypes: Optional[List[str]] = None,
+        tags: Optional[List[str]] = None,
+        source_types: Optional[List[str]] = None,
+        min_confidence: float = 0.0,
+        limit: int = 10,
+        include_relations: bool = False,
+        time_range: Optional[Dict[str, datetime]] = None
+    ) -> List[Tuple[KnowledgeItem, Optional[float]]]:
+        """Search for knowledge items, returning (item, similarity) pairs in vector rank order.
+        
+        Filters are pushed into the vector query so that ``limit`` results
+        come back even when they are selective. Tags are resolved to item ids
+        through ``knowledge_tag``; when a tag matches too many items to pass
+        as ids, the vector store is over-fetched in growing rounds until
+        ``limit`` items survive the tag filter or the fetch cap is reached.
+        All filters are re-applied in SQL, which stays authoritative.
+        
+        Hydration is one SELECT for the items plus, with ``include_relations``,
+        one batched SELECT for their related items per round.
+        """
+        ids = None
+        if tags:
+            cap = settings.KNOWLEDGE_SEARCH_PUSHDOWN_MAX_IDS
+            result = await self.db.execute(
+                select(knowledge_tag.c.knowledge_id)
+                .where(knowledge_tag.c.tag.in_(tags))
+                .distinct()
+                .limit(cap + 1)
+            )
+            ids = sorted(result.scalars().all())
+            if not ids:
+                return []
+            if len(ids) > cap:
+                ids = None
+        
+        where_clause = build_knowledge_where(
+            types=types,
+            subtypes=subtypes,
+            source_types=source_types,
+            min_confidence=min_confidence,
+            time_range=time_range,
+            ids=ids
+        )
         
-        if types:
-            where_clause["type"] = {"$in": types}
+        filters = dict(
+            types=types,
+            subtypes=subtypes,
+            tags=tags,
+            source_types=source_types,
+            min_confidence=min_confidence,
+            time_range=time_range
+        )
         
-        if min_confidence > 0:
-            where_clause["confidence"] = {"$gte": min_confidence}
+        # Only an unresolved tag filter can drop results after the vector query
+        factor = max(2, settings.KNOWLEDGE_SEARCH_OVERFETCH_FACTOR)
+        max_fetch = max(limit, settings.KNOWLEDGE_SEARCH_MAX_FETCH)
+        fetch = limit * factor if tags and ids is None else limit
+        fetch = min(fetch, max_fetch)
+        while True:
+            scored, exhausted = await self._search_round(
+                query, where_clause, fetch, filters, include_relations
+            )
+            if exhausted or len(scored) >= limit or fetch >= max_fetch:
+                break
+            fetch = min(fetch * factor, max_fetch)
         
-        if source_types:
-            where_clause["source_type"] = {"$in": source_types}
+        return scored[:limit]
+    
+    async def _search_round(
+        self,
+        query: str,
+        where_clause: Optional[dict],
+        fetch: int,
+        filters: Dict[str, Any],
+        include_relations: bool
+    ) -> Tuple[List[Tuple[KnowledgeItem, Optional[float]]], bool]:
+        """Fetch ``fetch`` vector hits and hydrate those passing the SQL filters.
         
-        # Perform vector search
-        search_results = await self.vector_store.search(
+        Also returns whether the vector store ran out of matches, in which
+        case fetching more cannot help.
+        """
+        # Perform vector search, reusing cached hits until the collection is written to
+        search_results = await query_cache.get_or_compute(
             self.collection_name,
-            query,
-            n_results=limit,
-            where=where_clause
+            query_cache.make_key(query, where_clause, fetch),
+            lambda: self.vector_store.search(
+                self.collection_name,
+                query,
+                n_results=fetch,
+                where=where_clause
+            )
         )
         
-        # Get item IDs from results
-        item_ids = [int(result["metadata"]["id"]) for result in search_results]
+        # Map item IDs to their best vector rank and score
+        ranks: Dict[int, Tuple[int, Optional[float]]] = {}
+        for rank, result in enumerate(search_results):
+            ranks.setdefault(int(result.metadata["id"]), (rank, result.score))
         
-        if not item_ids:
-            return []
+        exhausted = len(search_results) < fetch
+        if not ranks:
+            return [], exhausted
         
         # Query database for these items
-        items = self.db.query(KnowledgeItem).filter(KnowledgeItem.id.in_(item_ids))
-
-        # Apply time range filter
-        if time_range:
-            start_time = time_range.get("start")
-            end_time = time_range.get("end")
-            if start_time:
-                items = items.filter(KnowledgeItem.source_timestamp >= start_time)
-            if end_time:
-                items = items.filter(KnowledgeItem.source_timestamp <= end_time)
-
-        # Apply additional filters
-        if subtypes:
-            items = items.filter(KnowledgeItem.subtype.in_(subtypes))
+        statement = select(KnowledgeItem).where(KnowledgeItem.id.in_(list(ranks)))
+        statement = apply_knowledge_filters(statement, **filters)
         
-        if tags:
-            # Note: Filtering by JSON array elements requires special handling
-            # This is a simplified approach that works for PostgreSQL
-            tag_conditions = []
-            for tag in tags:
-                tag_conditions.append(
-                    text(f"tags @> '[{tag}]'")
-                )
-            items = items.filter(or_(*tag_conditions))
+        # Batch-load related items for all results in one extra query
+        if include_relations:
+            statement = statement.options(selectinload(KnowledgeItem.related_items))
+        
+        # Get results, restoring the vector ranking the IN query discards
+        result = await self.db.execute(statement)
+        items = sorted(result.scalars().all(), key=lambda item: ranks[item.id][0])
+        return [(item, ranks[item.id][1]) for item in items], exhausted
+    
+    async def search_knowledge_lexical(
+        self,
+        query: str,
+        types: Optional[List[str]] = None,
+        subtypes: Optional[List[str]] = None,
+        tags: Optional[List[str]] = None,
+        source_types: Optional[List[str]] = None,
+        min_confidence: float = 0.0,
+        limit: int = 10,
+        include_relations: bool = False,
+        time_range: Optional[Dict[str, datetime]] = None
+    ) -> List[Tuple[KnowledgeItem, float]]:
+        """Full-text search over item contents, returning (item, score) pairs best match first.
+        
+        Every word and "quoted phrase" in the query has to occur in the
+        content, and no embedding is computed. SQLite uses the FTS5 table
+        ``knowledge_fts`` ranked by BM25, Postgres the ``content_tsv`` column
+        ranked by ``ts_rank_cd``; triggers keep both in sync with
+        ``KnowledgeItem.content``. Filters run in the same statement.
+        """
+        dialect = self.db.get_bind().dialect.name
+        if dialect == "sqlite":
+            match = fts5_query(query)
+            if not match:
+                return []
+            # FTS5 ranks with the table name itself; lower bm25() is better
+            fts = table("knowledge_fts", column("rowid"))
+            rank = func.bm25(literal_column("knowledge_fts"))
+            statement = (
+                select(KnowledgeItem, (-rank).label("score"))
+                .join(fts, fts.c.rowid == KnowledgeItem.id)
+                .where(literal_column("knowledge_fts").op("MATCH")(match))
+                .order_by(rank)
+            )
+        elif dialect == "postgresql":
+            if not query.strip():
+                return []
+            tsquery = func.websearch_to_tsquery("simple", query)
+            tsvector = literal_column("knowledgeitem.content_tsv")
+            rank = func.ts_rank_cd(tsvector, tsquery)
+            statement = (
+                select(KnowledgeItem, rank.label("score"))
+                .where(tsvector.op("@@")(tsquery))
+                .order_by(rank.desc())
+            )
+        else:
+            raise ValueError(f"Lexical knowledge search is not supported on {dialect}")
         
-        # Get results
-        items = items.all()
+        statement = apply_knowledge_filters(
+            statement,
+            types=types,
+            subtypes=subtypes,
+            tags=tags,
+            source_types=source_types,
+            min_confidence=min_confidence,
+            time_range=time_range
+        ).limit(limit)
         
-        # Load related items if requested
         if include_relations:
-            for item in items:
-                item.related_items
+            statement = statement.options(selectinload(KnowledgeItem.related_items))
         
-        return items
+        result = await self.db.execute(statement)
+        return [(item, float(score)) for item, score in result.all()]
+    
+    async def search_knowledge_hybrid(
+        self,
+        query: str,
+        limit: int = 10,
+        include_relations: bool = False,
+        **filters: Any
+    ) -> List[Tuple[KnowledgeItem, float]]:
+        """Fuse lexical and vector rankings with reciprocal rank fusion.
+        
+        Each retriever contributes ``2 * limit`` candidates; scores are the
+        fused RRF scores, so items found by both rank highest.
+        """
+        candidates = limit * 2
+        lexical = await self.search_knowledge_lexical(
+            query, limit=candidates, include_relations=include_relations, **filters
+        )
+        vector = await self.search_knowledge_scored(
+            query, limit=candidates, include_relations=include_relations, **filters
+        )
+        
+        items = {item.id: item for item, _ in vector}
+        items.update((item.id, item) for item, _ in lexical)
+        fused = reciprocal_rank_fusion_scores([
+            [item.id for item, _ in lexical],
+            [item.id for item, _ in vector]
+        ])
+        return [(items[item_id], score) for item_id, score in fused[:limit]]
     
     async def create_knowledge_relations(
         self,
@@ -187,6 +729,7 @@ class KnowledgeService:
         relations: List[KnowledgeRelationModel]
     ) -> None:
         """Create relationships between knowledge items"""
+        created = []
         for relation in relations:
             # Check if target exists
             target = await self.get_knowledge_item(relation.target_id)
@@ -199,11 +742,17 @@ class KnowledgeService:
                 target_id=relation.target_id,
                 relation_type=relation.relation_type,
                 confidence=relation.confidence,
-                metadata=relation.metadata or {}
+                metadata_json=relation.metadata or {}
             )
-            self.db.execute(stmt)
+            await self.db.execute(stmt)
+            created.append(relation)
+        
+        await self.db.commit()
         
-        self.db.commit()
+        for relation in created:
+            knowledge_graph.add_relation(
+                int(source_id), int(relation.target_id), relation.relation_type, relation.confidence
+            )
     
     async def link_entity_to_knowledge(
         self,
@@ -225,8 +774,9 @@ class KnowledgeService:
             knowledge_id=knowledge_id,
             relation_type=relation_type
         )
-        self.db.execute(stmt)
-        self.db.commit()
+        await self.db.execute(stmt)
+        await self.db.commit()
+        knowledge_graph.add_entity_link(entity_id, entity_type, int(knowledge_id), relation_type)
         
         return True
     
@@ -236,6 +786,13 @@ class KnowledgeService:
         entity_type: Optional[str] = None
     ) -> List[KnowledgeItem]:
         """Get knowledge items linked to a specific entity"""
+        if await knowledge_graph.ensure_current(self.db):
+            item_ids = list(dict.fromkeys(
+                item_id for item_id, _ in knowledge_graph.entity_links(entity_id, entity_type)
+            ))
+            items = await self._get_items(item_ids)
+            return [items[item_id] for item_id in item_ids if item_id in items]
+        
         query = select(KnowledgeItem).join(
             entity_knowledge,
             KnowledgeItem.id == entity_knowledge.c.knowledge_id
@@ -244,8 +801,8 @@ class KnowledgeService:
         if entity_type:
             query = query.where(entity_knowledge.c.entity_type == entity_type)
         
-        result = self.db.execute(query)
-        return result.scalars().all()
+        result = await self.db.execute(query)
+        return list(result.scalars().all())
 
     async def update_knowledge_item(
         self,
@@ -264,54 +821,46 @@ class KnowledgeService:
 
         if content is not None:
             item.content = content
+            await self._reindex_content(item)
         if type is not None:
             item.type = type
         if subtype is not None:
             item.subtype = subtype
         if tags is not None:
-            item.tags = tags
+            item.tags = normalize_tags(tags)
+            await self._replace_tags({item.id: item.tags})
         if metadata is not None:
-            item.metadata = metadata
+            item.item_metadata = metadata
         if confidence is not None:
             item.confidence = confidence
 
-        self.db.commit()
-        self.db.refresh(item)
+        await self.db.commit()
+        await self.db.refresh(item)
 
-        # Update embedding in vector DB
-        if content is not None:
+        # Update embedding in vector DB, including the metadata searches filter on
+        if any(value is not None for value in (content, type, subtype, confidence)):
             await self._update_vector_store(item)
 
         return item
 
+    async def _reindex_content(self, item: KnowledgeItem) -> None:
+        """Refresh an item's content hash and LSH keys after its content changed"""
+        digest = content_hash(item.content)
+        taken = await self.db.scalar(
+            select(KnowledgeItem.id).where(KnowledgeItem.content_hash == digest, KnowledgeItem.id != item.id)
+        )
+        # Another item already owns this content; the hash stays unique
+        item.content_hash = None if taken else digest
+        await self.db.execute(delete(knowledge_lsh_bucket).where(knowledge_lsh_bucket.c.knowledge_id == item.id))
+        await self._index_lsh_keys({item.id: minhasher.keys_for(item.content)})
+    
     async def _update_vector_store(self, item: KnowledgeItem) -> None:
         """Update knowledge item in vector store"""
         if not item.embedding_id:
             return
 
-        # Prepare metadata for vector store
-        metadata = {
-            "id": item.id,
-            "type": item.type,
-            "subtype": item.subtype,
-            "source_type": item.source_type,
-            "source_identifier": item.source_identifier,
-            "tags": json.dumps(item.tags),
-            "confidence": item.confidence,
-            "created_at": item.created_at.isoformat()
-        }
-
         # Update in vector store
-        await self.vector_store.add_documents(
-            self.collection_name,
-            [
-                {
-                    "id": item.embedding_id,
-                    "text": item.content,
-                    "metadata": metadata
-                }
-            ]
-        )
+        await self.vector_store.add_documents(self.collection_name, [self._vector_document(item)])
 
     async def delete_knowledge_item(self, item_id: int) -> bool:
         """Delete a knowledge item"""
@@ -319,8 +868,11 @@ class KnowledgeService:
         if not item:
             return False
 
-        self.db.delete(item)
-        self.db.commit()
+        await self._replace_tags({item.id: []})
+        await self.db.execute(delete(knowledge_lsh_bucket).where(knowledge_lsh_bucket.c.knowledge_id == item.id))
+        await self.db.delete(item)
+        await self.db.commit()
+        knowledge_graph.remove_item(item_id)
 
         # Delete from vector DB
         if item.embedding_id:
@@ -338,38 +890,88 @@ class KnowledgeService:
         metadata: Dict[str, Any] = {}
     ) -> List[KnowledgeItem]:
         """Extract knowledge items from text content"""
-        items = []
-        
         # Simple extraction: split by sections for documentation
-        sections = self._split_into_sections(content)
+        entries = [
+            self._section_entry(section, type, subtype, tags, metadata)
+            for section in self._split_into_sections(content)
+        ]
         
-        for section in sections:
-            if not section.get("content", "").strip():
-                continue
-            
-            # Create section-based tags
-            section_tags = tags.copy()
-            if section.get("title"):
-                section_tags.append(f"section:{section['title']}")
-            
-            # Create section metadata
-            section_metadata = metadata.copy()
-            if section.get("title"):
-                section_metadata["section_title"] = section["title"]
-            
-            # Create knowledge item
-            item = await self.create_knowledge_item(
-                content=section["content"],
-                type=type,
-                subtype=subtype,
-                source=source,
-                tags=section_tags,
-                metadata=section_metadata
-            )
-            
-            items.append(item)
+        # Create all section items in one transaction and vector store write
+        return await self.create_knowledge_items_bulk(entries, source)
+    
+    async def ingest_text_stream(
+        self,
+        chunks: AsyncIterable[bytes],
+        source: KnowledgeSourceModel,
+        type: str = "explicit",
+        subtype: Optional[str] = None,
+        tags: List[str] = [],
+        metadata: Dict[str, Any] = {},
+        batch_size: Optional[int] = None,
+        progress: Optional[Callable[[Dict[str, int]], Awaitable[None]]] = None
+    ) -> Dict[str, int]:
+        """Extract knowledge items from a streamed Markdown or text document.
         
-        return items
+        The stream is decoded and split into sections line by line, and
+        sections go to bulk ingestion ``batch_size`` at a time, so memory use
+        does not grow with the document. ``progress`` is awaited after every
+        batch with the running counts, which are also returned: ``bytes``
+        read, ``sections`` ingested and ``items`` they produced (duplicates
+        merged into existing items count as items too).
+        """
+        batch_size = batch_size or settings.KNOWLEDGE_INGEST_BATCH_SIZE
+        counts = {"bytes": 0, "sections": 0, "items": 0}
+        
+        async def counted(chunks: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+            async for chunk in chunks:
+                counts["bytes"] += len(chunk)
+                yield chunk
+        
+        async def flush(entries: List[Dict[str, Any]]) -> None:
+            items = await self.create_knowledge_items_bulk(entries, source)
+            counts["sections"] += len(entries)
+            counts["items"] += len(items)
+            if progress:
+                await progress(dict(counts))
+        
+        splitter = SectionSplitter()
+        entries: List[Dict[str, Any]] = []
+        async for line in iter_text_lines(counted(chunks)):
+            for section in splitter.feed(line):
+                entries.append(self._section_entry(section, type, subtype, tags, metadata))
+            if len(entries) >= batch_size:
+                await flush(entries)
+                entries = []
+        for section in splitter.close():
+            entries.append(self._section_entry(section, type, subtype, tags, metadata))
+        if entries:
+            await flush(entries)
+        return counts
+    
+    def _section_entry(
+        self,
+        section: Dict[str, Any],
+        type: str,
+        subtype: Optional[str],
+        tags: List[str],
+        metadata: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Bulk ingestion entry for a document section, tagged with its title"""
+        section_tags = tags.copy()
+        section_tags.append(f"section:{section['title']}")
+        
+        section_metadata = metadata.copy()
+        section_metadata["section_title"] = section["title"]
+        if section.get("part"):
+            section_metadata["section_part"] = section["part"]
+        
+        return {
+            "content": section["content"],
+            "type": type,
+            "subtype": subtype,
+            "tags": section_tags,
+            "metadata": section_metadata
+        }
     
     async def extract_knowledge_from_conversation(
         self,
@@ -379,7 +981,7 @@ class KnowledgeService:
         metadata: Dict[str, Any] = {}
     ) -> List[KnowledgeItem]:
         """Extract knowledge from conversation content (e.g., PR comments, discussions)"""
-        items = []
+        entries = []
         
         # Split into messages
         messages = self._split_into_messages(content)
@@ -402,61 +1004,19 @@ class KnowledgeService:
             if message.get("timestamp"):
                 message_metadata["timestamp"] = message["timestamp"]
             
-            # Create knowledge item
-            item = await self.create_knowledge_item(
-                content=message["content"],
-                type="tacit",  # Conversations are typically tacit knowledge
-                source=source,
-                tags=message_tags,
-                metadata=message_metadata
-            )
-            
-            items.append(item)
+            entries.append({
+                "content": message["content"],
+                "type": "tacit",  # Conversations are typically tacit knowledge
+                "tags": message_tags,
+                "metadata": message_metadata
+            })
         
-        return items
+        # Create all message items in one transaction and vector store write
+        return await self.create_knowledge_items_bulk(entries, source)
     
-    def _split_into_sections(self, content: str) -> List[Dict[str, str]]:
+    def _split_into_sections(self, content: str) -> List[Dict[str, Any]]:
         """Split content into sections based on headings"""
-        # Simple regex-based section splitter
-        sections = []
-        
-        # Match Markdown headings of various levels
-        headings = re.finditer(r'^(#{1,6})\s+(.+)$', content, re.MULTILINE)
-        
-        last_pos = 0
-        last_title = None
-        
-        for match in headings:
-            heading_pos = match.start()
-            heading_text = match.group(2).strip()
-            
-            # If we have content from a previous section, add it
-            if last_pos < heading_pos and last_title:
-                section_content = content[last_pos:heading_pos].strip()
-                sections.append({
-                    "title": last_title,
-                    "content": section_content
-                })
-            
-            last_pos = match.end()
-            last_title = heading_text
-        
-        # Add the last section
-        if last_pos < len(content) and last_title:
-            section_content = content[last_pos:].strip()
-            sections.append({
-                "title": last_title,
-                "content": section_content
-            })
-        
-        # If no sections were found, treat the entire content as one section
-        if not sections:
-            sections.append({
-                "title": "Content",
-                "content": content
-            })
-        
-        return sections
+        return list(split_sections(content.splitlines(keepends=True)))
     
     def _split_into_messages(self, content: str) -> List[Dict[str, Any]]:
         """Split conversation content into individual messages"""
@@ -512,54 +1072,238 @@ class KnowledgeService:
         # Default classification
         return "information"
         
+    def _capped_targets(self, source_id, relation_types: Optional[List[str]], fan_out: int):
+        """Subquery of the ``fan_out`` most confident relation targets of a source item"""
+        capped = knowledge_relation.alias("capped")
+        query = select(capped.c.target_id).where(capped.c.source_id == source_id)
+        if relation_types:
+            query = query.where(capped.c.relation_type.in_(relation_types))
+        return query.order_by(capped.c.confidence.desc(), capped.c.target_id).limit(fan_out)
+    
     async def get_related_knowledge(
         self,
         item_id: int,
         relation_types: Optional[List[str]] = None,
-        max_depth: int = 1
+        max_depth: int = 1,
+        fan_out: Optional[int] = None
     ) -> List[Dict[str, Any]]:
-        """Get knowledge items related to the given item, up to a maximum depth"""
+        """Get knowledge items related to the given item, up to a maximum depth.
+        
+        The whole traversal is one recursive CTE. Each row carries its depth
+        and the comma-separated path of item ids leading to it, which stops
+        cycles (an item is never revisited on the same path) and later places
+        the row under its parent. At most ``fan_out`` relations, highest
+        confidence first, are followed from each item.
+        """
+        max_depth = min(max_depth, settings.KNOWLEDGE_RELATION_MAX_DEPTH)
         if max_depth <= 0:
             return []
+        fan_out = fan_out or settings.KNOWLEDGE_RELATION_FAN_OUT
         
-        # Start with the direct relationships
-        query = select(
-            KnowledgeItem,
-            knowledge_relation.c.relation_type,
-            knowledge_relation.c.confidence
-        ).join(
-            knowledge_relation,
-            and_(
-                KnowledgeItem.id == knowledge_relation.c.target_id,
-                knowledge_relation.c.source_id == item_id
+        if await knowledge_graph.ensure_current(self.db):
+            return await self._hydrate_relation_tree(
+                knowledge_graph.relation_tree(item_id, max_depth, relation_types, fan_out)
             )
+        
+        relation = knowledge_relation.c
+        
+        # Direct relationships of the root item
+        seed = select(
+            relation.source_id,
+            relation.target_id,
+            relation.relation_type,
+            relation.confidence,
+            literal(1).label("depth"),
+            (
+                literal(",") + cast(relation.source_id, String) + ","
+                + cast(relation.target_id, String) + ","
+            ).label("path")
+        ).where(
+            relation.source_id == item_id,
+            relation.target_id != item_id,
+            relation.target_id.in_(self._capped_targets(item_id, relation_types, fan_out))
         )
+        if relation_types:
+            seed = seed.where(relation.relation_type.in_(relation_types))
+        walk = seed.cte("walk", recursive=True)
         
+        # One level deeper, skipping items already on the path
+        edge = knowledge_relation.alias("edge")
+        step = select(
+            edge.c.source_id,
+            edge.c.target_id,
+            edge.c.relation_type,
+            edge.c.confidence,
+            walk.c.depth + 1,
+            walk.c.path + cast(edge.c.target_id, String) + ","
+        ).join_from(
+            walk, edge, edge.c.source_id == walk.c.target_id
+        ).where(
+            walk.c.depth < max_depth,
+            ~walk.c.path.contains(literal(",") + cast(edge.c.target_id, String) + ","),
+            edge.c.target_id.in_(self._capped_targets(walk.c.target_id, relation_types, fan_out))
+        )
         if relation_types:
-            query = query.where(knowledge_relation.c.relation_type.in_(relation_types))
+            step = step.where(edge.c.relation_type.in_(relation_types))
+        walk = walk.union_all(step)
         
-        result = self.db.execute(query)
-        related_items = []
+        query = select(
+            KnowledgeItem,
+            walk.c.relation_type,
+            walk.c.confidence,
+            walk.c.depth,
+            walk.c.path
+        ).join(
+            walk, KnowledgeItem.id == walk.c.target_id
+        ).order_by(walk.c.depth, walk.c.confidence.desc(), KnowledgeItem.id)
         
-        for row in result:
-            item, relation_type, confidence = row
-            
-            # Process the item
+        result = await self.db.execute(query)
+        
+        # Assemble the flat rows into a tree; parents always come first (lower depth)
+        root_path = f",{item_id},"
+        children: Dict[str, List[Dict[str, Any]]] = {root_path: []}
+        for item, relation_type, confidence, depth, path in result:
+            parent_path = path[:path.rstrip(",").rfind(",") + 1]
+            siblings = children.get(parent_path)
+            if siblings is None:
+                continue
             item_data = {
                 "item": item,
                 "relation_type": relation_type,
                 "confidence": confidence,
+                "depth": depth,
                 "related_items": []
             }
-            
-            # Recursively get deeper relationships if needed
-            if max_depth > 1:
-                item_data["related_items"] = await self.get_related_knowledge(
-                    item.id,
-                    relation_types,
-                    max_depth - 1
-                )
-            
-            related_items.append(item_data)
+            children[path] = item_data["related_items"]
+            siblings.append(item_data)
+        
+        return children[root_path]
+    
+    async def _get_items(self, item_ids: List[int]) -> Dict[int, KnowledgeItem]:
+        """Load items by id, in chunks"""
+        items: Dict[int, KnowledgeItem] = {}
+        for chunk in _chunks(set(item_ids)):
+            result = await self.db.execute(select(KnowledgeItem).where(KnowledgeItem.id.in_(chunk)))
+            items.update((item.id, item) for item in result.scalars().all())
+        return items
+    
+    async def _hydrate_relation_tree(self, tree: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Swap the item ids of a cached relation tree for items, dropping missing items and their subtrees"""
+        item_ids = []
+        pending = list(tree)
+        while pending:
+            node = pending.pop()
+            item_ids.append(node["id"])
+            pending.extend(node["related_items"])
+        items = await self._get_items(item_ids)
+        
+        def hydrate(nodes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+            return [
+                {
+                    "item": items[node["id"]],
+                    "relation_type": node["relation_type"],
+                    "confidence": node["confidence"],
+                    "depth": node["depth"],
+                    "related_items": hydrate(node["related_items"])
+                }
+                for node in nodes
+                if node["id"] in items
+            ]
+        
+        return hydrate(tree)
+    
+    def _relation_edges(self, relation_types: Optional[List[str]], directed: bool):
+        """Relations as (src, dst, confidence) rows, followed both ways unless ``directed``"""
+        relation = knowledge_relation.c
+        forward = select(relation.source_id.label("src"), relation.target_id.label("dst"), relation.confidence)
+        backward = select(relation.target_id, relation.source_id, relation.confidence)
+        if relation_types:
+            forward = forward.where(relation.relation_type.in_(relation_types))
+            backward = backward.where(relation.relation_type.in_(relation_types))
+        if directed:
+            return forward.subquery("edges")
+        return union_all(forward, backward).subquery("edges")
+    
+    async def _query_knowledge_path(
+        self,
+        source_id: int,
+        target_id: int,
+        relation_types: Optional[List[str]],
+        directed: bool,
+        max_depth: int
+    ) -> Optional[List[int]]:
+        """Shortest path in SQL, for when the graph cache is disabled.
+        
+        A recursive CTE collects distinct (item, depth) pairs, so its size is
+        bounded by the items reached times ``max_depth`` rather than by the
+        number of paths; the path is then traced back from the target one
+        hop at a time.
+        """
+        if source_id == target_id:
+            return [source_id]
+        edges = self._relation_edges(relation_types, directed)
+        
+        reach = select(
+            cast(literal(source_id), Integer).label("node"),
+            literal(0).label("depth")
+        ).cte("reach", recursive=True)
+        reach = reach.union(
+            select(edges.c.dst, reach.c.depth + 1).join_from(
+                reach, edges, edges.c.src == reach.c.node
+            ).where(
+                reach.c.depth < max_depth,
+                reach.c.node != target_id
+            )
+        )
+        result = await self.db.execute(select(reach.c.node, func.min(reach.c.depth)).group_by(reach.c.node))
+        depths = dict(result.all())
+        if target_id not in depths:
+            return None
+        
+        # Step back to a predecessor one hop closer, most confident relation first
+        path = [target_id]
+        for depth in range(depths[target_id] - 1, -1, -1):
+            result = await self.db.execute(
+                select(edges.c.src)
+                .where(edges.c.dst == path[-1])
+                .order_by(edges.c.confidence.desc(), edges.c.src)
+            )
+            path.append(next(src for src in result.scalars() if depths.get(src) == depth))
+        return path[::-1]
+    
+    async def get_knowledge_path(
+        self,
+        source_id: int,
+        target_id: int,
+        relation_types: Optional[List[str]] = None,
+        directed: bool = True
+    ) -> Optional[List[int]]:
+        """Item ids on the shortest relation path between two items, or None if unconnected"""
+        if await knowledge_graph.ensure_current(self.db):
+            return knowledge_graph.shortest_path(
+                source_id,
+                target_id,
+                relation_types,
+                directed=directed,
+                max_depth=settings.KNOWLEDGE_GRAPH_MAX_PATH_DEPTH
+            )
+        return await self._query_knowledge_path(
+            source_id, target_id, relation_types, directed, settings.KNOWLEDGE_GRAPH_MAX_PATH_DEPTH
+        )
+    
+    async def get_knowledge_degree(self, item_id: int) -> Dict[str, int]:
+        """Outgoing and incoming relation counts and entity link count of an item"""
+        if await knowledge_graph.ensure_current(self.db):
+            return knowledge_graph.degree(item_id)
+        
+        relation = knowledge_relation.c
+        
+        def count(table, condition):
+            return select(func.count()).select_from(table).where(condition).scalar_subquery()
         
-        return related_items 
\ No newline at end of file
+        out_count, in_count, entity_count = (await self.db.execute(select(
+            count(knowledge_relation, relation.source_id == item_id),
+            count(knowledge_relation, relation.target_id == item_id),
+            count(entity_knowledge, entity_knowledge.c.knowledge_id == item_id)
+        ))).one()
+        return {"out": out_count, "in": in_count, "entities": entity_count}
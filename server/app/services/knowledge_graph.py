@@ -0,0 +1,355 @@
+import logging
+import time
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from sqlalchemy import inspect, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import get_settings
+from ..models.knowledge import entity_knowledge, knowledge_relation
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# (neighbor item id, relation type, confidence)
+Edge = Tuple[int, str, float]
+
+
+class _Adjacency:
+    """CSR adjacency for one direction of the relation graph.
+
+    Edges of node ``i`` are ``indices[indptr[i]:indptr[i + 1]]``, ordered by
+    confidence (highest first) and then neighbor id, the order traversals
+    follow relations in. Relation types are stored as codes into ``types``.
+    """
+
+    def __init__(self, sources: np.ndarray, targets: np.ndarray, codes: np.ndarray, confidence: np.ndarray, types: List[str]):
+        self.types = types
+        self.node_ids = np.unique(sources)
+        self._positions = {node_id: position for position, node_id in enumerate(self.node_ids.tolist())}
+        order = np.lexsort((targets, -confidence, sources))
+        self.indices = targets[order]
+        self.codes = codes[order]
+        self.confidence = confidence[order]
+        counts = np.bincount(np.searchsorted(self.node_ids, sources), minlength=len(self.node_ids))
+        self.indptr = np.concatenate(([0], np.cumsum(counts)))
+
+    def edges(self, node_id: int) -> List[Edge]:
+        position = self._positions.get(node_id)
+        if position is None:
+            return []
+        start, end = self.indptr[position], self.indptr[position + 1]
+        types = self.types
+        return [
+            (target, types[code], confidence)
+            for target, code, confidence in zip(
+                self.indices[start:end].tolist(),
+                self.codes[start:end].tolist(),
+                self.confidence[start:end].tolist()
+            )
+        ]
+
+    def degree(self, node_id: int) -> int:
+        position = self._positions.get(node_id)
+        if position is None:
+            return 0
+        return int(self.indptr[position + 1] - self.indptr[position])
+
+
+def _adjacency_pair(edges: Sequence[Tuple[int, int, str, float]]) -> Tuple[_Adjacency, _Adjacency]:
+    """Outgoing and incoming adjacency for (source, target, type, confidence) rows"""
+    types = sorted({relation_type for _, _, relation_type, _ in edges})
+    codes = {relation_type: code for code, relation_type in enumerate(types)}
+    sources = np.fromiter((edge[0] for edge in edges), dtype=np.int64, count=len(edges))
+    targets = np.fromiter((edge[1] for edge in edges), dtype=np.int64, count=len(edges))
+    type_codes = np.fromiter((codes[edge[2]] for edge in edges), dtype=np.int32, count=len(edges))
+    confidence = np.fromiter(
+        (1.0 if edge[3] is None else edge[3] for edge in edges), dtype=np.float64, count=len(edges)
+    )
+    return (
+        _Adjacency(sources, targets, type_codes, confidence, types),
+        _Adjacency(targets, sources, type_codes, confidence, types)
+    )
+
+
+class KnowledgeGraphCache:
+    """
+    In-process adjacency index over knowledge relations and entity links.
+
+    Relations are held as CSR arrays in both directions and entity links as
+    CSR rows keyed by (entity_type, entity_id), so neighborhood, path and
+    degree queries never touch the database. Writes made through
+    KnowledgeService are applied to a small overlay that is folded into the
+    arrays once it grows past KNOWLEDGE_GRAPH_COMPACT_EDGES. The schema
+    revision is re-checked at most every KNOWLEDGE_GRAPH_CHECK_SECONDS and
+    the index is rebuilt when a migration has run. Writes from other
+    processes are only picked up by a rebuild.
+    """
+
+    def __init__(self):
+        self.loaded = False
+        self.revision: Optional[str] = None
+        self._checked_at = 0.0
+        self._reset([], [])
+
+    def _reset(
+        self,
+        edges: Sequence[Tuple[int, int, str, float]],
+        links: Sequence[Tuple[str, str, int, str]]
+    ) -> None:
+        self._out, self._in = _adjacency_pair(edges)
+        # Entity links: one CSR row per (entity_type, entity_id)
+        keys = sorted({(entity_type, entity_id) for entity_id, entity_type, _, _ in links})
+        self._entity_rows = {key: row for row, key in enumerate(keys)}
+        self._entities_by_id: Dict[str, List[int]] = {}
+        for row, (_, entity_id) in enumerate(keys):
+            self._entities_by_id.setdefault(entity_id, []).append(row)
+        ordered = sorted(links, key=lambda link: (self._entity_rows[(link[1], link[0])], link[2]))
+        rows = np.fromiter((self._entity_rows[(link[1], link[0])] for link in ordered), dtype=np.int64, count=len(ordered))
+        self._entity_items = np.fromiter((link[2] for link in ordered), dtype=np.int64, count=len(ordered))
+        self._entity_link_types = [link[3] for link in ordered]
+        self._entity_indptr = np.concatenate(([0], np.cumsum(np.bincount(rows, minlength=len(keys)))))
+        self._item_entity_counts: Dict[int, int] = {}
+        for item_id in self._entity_items.tolist():
+            self._item_entity_counts[item_id] = self._item_entity_counts.get(item_id, 0) + 1
+        # Overlay of writes since the arrays were built
+        self._extra_out: Dict[int, List[Edge]] = {}
+        self._extra_in: Dict[int, List[Edge]] = {}
+        self._extra_links: Dict[Tuple[str, str], List[Tuple[int, str]]] = {}
+        self._extra_count = 0
+        self._removed: Set[int] = set()
+
+    # Loading
+
+    async def _schema_revision(self, db: AsyncSession) -> Optional[str]:
+        has_version = await db.run_sync(lambda session: inspect(session.connection()).has_table("alembic_version"))
+        if not has_version:
+            return None
+        return await db.scalar(text("SELECT version_num FROM alembic_version"))
+
+    async def load(self, db: AsyncSession) -> None:
+        """Build the index from the relation and entity link tables"""
+        start_time = time.perf_counter()
+        revision = await self._schema_revision(db)
+        relation = knowledge_relation.c
+        edges = (await db.execute(
+            select(relation.source_id, relation.target_id, relation.relation_type, relation.confidence)
+        )).all()
+        link = entity_knowledge.c
+        links = (await db.execute(
+            select(link.entity_id, link.entity_type, link.knowledge_id, link.relation_type)
+        )).all()
+        self._reset(edges, links)
+        self.revision = revision
+        self._checked_at = time.monotonic()
+        self.loaded = True
+        logger.info(
+            f"Loaded knowledge graph: {len(edges)} relations, {len(links)} entity links "
+            f"in {(time.perf_counter() - start_time) * 1000:.1f}ms"
+        )
+
+    async def ensure_current(self, db: AsyncSession) -> bool:
+        """Load the index if needed and rebuild it after a migration; returns whether it is usable"""
+        if not settings.KNOWLEDGE_GRAPH_CACHE_ENABLED:
+            return False
+        if not self.loaded:
+            await self.load(db)
+        elif time.monotonic() - self._checked_at >= settings.KNOWLEDGE_GRAPH_CHECK_SECONDS:
+            self._checked_at = time.monotonic()
+            if await self._schema_revision(db) != self.revision:
+                logger.info("Schema revision changed, rebuilding knowledge graph")
+                await self.load(db)
+        return True
+
+    # Write hooks
+
+    def add_relation(self, source_id: int, target_id: int, relation_type: str, confidence: float = 1.0) -> None:
+        if not self.loaded:
+            return
+        self._reuse(source_id, target_id)
+        self._extra_out.setdefault(source_id, []).append((target_id, relation_type, confidence))
+        self._extra_in.setdefault(target_id, []).append((source_id, relation_type, confidence))
+        self._wrote()
+
+    def add_entity_link(self, entity_id: str, entity_type: str, knowledge_id: int, relation_type: str) -> None:
+        if not self.loaded:
+            return
+        self._reuse(knowledge_id)
+        self._extra_links.setdefault((entity_type, entity_id), []).append((knowledge_id, relation_type))
+        self._wrote()
+
+    def remove_item(self, item_id: int) -> None:
+        if self.loaded:
+            self._removed.add(item_id)
+
+    def _reuse(self, *item_ids: int) -> None:
+        """Drop a removed item's old edges before its id (which SQLite may reuse) gets new ones"""
+        if self._removed.intersection(item_ids):
+            self._compact()
+
+    def _wrote(self) -> None:
+        self._extra_count += 1
+        if self._extra_count >= settings.KNOWLEDGE_GRAPH_COMPACT_EDGES:
+            self._compact()
+
+    def _compact(self) -> None:
+        """Fold the overlay into fresh arrays without going back to the database.
+
+        Removed items are left out of the new arrays, so they no longer need
+        to be filtered at query time and their ids can be reused.
+        """
+        removed = self._removed
+        edges = [
+            (source_id, target_id, relation_type, confidence)
+            for source_id in set(self._out.node_ids.tolist()) | set(self._extra_out)
+            if source_id not in removed
+            for target_id, relation_type, confidence in self.edges(source_id)
+        ]
+        links = [
+            (entity_id, entity_type, item_id, link_type)
+            for entity_type, entity_id in set(self._entity_rows) | set(self._extra_links)
+            for item_id, link_type in self.entity_links(entity_id, entity_type)
+        ]
+        self._reset(edges, links)
+
+    # Queries
+
+    def edges(self, item_id: int, relation_types: Optional[Iterable[str]] = None, incoming: bool = False) -> List[Edge]:
+        """Relations of an item, highest confidence first"""
+        if item_id in self._removed:
+            return []
+        adjacency, extra = (self._in, self._extra_in) if incoming else (self._out, self._extra_out)
+        edges = adjacency.edges(item_id)
+        if item_id in extra:
+            edges = sorted(edges + extra[item_id], key=lambda edge: (-edge[2], edge[0]))
+        if self._removed:
+            edges = [edge for edge in edges if edge[0] not in self._removed]
+        if relation_types:
+            allowed = set(relation_types)
+            edges = [edge for edge in edges if edge[1] in allowed]
+        return edges
+
+    def neighborhood(
+        self,
+        item_id: int,
+        max_depth: int = 1,
+        relation_types: Optional[Iterable[str]] = None,
+        incoming: bool = False
+    ) -> Dict[int, int]:
+        """Breadth-first search: item id -> depth of every item within ``max_depth`` relations"""
+        relation_types = set(relation_types) if relation_types else None
+        depths = {item_id: 0}
+        frontier = [item_id]
+        for depth in range(1, max_depth + 1):
+            next_frontier = []
+            for node in frontier:
+                for neighbor, _, _ in self.edges(node, relation_types, incoming):
+                    if neighbor not in depths:
+                        depths[neighbor] = depth
+                        next_frontier.append(neighbor)
+            if not next_frontier:
+                break
+            frontier = next_frontier
+        del depths[item_id]
+        return depths
+
+    def shortest_path(
+        self,
+        source_id: int,
+        target_id: int,
+        relation_types: Optional[Iterable[str]] = None,
+        directed: bool = True,
+        max_depth: Optional[int] = None
+    ) -> Optional[List[int]]:
+        """Fewest-hop path of item ids from source to target, or None if they are not connected"""
+        if source_id in self._removed or target_id in self._removed:
+            return None
+        if source_id == target_id:
+            return [source_id]
+        relation_types = set(relation_types) if relation_types else None
+        parents: Dict[int, Optional[int]] = {source_id: None}
+        queue = deque([(source_id, 0)])
+        while queue:
+            node, depth = queue.popleft()
+            if max_depth is not None and depth >= max_depth:
+                continue
+            neighbors = self.edges(node, relation_types)
+            if not directed:
+                neighbors = neighbors + self.edges(node, relation_types, incoming=True)
+            for neighbor, _, _ in neighbors:
+                if neighbor in parents:
+                    continue
+                parents[neighbor] = node
+                if neighbor == target_id:
+                    path = [neighbor]
+                    while parents[path[-1]] is not None:
+                        path.append(parents[path[-1]])
+                    return path[::-1]
+                queue.append((neighbor, depth + 1))
+        return None
+
+    def degree(self, item_id: int) -> Dict[str, int]:
+        """Outgoing and incoming relation counts and entity link count of an item"""
+        if item_id in self._removed:
+            return {"out": 0, "in": 0, "entities": 0}
+        return {
+            "out": len(self.edges(item_id)),
+            "in": len(self.edges(item_id, incoming=True)),
+            "entities": self._item_entity_counts.get(item_id, 0) + sum(
+                1 for links in self._extra_links.values() for linked, _ in links if linked == item_id
+            )
+        }
+
+    def entity_links(self, entity_id: str, entity_type: Optional[str] = None) -> List[Tuple[int, str]]:
+        """(item id, link type) pairs linked to an entity, of any type unless one is given"""
+        if entity_type is None:
+            rows = self._entities_by_id.get(entity_id, [])
+            keys = [key for key in self._extra_links if key[1] == entity_id]
+        else:
+            row = self._entity_rows.get((entity_type, entity_id))
+            rows = [] if row is None else [row]
+            keys = [(entity_type, entity_id)]
+        links = []
+        for row in rows:
+            start, end = self._entity_indptr[row], self._entity_indptr[row + 1]
+            links.extend(zip(self._entity_items[start:end].tolist(), self._entity_link_types[start:end]))
+        for key in keys:
+            links.extend(self._extra_links.get(key, []))
+        return [(item_id, link_type) for item_id, link_type in links if item_id not in self._removed]
+
+    def relation_tree(
+        self,
+        item_id: int,
+        max_depth: int,
+        relation_types: Optional[Iterable[str]] = None,
+        fan_out: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Related items as a tree, following the ``fan_out`` most confident
+        relations of each item and never revisiting an item on the same path.
+        Nodes hold ``id``, ``relation_type``, ``confidence``, ``depth`` and
+        ``related_items``.
+        """
+        relation_types = set(relation_types) if relation_types else None
+
+        def expand(node: int, depth: int, path: Set[int]) -> List[Dict[str, Any]]:
+            children = []
+            for target, relation_type, confidence in self.edges(node, relation_types)[:fan_out]:
+                if target in path:
+                    continue
+                children.append({
+                    "id": target,
+                    "relation_type": relation_type,
+                    "confidence": confidence,
+                    "depth": depth,
+                    "related_items": expand(target, depth + 1, path | {target}) if depth < max_depth else []
+                })
+            return children
+
+        return expand(item_id, 1, {item_id})
+
+
+# Global knowledge graph cache instance
+knowledge_graph = KnowledgeGraphCache()
@@ -0,0 +1,151 @@
+import heapq
+import json
+import math
+import os
+import threading
+from collections import Counter
+from typing import Dict, Hashable, Iterable, List, Sequence, Tuple
+
+from ..config import get_settings
+from ..core.persistence import DeferredSave
+from .code_tokenizer import tokenize_identifiers
+
+settings = get_settings()
+
+
+def reciprocal_rank_fusion_scores(rankings: Sequence[Sequence[Hashable]], k: int = 60) -> List[Tuple[Hashable, float]]:
+    """Fuse several ranked id lists into (id, score) pairs, best first.
+
+    Each id scores ``sum(1 / (k + rank))`` over the lists it appears in, so
+    items ranked well by several retrievers rise to the top without having
+    to calibrate their raw scores against each other.
+    """
+    scores: Dict[Hashable, float] = {}
+    for ranking in rankings:
+        for rank, id in enumerate(ranking):
+            scores[id] = scores.get(id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda pair: pair[1], reverse=True)
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60) -> List[str]:
+    """Fuse several ranked id lists into one using reciprocal rank fusion."""
+    return [id for id, _ in reciprocal_rank_fusion_scores(rankings, k)]
+
+
+class LexicalIndex:
+    """Persistent BM25 inverted index over identifier-aware tokens.
+
+    Postings are held in memory for fast scoring and the per-document term
+    counts are persisted as JSON, so the index survives restarts and can be
+    updated incrementally as chunks are upserted or deleted. Writes are
+    saved in the background, at most once per ``CODE_INDEX_SAVE_DELAY_SECONDS``.
+    """
+
+    def __init__(self, path: str, k1: float = 1.2, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.lock = threading.Lock()
+        # doc_id -> {term: frequency}
+        self.doc_terms: Dict[str, Dict[str, int]] = {}
+        # term -> {doc_id: frequency}
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.doc_lengths: Dict[str, int] = {}
+        self.total_length = 0
+        self.persistence = DeferredSave(self.save, settings.CODE_INDEX_SAVE_DELAY_SECONDS)
+        self._load()
+
+    def _load(self) -> None:
+        """Rebuild postings from the persisted per-document term counts"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            doc_terms = json.load(f)
+        for doc_id, terms in doc_terms.items():
+            self._add(doc_id, terms)
+
+    def save(self) -> None:
+        """Atomically persist the index to disk"""
+        # Term dicts are replaced rather than mutated, so a shallow copy is a consistent snapshot
+        with self.lock:
+            doc_terms = dict(self.doc_terms)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(doc_terms, f)
+        os.replace(tmp_path, self.path)
+
+    def _add(self, doc_id: str, terms: Dict[str, int]) -> None:
+        self.doc_terms[doc_id] = terms
+        length = sum(terms.values())
+        self.doc_lengths[doc_id] = length
+        self.total_length += length
+        for term, frequency in terms.items():
+            self.postings.setdefault(term, {})[doc_id] = frequency
+
+    def _remove(self, doc_id: str) -> None:
+        terms = self.doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        self.total_length -= self.doc_lengths.pop(doc_id)
+        for term in terms:
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self.postings[term]
+
+    def upsert(self, documents: Iterable[Tuple[str, str]], persist: bool = True) -> None:
+        """Index (id, text) pairs, replacing any previous version of each id"""
+        with self.lock:
+            for doc_id, text in documents:
+                self._remove(doc_id)
+                self._add(doc_id, dict(Counter(tokenize_identifiers(text))))
+        if persist:
+            self.persistence.schedule()
+
+    def delete(self, doc_ids: Iterable[str], persist: bool = True) -> None:
+        """Remove documents from the index"""
+        with self.lock:
+            for doc_id in doc_ids:
+                self._remove(doc_id)
+        if persist:
+            self.persistence.schedule()
+
+    def search(self, query: str, limit: int = 10) -> List[Tuple[str, float]]:
+        """Return the top (doc_id, BM25 score) pairs for a query"""
+        terms = set(tokenize_identifiers(query))
+        with self.lock:
+            doc_count = len(self.doc_terms)
+            if not doc_count or not terms:
+                return []
+            average_length = self.total_length / doc_count
+
+            scores: Dict[str, float] = {}
+            for term in terms:
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, frequency in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / average_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+
+        return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+
+    def document_frequency(self, term: str) -> int:
+        """Number of indexed documents containing a term"""
+        return len(self.postings.get(term.lower(), ()))
+
+
+# Indexes are shared by every service instance in the process
+_indexes: Dict[str, LexicalIndex] = {}
+
+
+def get_lexical_index(name: str) -> LexicalIndex:
+    """Get the lexical index for a collection, loading it on first use"""
+    index = _indexes.get(name)
+    if index is None:
+        path = os.path.join(settings.VECTOR_DB_PATH, 'lexical', f"{name}.json")
+        index = _indexes[name] = LexicalIndex(path)
+    return index
@@ -0,0 +1,107 @@
+import hashlib
+import re
+import zlib
+from typing import List, Set
+
+import numpy as np
+
+from ..config import get_settings
+
+settings = get_settings()
+
+_WORD = re.compile(r'\w+')
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+
+
+def content_hash(text: str) -> str:
+    """
+    SHA-256 of the content with runs of whitespace collapsed, for exact duplicates.
+    """
+    return hashlib.sha256(' '.join(text.split()).encode('utf-8')).hexdigest()
+
+
+def _hash32(value: str) -> int:
+    return zlib.crc32(value.encode('utf-8'))
+
+
+def shingles(text: str, size: int) -> Set[int]:
+    """
+    Hashed word n-grams of the lowercased text; short texts yield one shingle.
+    """
+    words = _WORD.findall(text.lower())
+    if len(words) <= size:
+        return {_hash32(' '.join(words))} if words else set()
+    return {_hash32(' '.join(words[i:i + size])) for i in range(len(words) - size + 1)}
+
+
+def jaccard(a: Set[int], b: Set[int]) -> float:
+    """
+    Jaccard similarity of two shingle sets.
+    """
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class MinHasher:
+    """
+    MinHash signatures with LSH banding.
+
+    Two texts share at least one band key with probability 1 - (1 - s^r)^b,
+    where s is their shingle Jaccard similarity, b the number of bands and r
+    the rows per band; 128 permutations in 16 bands start matching around
+    s = 0.7. The permutations are seeded, so keys stay comparable across
+    processes and can be persisted.
+    """
+
+    def __init__(
+        self,
+        num_perm: int = None,
+        bands: int = None,
+        shingle_size: int = None,
+        seed: int = 1
+    ):
+        self.num_perm = num_perm or settings.KNOWLEDGE_DEDUP_NUM_PERM
+        self.bands = bands or settings.KNOWLEDGE_DEDUP_BANDS
+        self.shingle_size = shingle_size or settings.KNOWLEDGE_DEDUP_SHINGLE_SIZE
+        if self.num_perm % self.bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.rows = self.num_perm // self.bands
+        rng = np.random.RandomState(seed)
+        # a, b and the 32-bit shingle hashes are below 2**32, so a * x + b fits in uint64
+        self._a = rng.randint(1, 1 << 32, self.num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, 1 << 32, self.num_perm, dtype=np.uint64)
+
+    def shingles(self, text: str) -> Set[int]:
+        return shingles(text, self.shingle_size)
+
+    def signature(self, shingle_set: Set[int]) -> np.ndarray:
+        """
+        The MinHash signature (uint32, one value per permutation) of a shingle set.
+        """
+        if not shingle_set:
+            return np.full(self.num_perm, _MAX_HASH, dtype=np.uint32)
+        values = np.fromiter(shingle_set, dtype=np.uint64, count=len(shingle_set))
+        permuted = (np.outer(values, self._a) + self._b) % _MERSENNE_PRIME & _MAX_HASH
+        return permuted.min(axis=0).astype(np.uint32)
+
+    def band_keys(self, signature: np.ndarray) -> List[int]:
+        """
+        One 63-bit key per band, so keys fit a signed BIGINT column.
+        """
+        keys = []
+        for band in range(self.bands):
+            digest = hashlib.blake2b(
+                band.to_bytes(2, 'little') + signature[band * self.rows:(band + 1) * self.rows].tobytes(),
+                digest_size=8
+            ).digest()
+            keys.append(int.from_bytes(digest, 'little') >> 1)
+        return keys
+
+    def keys_for(self, text: str) -> List[int]:
+        return self.band_keys(self.signature(self.shingles(text)))
+
+
+# Global MinHash instance; its seed must stay fixed for persisted keys to match
+minhasher = MinHasher()
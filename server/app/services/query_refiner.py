@@ -0,0 +1,146 @@
+import asyncio
+import logging
+import re
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from ..config import get_settings
+from ..core.monitoring import QUERY_REFINEMENT_LATENCY, QUERY_REFINEMENTS
+from ..core.query_cache import query_cache
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+KNOWLEDGE_COLLECTION = "knowledge_items"
+
+_WORD = re.compile(r'[A-Za-z_][A-Za-z0-9_]{2,}')
+_STOPWORDS = frozenset("""
+    the and for are but not you all any can had her was one our out has have
+    this that with from they will would there their what which when where who
+    how into than then them these those been being were also such only other
+    some more most very just should could about after before over under each
+    use used using
+""".split())
+
+
+def _terms(text: str) -> List[str]:
+    return [word.lower() for word in _WORD.findall(text)]
+
+
+def expansion_terms(query: str, texts: List[str], max_tokens: int) -> List[str]:
+    """Terms from related texts to append to a query, most widely shared first.
+
+    Terms already in the query and stopwords are skipped; ties keep the
+    order in which the terms first appear in the (ranked) texts.
+    """
+    if max_tokens <= 0:
+        return []
+    seen = set(_terms(query)) | _STOPWORDS
+    shared: Counter = Counter()
+    first_seen: Dict[str, int] = {}
+    for text in texts:
+        for term in set(_terms(text)) - seen:
+            shared[term] += 1
+        for term in _terms(text):
+            first_seen.setdefault(term, len(first_seen))
+    ranked = sorted(shared, key=lambda term: (-shared[term], first_seen[term]))
+    return ranked[:max_tokens]
+
+
+def _open_vector_store():
+    """Create the configured vector store backend"""
+    from ..dependencies import get_vector_store
+    return get_vector_store()
+
+
+class QueryRefiner:
+    """Expands search queries with terms from the closest knowledge items.
+
+    Only the knowledge vector collection is searched (the item text is all
+    refinement needs), and the expansion is capped at ``max_tokens`` terms
+    so refined queries stay well inside the embedding model's window.
+    Expansions are cached per query and invalidated whenever the knowledge
+    collection is written to. Refinement is bounded by ``timeout_seconds``:
+    a slow lookup returns the raw query, but keeps running in the background
+    so the next identical query is served from the cache.
+    """
+
+    def __init__(
+        self,
+        vector_store: Optional[Any] = None,
+        collection_name: str = KNOWLEDGE_COLLECTION,
+        timeout_seconds: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        items: Optional[int] = None
+    ):
+        self._vector_store = vector_store
+        self.collection_name = collection_name
+        self.timeout_seconds = (
+            settings.QUERY_REFINEMENT_TIMEOUT_SECONDS if timeout_seconds is None else timeout_seconds
+        )
+        self.max_tokens = settings.QUERY_REFINEMENT_MAX_TOKENS if max_tokens is None else max_tokens
+        self.items = items or settings.QUERY_REFINEMENT_ITEMS
+        # Expansions still being computed, shared by concurrent identical queries
+        self.pending: Dict[str, asyncio.Task] = {}
+
+    @property
+    def vector_store(self) -> Any:
+        # Opened once on first use rather than per query
+        if self._vector_store is None:
+            self._vector_store = _open_vector_store()
+        return self._vector_store
+
+    async def _expand(self, query: str) -> List[str]:
+        documents = await self.vector_store.search(
+            self.collection_name, query, n_results=self.items
+        )
+        return expansion_terms(query, [document.text for document in documents], self.max_tokens)
+
+    def _expansion_task(self, query: str) -> asyncio.Task:
+        key = query_cache.make_key('refine', query, self.items, self.max_tokens)
+        task = self.pending.get(key)
+        if task is None:
+            task = asyncio.create_task(query_cache.get_or_compute(
+                self.collection_name, key, lambda: self._expand(query)
+            ))
+            self.pending[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        return task
+
+    def _finished(self, key: str, task: asyncio.Task) -> None:
+        self.pending.pop(key, None)
+        if not task.cancelled() and task.exception() is not None:
+            # Retrieved here too, since a timed-out caller never awaits it
+            logger.debug(f"Background query refinement failed: {task.exception()}")
+
+    async def expansion(self, query: str) -> Optional[List[str]]:
+        """Expansion terms for a query, or None if the budget ran out or the lookup failed"""
+        start_time = time.perf_counter()
+        task = self._expansion_task(query)
+        try:
+            # Shielded so a timed-out lookup still completes and warms the cache
+            return await asyncio.wait_for(asyncio.shield(task), self.timeout_seconds)
+        except asyncio.TimeoutError:
+            QUERY_REFINEMENTS.labels(outcome='timeout').inc()
+            return None
+        except Exception as e:
+            QUERY_REFINEMENTS.labels(outcome='error').inc()
+            logger.warning(f"Query refinement failed: {e}")
+            return None
+        finally:
+            QUERY_REFINEMENT_LATENCY.observe(time.perf_counter() - start_time)
+
+    async def refine(self, query: str) -> str:
+        """The query followed by its expansion terms, or the raw query as a fallback"""
+        if not settings.QUERY_REFINEMENT_ENABLED or not query.strip():
+            return query
+        terms = await self.expansion(query)
+        if terms is None:
+            return query
+        QUERY_REFINEMENTS.labels(outcome='refined' if terms else 'unchanged').inc()
+        return f"{query} {' '.join(terms)}" if terms else query
+
+
+# Global query refiner instance
+query_refiner = QueryRefiner()
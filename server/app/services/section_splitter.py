@@ -0,0 +1,104 @@
+import codecs
+import re
+from typing import AsyncIterable, AsyncIterator, Dict, Iterable, List, Optional, Union
+
+from ..config import get_settings
+
+settings = get_settings()
+
+_HEADING = re.compile(r'^(#{1,6})\s+(.+?)\s*#*\s*$')
+_FENCE = re.compile(r'^ {0,3}(```|~~~)')
+
+DEFAULT_TITLE = "Content"
+
+
+class SectionSplitter:
+    """Incremental Markdown section splitter, fed one line at a time.
+
+    Only the section being read is held in memory. Headings inside fenced
+    code blocks are ignored, text before the first heading becomes a section
+    titled ``Content``, and sections longer than ``max_chars`` are emitted in
+    parts at line boundaries so each part fits the knowledge content column.
+    Emitted sections are dicts with ``title``, ``content`` and ``part``
+    (0 for the first or only part).
+    """
+
+    def __init__(self, max_chars: Optional[int] = None):
+        self.max_chars = max_chars or settings.KNOWLEDGE_SECTION_MAX_CHARS
+        self.title = DEFAULT_TITLE
+        self.part = 0
+        self.lines: List[str] = []
+        self.size = 0
+        self.in_fence = False
+
+    def feed(self, line: str) -> List[Dict[str, Union[str, int]]]:
+        """Add a line, including its newline, returning any sections it completes"""
+        if _FENCE.match(line):
+            self.in_fence = not self.in_fence
+        elif not self.in_fence:
+            heading = _HEADING.match(line.rstrip('\r\n'))
+            if heading:
+                sections = self._flush()
+                self.title = heading.group(2)
+                self.part = 0
+                return sections
+
+        sections = []
+        while line:
+            if self.size + len(line) > self.max_chars and self.lines:
+                flushed = self._flush()
+                if flushed:
+                    sections.extend(flushed)
+                    self.part += 1
+            # A single line longer than a whole section is cut into section-sized pieces
+            piece, line = line[:self.max_chars], line[self.max_chars:]
+            self.lines.append(piece)
+            self.size += len(piece)
+        return sections
+
+    def close(self) -> List[Dict[str, Union[str, int]]]:
+        """Return the final section"""
+        return self._flush()
+
+    def _flush(self) -> List[Dict[str, Union[str, int]]]:
+        content = ''.join(self.lines).strip()
+        self.lines = []
+        self.size = 0
+        if not content:
+            return []
+        return [{"title": self.title, "content": content, "part": self.part}]
+
+
+def split_sections(lines: Iterable[str], max_chars: Optional[int] = None) -> Iterable[Dict[str, Union[str, int]]]:
+    """Lazily split lines of Markdown into sections"""
+    splitter = SectionSplitter(max_chars)
+    for line in lines:
+        yield from splitter.feed(line)
+    yield from splitter.close()
+
+
+async def iter_text_lines(
+    chunks: AsyncIterable[bytes],
+    max_line: Optional[int] = None,
+    encoding: str = 'utf-8'
+) -> AsyncIterator[str]:
+    """Decode a byte stream incrementally into lines, keeping their newlines.
+
+    Lines longer than ``max_line`` characters are yielded in pieces, so a
+    document without newlines is still read in bounded memory.
+    """
+    max_line = max_line or settings.KNOWLEDGE_SECTION_MAX_CHARS
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    buffer = ''
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        lines = buffer.split('\n')
+        buffer = lines.pop()
+        for line in lines:
+            yield line + '\n'
+        while len(buffer) > max_line:
+            yield buffer[:max_line]
+            buffer = buffer[max_line:]
+    buffer += decoder.decode(b'', final=True)
+    if buffer:
+        yield buffer
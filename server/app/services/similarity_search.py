@@ -1,9 +1,14 @@
+import json
+import os
+from typing import Any, List, Optional, Sequence, Tuple
+
 import numpy as np
 from numpy.linalg import norm
-import numpy as np
-from numpy.linalg import norm
-from tree_sitter import Parser, Language
-from server.app.services.code_embedding_generator import CodeEmbeddingGenerator
+
+from ..config import get_settings
+
+settings = get_settings()
+
 
 def cosine_similarity(a, b):
     """
@@ -11,46 +16,177 @@ def cosine_similarity(a, b):
     """
     return np.dot(a, b) / (norm(a) * norm(b))
 
-from server.app.services.knowledge import KnowledgeService
-from server.app.dependencies import get_db, get_vector_store
 
-async def find_similar_codes(query, code_chunks, top_n=5):
+def normalize_rows(vectors) -> np.ndarray:
+    """
+    L2-normalizes rows (float32) so that a dot product equals cosine similarity.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def top_k_similar_batch(
+    queries: np.ndarray,
+    matrix: np.ndarray,
+    k: int = 5,
+    block_size: Optional[int] = None,
+    mask: Optional[np.ndarray] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Top-k rows of a normalized matrix for each normalized query, best first.
+
+    Each block of ``matrix`` (which may be a memmap) is scored against every
+    query with one matrix-matrix product, and only the per-block top-k
+    survive via ``np.argpartition``, so memory stays bounded by the block
+    size. ``mask`` optionally restricts the rows that may be returned.
+    Returns (indices, scores), both shaped (len(queries), k).
+    """
+    queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+    block_size = block_size or settings.VECTOR_INDEX_BLOCK_SIZE
+    count = len(matrix)
+    allowed = count if mask is None else int(np.count_nonzero(mask[:count]))
+    k = min(k, allowed)
+    if k <= 0:
+        return (
+            np.empty((len(queries), 0), dtype=np.int64),
+            np.empty((len(queries), 0), dtype=np.float32)
+        )
+
+    best_indices = np.empty((len(queries), 0), dtype=np.int64)
+    best_scores = np.empty((len(queries), 0), dtype=np.float32)
+    for start in range(0, count, block_size):
+        block = np.asarray(matrix[start:min(start + block_size, count)], dtype=np.float32)
+        scores = queries @ block.T
+        if mask is not None:
+            scores[:, ~mask[start:start + len(block)]] = -np.inf
+
+        block_k = min(k, scores.shape[1])
+        top = np.argpartition(-scores, block_k - 1, axis=1)[:, :block_k]
+        best_indices = np.concatenate([best_indices, top + start], axis=1)
+        best_scores = np.concatenate([best_scores, np.take_along_axis(scores, top, axis=1)], axis=1)
+
+        if best_indices.shape[1] > k:
+            keep = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+            best_indices = np.take_along_axis(best_indices, keep, axis=1)
+            best_scores = np.take_along_axis(best_scores, keep, axis=1)
+
+    order = np.argsort(-best_scores, axis=1)
+    return np.take_along_axis(best_indices, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+
+def top_k_similar(
+    query: np.ndarray,
+    matrix: np.ndarray,
+    k: int = 5,
+    block_size: Optional[int] = None,
+    mask: Optional[np.ndarray] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Top-k rows of a normalized matrix for one normalized query, best first.
+    """
+    indices, scores = top_k_similar_batch(query, matrix, k, block_size, mask)
+    return indices[0], scores[0]
+
+
+class SimilaritySearch:
+    """
+    Cosine top-k search over a precomputed, normalized chunk embedding matrix.
+
+    The matrix can be saved as ``.npy`` and loaded memory-mapped, so large
+    corpora are scored block by block straight from the page cache without
+    being read into process memory.
+    """
+    def __init__(
+        self,
+        matrix: np.ndarray,
+        ids: Optional[Sequence[str]] = None,
+        block_size: Optional[int] = None
+    ):
+        # Rows must already be L2-normalized; use from_embeddings otherwise
+        self.matrix = matrix
+        self.ids = list(ids) if ids is not None else None
+        self.block_size = block_size
+
+    @classmethod
+    def from_embeddings(
+        cls,
+        embeddings,
+        ids: Optional[Sequence[str]] = None,
+        dtype: str = "float32"
+    ) -> "SimilaritySearch":
+        """
+        Normalizes raw embeddings into a (optionally float16) matrix.
+        """
+        return cls(normalize_rows(embeddings).astype(dtype, copy=False), ids)
+
+    def save(self, path: str) -> None:
+        """
+        Saves the matrix as ``.npy`` plus a JSON sidecar of ids.
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.save(path, np.asarray(self.matrix))
+        if self.ids is not None:
+            with open(f"{path}.ids.json", "w", encoding="utf-8") as f:
+                json.dump(self.ids, f)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "SimilaritySearch":
+        """
+        Loads a saved matrix, memory-mapped read-only by default.
+        """
+        matrix = np.load(path, mmap_mode="r" if mmap else None)
+        ids = None
+        if os.path.exists(f"{path}.ids.json"):
+            with open(f"{path}.ids.json", "r", encoding="utf-8") as f:
+                ids = json.load(f)
+        return cls(matrix, ids)
+
+    def search(self, query_embedding, k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns (row indices, cosine scores) of the k most similar chunks.
+        """
+        return top_k_similar(normalize_rows(query_embedding), self.matrix, k, self.block_size)
+
+    def search_batch(self, query_embeddings, k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Scores several queries at once; results are shaped (len(queries), k).
+        """
+        return top_k_similar_batch(normalize_rows(query_embeddings), self.matrix, k, self.block_size)
+
+
+async def find_similar_codes(
+    query,
+    code_chunks,
+    top_n=5,
+    index: Optional[SimilaritySearch] = None,
+    refiner: Optional[Any] = None
+):
     """
     Finds the top_n most similar code chunks to the query using cosine similarity of embeddings,
-    after refining the query using semantic search.
+    after refining the query with terms from related knowledge items.
+
+    Pass ``index`` to score against a precomputed matrix whose rows line up
+    with ``code_chunks``; otherwise chunk embeddings are taken from
+    ``chunk.embedding`` or generated once and scored in a single pass.
+    Refinement is cached and time-budgeted by ``refiner`` (the shared
+    QueryRefiner by default), falling back to the raw query.
     """
-    db = next(get_db())
-    vector_store = get_vector_store()
-    knowledge_service = KnowledgeService(db, vector_store)
+    from .code_embedding_generator import CodeEmbeddingGenerator
+    from .query_refiner import query_refiner
 
-    # Refine the query using semantic search
-    knowledge_items = await knowledge_service.search_knowledge(query, limit=3)
-    refined_query = query
-    if knowledge_items:
-        # Combine the content of the knowledge items to refine the query
-        refined_query = query + " ".join([item.content for item in knowledge_items])
+    refined_query = await (refiner or query_refiner).refine(query)
 
     embedding_generator = CodeEmbeddingGenerator()
     query_embedding = embedding_generator.generate_embedding(refined_query)
 
-    similarities = []
-    for chunk in code_chunks:
-        chunk_embedding = embedding_generator.generate_embedding(chunk.content)
-        similarity = cosine_similarity(query_embedding, chunk_embedding)
-        similarities.append(similarity)
+    if index is None:
+        embeddings: List = [getattr(chunk, "embedding", None) for chunk in code_chunks]
+        if any(embedding is None for embedding in embeddings):
+            embeddings = [embedding_generator.generate_embedding(chunk.content) for chunk in code_chunks]
+        index = SimilaritySearch.from_embeddings(embeddings)
 
     # Get the indices of the top_n most similar codes
-    top_indices = np.argsort(similarities)[::-1][:top_n]
-    return top_indices, np.array(similarities)[top_indices]
-
-if __name__ == '__main__':
-    # Example usage
-    code_chunks = [
-        type('obj', (object,), {'content': "def foo(): print('foo')"})(),
-        type('obj', (object,), {'content': "def bar(): print('bar')"})(),
-        type('obj', (object,), {'content': "def baz(): print('baz')"})(),
-    ]
-    query = "function that prints something"
-    top_indices, similarities = find_similar_codes(query, code_chunks)
-    print(f"Top indices: {top_indices}")
-    print(f"Similarities: {similarities}")
\ No newline at end of file
+    return index.search(query_embedding, k=top_n)
+
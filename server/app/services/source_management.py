@@ -138,12 +138,8 @@ class SourceManagementService:
         """Close the Neo4j driver connection"""
         self.driver.close()
 
-import os
+from .file_discovery import discover_files
 
 async def get_all_files(path: str = ".") -> List[str]:
-    """Get a list of all files in the project"""
-    all_files = []
-    for root, _, files in os.walk(path):
-        for file in files:
-            all_files.append(os.path.join(root, file))
-    return all_files
\ No newline at end of file
+    """Get a list of all source files in the project, honoring .gitignore and excludes"""
+    return [discovered.path for discovered in discover_files(path)]
\ No newline at end of file
@@ -0,0 +1,412 @@
+import asyncio
+import json
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from ..config import get_settings
+from .file_discovery import discover_files
+
+settings = get_settings()
+
+# File extension -> tree-sitter language name
+LANGUAGES = {
+    '.py': 'python',
+    '.js': 'javascript',
+    '.jsx': 'javascript',
+    '.ts': 'typescript',
+    '.tsx': 'tsx',
+    '.java': 'java',
+    '.go': 'go',
+    '.rs': 'rust',
+    '.rb': 'ruby',
+    '.c': 'c',
+    '.h': 'c',
+    '.cpp': 'cpp',
+    '.hpp': 'cpp',
+}
+
+# Call expression node types and the field holding the callee, per grammar
+_CALL_NODES = {
+    'call': 'function',
+    'call_expression': 'function',
+    'method_invocation': 'name',
+}
+
+_IDENTIFIER_TYPES = {
+    'identifier', 'property_identifier', 'type_identifier', 'field_identifier',
+    'constant', 'shorthand_property_identifier',
+}
+
+# Node types whose text is an identifier or a dotted path of identifiers
+_NAME_TYPES = _IDENTIFIER_TYPES | {
+    'attribute', 'member_expression', 'scoped_identifier', 'field_expression',
+    'selector_expression', 'dotted_name',
+}
+
+_QUERY_TOKEN = re.compile(r'"(?:\\.|[^"\\])*"|[()\[\]]|[^\s()\[\]"]+')
+_SYMBOL = re.compile(r'^[A-Za-z_][\w.]*$')
+_MAX_TEXT = 300
+
+
+class FileSummary(NamedTuple):
+    """Structural facts about one file, used to prune structural queries"""
+    language: str
+    mtime_ns: int
+    size: int
+    node_types: FrozenSet[str]
+    identifiers: FrozenSet[str]
+    calls: FrozenSet[str]
+
+
+class Requirement(NamedTuple):
+    """What a file must contain for one top-level query pattern to match"""
+    node_types: FrozenSet[str]
+    identifiers: FrozenSet[str]
+
+
+def query_requirements(pattern: str) -> List[Requirement]:
+    """Extract the node types and identifiers each top-level pattern needs.
+
+    Only mandatory parts are collected: anything inside an alternation
+    (``[...]``) or under a ``?``/``*`` quantifier is ignored, and only
+    ``#eq?`` predicates comparing an identifier-typed capture with a literal
+    contribute. The result is a necessary condition, so pruning never drops
+    a file that could match; a top-level pattern with nothing indexed to
+    require (an anonymous node or ``_``) yields no requirements at all.
+    """
+    tokens = _QUERY_TOKEN.findall(re.sub(r';[^\n]*', '', pattern))
+    position = 0
+    # Capture name -> node type it is attached to
+    capture_types: Dict[str, str] = {}
+
+    def parse_item() -> Tuple[Set[str], Set[str], Optional[str]]:
+        nonlocal position
+        token = tokens[position]
+        position += 1
+        node_types: Set[str] = set()
+        identifiers: Set[str] = set()
+        head = None
+
+        if token == '[':
+            # Alternatives: none of them is individually required
+            while position < len(tokens) and tokens[position] != ']':
+                parse_child()
+            position += 1
+        elif token == '(' and position < len(tokens) and tokens[position].startswith('#'):
+            predicate = tokens[position]
+            position += 1
+            arguments = []
+            while position < len(tokens) and tokens[position] != ')':
+                arguments.append(tokens[position])
+                position += 1
+            position += 1
+            if predicate == '#eq?' and len(arguments) == 2 and arguments[1].startswith('"'):
+                literal = json.loads(arguments[1])
+                if capture_types.get(arguments[0][1:]) in _NAME_TYPES and _SYMBOL.match(literal):
+                    identifiers.update(part for part in literal.split('.') if part)
+        elif token == '(':
+            head = tokens[position] if position < len(tokens) else ')'
+            if head not in ('(', '[', ')') and not head.startswith('"'):
+                position += 1
+                if head != '_':
+                    node_types.add(head)
+            else:
+                head = None
+            while position < len(tokens) and tokens[position] != ')':
+                child_types, child_identifiers = parse_child()
+                node_types |= child_types
+                identifiers |= child_identifiers
+            position += 1
+        return node_types, identifiers, head
+
+    def parse_child() -> Tuple[Set[str], Set[str]]:
+        nonlocal position
+        node_types, identifiers, head = parse_item()
+        optional = False
+        # Captures and quantifiers trailing the item
+        while position < len(tokens) and (tokens[position].startswith('@') or tokens[position] in ('?', '*', '+')):
+            if tokens[position].startswith('@') and head is not None:
+                capture_types[tokens[position][1:]] = head
+            optional = optional or tokens[position] in ('?', '*')
+            position += 1
+        return (set(), set()) if optional else (node_types, identifiers)
+
+    requirements: List[Requirement] = []
+    while position < len(tokens):
+        token = tokens[position]
+        is_predicate = token == '(' and position + 1 < len(tokens) and tokens[position + 1].startswith('#')
+        if token.startswith('"') or token == '_':
+            # Anonymous nodes and bare wildcards are not indexed, so this
+            # pattern could match in any file
+            return []
+        if token not in ('(', '['):
+            position += 1
+            continue
+        node_types, identifiers = parse_child()
+        if is_predicate and requirements:
+            # A top-level predicate constrains the pattern just before it
+            previous = requirements.pop()
+            requirements.append(Requirement(previous.node_types, previous.identifiers | frozenset(identifiers)))
+        elif not is_predicate:
+            requirements.append(Requirement(frozenset(node_types), frozenset(identifiers)))
+    return requirements
+
+
+def _walk(node):
+    cursor = node.walk()
+    visited_children = False
+    while True:
+        if not visited_children:
+            yield cursor.node
+            if cursor.goto_first_child():
+                continue
+        if cursor.goto_next_sibling():
+            visited_children = False
+        elif cursor.goto_parent():
+            visited_children = True
+        else:
+            return
+
+
+def _summarize_files(files: List[Tuple[str, str]]) -> List[Tuple[str, Optional[Tuple[List[str], List[str], List[str]]]]]:
+    """Worker: parse files and collect node types, identifiers and call targets"""
+    from tree_sitter_languages import get_parser
+
+    results = []
+    for path, language in files:
+        try:
+            with open(path, 'rb') as f:
+                source = f.read()
+            tree = get_parser(language).parse(source)
+        except Exception:
+            results.append((path, None))
+            continue
+
+        node_types: Set[str] = set()
+        identifiers: Set[str] = set()
+        calls: Set[str] = set()
+        for node in _walk(tree.root_node):
+            if not node.is_named:
+                continue
+            node_types.add(node.type)
+            if node.type in _IDENTIFIER_TYPES:
+                identifiers.add(source[node.start_byte:node.end_byte].decode('utf-8', 'replace'))
+            elif node.type in _CALL_NODES:
+                callee = node.child_by_field_name(_CALL_NODES[node.type])
+                if callee is not None and callee.end_byte - callee.start_byte <= _MAX_TEXT:
+                    calls.add(source[callee.start_byte:callee.end_byte].decode('utf-8', 'replace'))
+        results.append((path, (sorted(node_types), sorted(identifiers), sorted(calls))))
+    return results
+
+
+def _query_files(files: List[str], language: str, pattern: str, limit: int) -> List[Dict[str, Any]]:
+    """Worker: run a tree-sitter query over files and return its captures"""
+    from tree_sitter_languages import get_language, get_parser
+
+    query = get_language(language).query(pattern)
+    parser = get_parser(language)
+    matches = []
+    for path in files:
+        try:
+            with open(path, 'rb') as f:
+                source = f.read()
+        except OSError:
+            continue
+        seen = set()
+        for node, capture in query.captures(parser.parse(source).root_node):
+            # A node is reported once per capture even if several matches share it
+            if (capture, node.start_byte, node.end_byte) in seen:
+                continue
+            seen.add((capture, node.start_byte, node.end_byte))
+            matches.append({
+                'file_path': path,
+                'capture': capture,
+                'node_type': node.type,
+                'line_start': node.start_point[0] + 1,
+                'line_end': node.end_point[0] + 1,
+                'text': source[node.start_byte:min(node.end_byte, node.start_byte + _MAX_TEXT)].decode('utf-8', 'replace'),
+            })
+            if len(matches) >= limit:
+                return matches
+    return matches
+
+
+def _batches(items: List[Any], size: int) -> Iterable[List[Any]]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class StructuralIndex:
+    """Per-file index of node types, identifiers and call targets.
+
+    Refreshed incrementally by comparing each file's mtime and size with the
+    indexed values, and persisted as JSON, so only changed files are reparsed.
+    Structural queries use it to skip files that cannot match before running
+    the tree-sitter pattern on the remaining candidates in worker processes.
+    """
+
+    def __init__(self, path: str, workers: Optional[int] = None, batch_size: int = 64):
+        self.path = path
+        self.workers = workers or settings.STRUCTURAL_SEARCH_WORKERS
+        self.batch_size = batch_size
+        self.files: Dict[str, FileSummary] = {}
+        self.lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._load()
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        for path, (language, mtime_ns, size, node_types, identifiers, calls) in data.items():
+            self.files[path] = FileSummary(
+                language, mtime_ns, size,
+                frozenset(node_types), frozenset(identifiers), frozenset(calls)
+            )
+
+    def save(self) -> None:
+        """Atomically persist the index to disk"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with self.lock:
+            data = {
+                path: [
+                    summary.language, summary.mtime_ns, summary.size,
+                    sorted(summary.node_types), sorted(summary.identifiers), sorted(summary.calls)
+                ]
+                for path, summary in self.files.items()
+            }
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    async def refresh(self, root: str = ".") -> int:
+        """Reindex new or changed files below ``root``; returns how many were parsed"""
+        root = os.path.abspath(root)
+        discovered = await asyncio.to_thread(list, discover_files(root))
+
+        stale: List[Tuple[str, str]] = []
+        stats: Dict[str, os.stat_result] = {}
+        seen = set()
+        for item in discovered:
+            language = LANGUAGES.get(os.path.splitext(item.path)[1].lower())
+            if language is None:
+                continue
+            seen.add(item.path)
+            summary = self.files.get(item.path)
+            if summary is None or (summary.mtime_ns, summary.size) != (item.stat.st_mtime_ns, item.stat.st_size):
+                stale.append((item.path, language))
+                stats[item.path] = item.stat
+
+        # Forget files under this root that no longer exist or are now ignored
+        removed = [path for path in self.files if path.startswith(root + os.sep) and path not in seen]
+
+        loop = asyncio.get_running_loop()
+        batches = await asyncio.gather(*[
+            loop.run_in_executor(self.executor, _summarize_files, batch)
+            for batch in _batches(stale, self.batch_size)
+        ])
+
+        languages = dict(stale)
+        with self.lock:
+            for path in removed:
+                del self.files[path]
+            for batch in batches:
+                for path, summary in batch:
+                    if summary is None:
+                        continue
+                    node_types, identifiers, calls = summary
+                    stat = stats[path]
+                    self.files[path] = FileSummary(
+                        languages[path], stat.st_mtime_ns, stat.st_size,
+                        frozenset(node_types), frozenset(identifiers), frozenset(calls)
+                    )
+
+        if stale or removed:
+            await asyncio.to_thread(self.save)
+        return len(stale)
+
+    def candidates(
+        self,
+        root: str,
+        language: str,
+        requirements: List[Requirement],
+        calls: Optional[List[str]] = None
+    ) -> List[str]:
+        """Files below ``root`` in ``language`` that could match the requirements"""
+        root = os.path.abspath(root)
+        with self.lock:
+            files = list(self.files.items())
+
+        selected = []
+        for path, summary in files:
+            if summary.language != language or not path.startswith(root + os.sep):
+                continue
+            if calls and not any(call in summary.calls for call in calls):
+                continue
+            if requirements and not any(
+                requirement.node_types <= summary.node_types
+                and requirement.identifiers <= summary.identifiers
+                for requirement in requirements
+            ):
+                continue
+            selected.append(path)
+        return sorted(selected)
+
+    async def search(
+        self,
+        pattern: str,
+        language: str = 'python',
+        root: str = ".",
+        calls: Optional[List[str]] = None,
+        limit: int = 1000
+    ) -> Dict[str, Any]:
+        """Run a tree-sitter query pattern over the candidate files below ``root``.
+
+        Raises ValueError if the pattern does not compile for ``language``.
+        """
+        from tree_sitter_languages import get_language
+
+        try:
+            get_language(language).query(pattern)
+        except Exception as e:
+            raise ValueError(f"Invalid {language} query pattern: {e}")
+
+        await self.refresh(root)
+        candidates = self.candidates(root, language, query_requirements(pattern), calls)
+
+        loop = asyncio.get_running_loop()
+        batches = await asyncio.gather(*[
+            loop.run_in_executor(self.executor, _query_files, batch, language, pattern, limit)
+            for batch in _batches(candidates, self.batch_size)
+        ])
+        matches = [match for batch in batches for match in batch][:limit]
+
+        return {
+            'results': matches,
+            'count': len(matches),
+            'files_indexed': sum(1 for summary in self.files.values() if summary.language == language),
+            'files_searched': len(candidates),
+        }
+
+
+# Shared index instance, loaded on first use
+_index: Optional[StructuralIndex] = None
+
+
+def get_structural_index() -> StructuralIndex:
+    """Get the structural index, loading it on first use"""
+    global _index
+    if _index is None:
+        _index = StructuralIndex(os.path.join(settings.VECTOR_DB_PATH, 'structural', 'index.json'))
+    return _index
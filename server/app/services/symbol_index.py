@@ -0,0 +1,261 @@
+import bisect
+import json
+import os
+import re
+import threading
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Pattern, Set
+
+from ..config import get_settings
+from ..core.persistence import DeferredSave
+from ..models.code import CodeChunk
+
+settings = get_settings()
+
+# Match kinds, best first
+EXACT = 'exact'
+PREFIX = 'prefix'
+QUALIFIED = 'qualified'
+FUZZY = 'fuzzy'
+_MATCH_RANK = {EXACT: 0, PREFIX: 1, QUALIFIED: 2, FUZZY: 3}
+
+
+class Symbol(NamedTuple):
+    """A named code chunk (function, class, ...) known to the symbol index"""
+    chunk_id: str
+    name: str
+    qualified_name: str
+    type: str
+    file_path: str
+    line_start: int
+
+
+class SymbolMatch(NamedTuple):
+    symbol: Symbol
+    match: str
+    references: int
+
+
+def qualified_name(file_path: str, name: str) -> str:
+    """Dotted module path plus symbol name, e.g. ``app.services.vector_store.VectorDocument``"""
+    relative = os.path.relpath(file_path) if os.path.isabs(file_path) else file_path
+    if relative.startswith('..'):
+        relative = file_path
+    module = os.path.splitext(relative)[0].replace(os.sep, '/').strip('./').replace('/', '.')
+    return f"{module}.{name}" if module else name
+
+
+def _subsequence_pattern(query: str) -> Pattern[str]:
+    """Regex finding lines that start with query[0] and contain the rest in order"""
+    # '[^c\\n]*c' steps to the next occurrence of c without backtracking
+    body = re.escape(query[0]) + ''.join(f"[^{re.escape(char)}\\n]*{re.escape(char)}" for char in query[1:])
+    return re.compile('^(' + body + '[^\\n]*)$', re.MULTILINE)
+
+
+class SymbolIndex:
+    """In-memory autocomplete index over chunk symbol names.
+
+    Lowercased names, and separately every dotted suffix of their qualified
+    paths, are kept in sorted arrays, so prefix lookups are a binary search.
+    Fuzzy subsequence matching scans only names sharing the query's first
+    character. Symbols are persisted as JSON and updated incrementally as
+    chunks are (re)indexed; writes are saved in the background, at most once
+    per ``CODE_INDEX_SAVE_DELAY_SECONDS``.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        # chunk_id -> symbol
+        self.symbols: Dict[str, Symbol] = {}
+        # Sorted lowercase lookup keys (plain names and dotted paths), and key -> chunk ids
+        self.names: List[str] = []
+        self.paths: List[str] = []
+        self.key_ids: Dict[str, Set[str]] = {}
+        # Keys added since the sorted arrays were last updated
+        self.new_keys: List[str] = []
+        # First character -> newline-joined names, scanned by fuzzy matching
+        self.fuzzy_text: Dict[str, str] = {}
+        self.persistence = DeferredSave(self.save, settings.CODE_INDEX_SAVE_DELAY_SECONDS)
+        self._load()
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            rows = json.load(f)
+        for row in rows:
+            self._add(Symbol(*row))
+        self._merge_new_keys()
+
+    def save(self) -> None:
+        """Atomically persist the index to disk"""
+        # Symbols are immutable tuples, so copying the list is a consistent snapshot
+        with self.lock:
+            symbols = list(self.symbols.values())
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(symbols, f)
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def _keys_for(symbol: Symbol) -> Set[str]:
+        parts = symbol.qualified_name.lower().split('.')
+        keys = {'.'.join(parts[i:]) for i in range(len(parts))}
+        keys.add(symbol.name.lower())
+        return keys
+
+    def _sorted_keys(self, key: str) -> List[str]:
+        return self.paths if '.' in key else self.names
+
+    def _add(self, symbol: Symbol) -> None:
+        self.symbols[symbol.chunk_id] = symbol
+        for key in self._keys_for(symbol):
+            ids = self.key_ids.get(key)
+            if ids is None:
+                ids = self.key_ids[key] = set()
+                self.new_keys.append(key)
+            ids.add(symbol.chunk_id)
+
+    def _merge_new_keys(self) -> None:
+        """Insert pending keys into the sorted arrays, re-sorting for large batches"""
+        self.fuzzy_text.clear()
+        if len(self.new_keys) > 64:
+            self.names = sorted(key for key in self.key_ids if '.' not in key)
+            self.paths = sorted(key for key in self.key_ids if '.' in key)
+        else:
+            for key in self.new_keys:
+                if key in self.key_ids:
+                    bisect.insort(self._sorted_keys(key), key)
+        self.new_keys = []
+
+    def _remove(self, chunk_id: str) -> None:
+        symbol = self.symbols.pop(chunk_id, None)
+        if symbol is None:
+            return
+        for key in self._keys_for(symbol):
+            ids = self.key_ids.get(key)
+            if ids is None:
+                continue
+            ids.discard(chunk_id)
+            if not ids:
+                del self.key_ids[key]
+                self.fuzzy_text.pop(key[0], None)
+                keys = self._sorted_keys(key)
+                position = bisect.bisect_left(keys, key)
+                if position < len(keys) and keys[position] == key:
+                    keys.pop(position)
+
+    def upsert(self, chunks: Iterable[CodeChunk], persist: bool = True) -> None:
+        """Index the named chunks, replacing any previous symbol for each chunk id"""
+        with self.lock:
+            for chunk in chunks:
+                self._remove(chunk.id)
+                name = chunk.metadata.name if chunk.metadata else None
+                if name:
+                    self._add(Symbol(
+                        chunk.id, name, qualified_name(chunk.file_path, name),
+                        chunk.type, chunk.file_path, chunk.line_start
+                    ))
+            self._merge_new_keys()
+        if persist:
+            self.persistence.schedule()
+
+    def delete(self, chunk_ids: Iterable[str], persist: bool = True) -> None:
+        """Remove symbols by chunk id"""
+        with self.lock:
+            for chunk_id in chunk_ids:
+                self._remove(chunk_id)
+        if persist:
+            self.persistence.schedule()
+
+    @staticmethod
+    def _prefix_keys(keys: List[str], prefix: str) -> List[str]:
+        start = bisect.bisect_left(keys, prefix)
+        end = bisect.bisect_left(keys, prefix + '\uffff', start)
+        return keys[start:end]
+
+    def exact(self, name: str) -> List[Symbol]:
+        """Symbols whose name equals ``name`` (case-insensitive), exact-case first"""
+        with self.lock:
+            symbols = [
+                self.symbols[chunk_id]
+                for chunk_id in self.key_ids.get(name.lower(), ())
+                if self.symbols[chunk_id].name.lower() == name.lower()
+            ]
+        return sorted(symbols, key=lambda symbol: symbol.name != name)
+
+    def complete(
+        self,
+        query: str,
+        limit: int = 10,
+        fuzzy: bool = True,
+        references: Optional[Callable[[str], int]] = None
+    ) -> List[SymbolMatch]:
+        """Rank symbols matching ``query`` by match kind, then reference count.
+
+        ``references`` maps a symbol name to how often it is referenced; with
+        none given all symbols count as unreferenced.
+        """
+        needle = query.strip().lower()
+        if not needle:
+            return []
+
+        matches: Dict[str, str] = {}
+        with self.lock:
+            for key in self._prefix_keys(self.names, needle) + self._prefix_keys(self.paths, needle):
+                for chunk_id in self.key_ids[key]:
+                    symbol_name = self.symbols[chunk_id].name.lower()
+                    if symbol_name == needle:
+                        kind = EXACT
+                    elif key == symbol_name:
+                        kind = PREFIX
+                    else:
+                        kind = QUALIFIED
+                    if _MATCH_RANK[kind] < _MATCH_RANK.get(matches.get(chunk_id), 4):
+                        matches[chunk_id] = kind
+
+            if fuzzy and len(matches) < limit and '.' not in needle:
+                # Fuzzy hits rank last, so a bounded pool is enough to fill the page
+                text = self.fuzzy_text.get(needle[0])
+                if text is None:
+                    text = self.fuzzy_text[needle[0]] = '\n'.join(self._prefix_keys(self.names, needle[0]))
+                budget = limit * 20
+                for found in _subsequence_pattern(needle).finditer(text):
+                    if budget <= 0:
+                        break
+                    for chunk_id in self.key_ids[found.group(1)]:
+                        if chunk_id not in matches:
+                            matches[chunk_id] = FUZZY
+                            budget -= 1
+
+            candidates = [(self.symbols[chunk_id], kind) for chunk_id, kind in matches.items()]
+
+        counts: Dict[str, int] = {}
+        results = []
+        for symbol, kind in candidates:
+            if symbol.name not in counts:
+                counts[symbol.name] = references(symbol.name) if references else 0
+            results.append(SymbolMatch(symbol, kind, counts[symbol.name]))
+
+        results.sort(key=lambda match: (
+            _MATCH_RANK[match.match],
+            not match.symbol.name.startswith(query.strip()),  # exact-case matches first
+            -match.references,
+            len(match.symbol.name),
+            match.symbol.qualified_name
+        ))
+        return results[:limit]
+
+
+# Indexes are shared by every service instance in the process
+_indexes: Dict[str, SymbolIndex] = {}
+
+
+def get_symbol_index(name: str) -> SymbolIndex:
+    """Get the symbol index for a collection, loading it on first use"""
+    index = _indexes.get(name)
+    if index is None:
+        path = os.path.join(settings.VECTOR_DB_PATH, 'symbols', f"{name}.json")
+        index = _indexes[name] = SymbolIndex(path)
+    return index
@@ -0,0 +1,975 @@
+import asyncio
+import json
+import os
+import heapq
+import threading
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: the single-writer lock is not enforced
+    fcntl = None
+
+from ..models.code import CodeChunk
+from ..config import get_settings
+from ..core.query_cache import query_cache
+from .lexical_index import get_lexical_index
+from .query_refiner import query_refiner
+from .similarity_search import top_k_similar_batch
+from .symbol_index import get_symbol_index
+from .vector_store import (
+    CODE_COLLECTION,
+    SHARD_SEPARATOR,
+    VectorDocument,
+    build_code_where,
+    code_chunk_from_result,
+    code_chunk_metadata,
+    code_shard_name,
+    fuse_code_results,
+    refine_queries,
+    select_code_shards,
+)
+
+settings = get_settings()
+
+EmbeddingFunction = Callable[[List[str]], Awaitable[List[List[float]]]]
+
+# Comparison operators supported in where clauses (Chroma-compatible subset)
+_OPERATORS: Dict[str, Callable[[Any, Any], bool]] = {
+    '$eq': lambda value, target: value == target,
+    '$ne': lambda value, target: value != target,
+    '$gt': lambda value, target: value is not None and value > target,
+    '$gte': lambda value, target: value is not None and value >= target,
+    '$lt': lambda value, target: value is not None and value < target,
+    '$lte': lambda value, target: value is not None and value <= target,
+    '$in': lambda value, target: value in target,
+    '$nin': lambda value, target: value not in target,
+}
+
+
+# Logs smaller than this are never folded into a checkpoint
+_MIN_CHECKPOINT_BYTES = 1 << 20
+
+
+def _file_signature(path: str) -> Optional[Tuple[int, int]]:
+    """Inode and modification time, which change whenever a file is replaced or written"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize rows so that a dot product equals cosine similarity"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first"""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+def _spherical_kmeans(
+    data: np.ndarray,
+    n_clusters: int,
+    iterations: int = 10,
+    seed: int = 0
+) -> np.ndarray:
+    """Train cosine k-means centroids over normalized vectors"""
+    rng = np.random.default_rng(seed)
+    centroids = data[rng.choice(len(data), n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = np.argmax(data @ centroids.T, axis=1)
+        for cluster in range(n_clusters):
+            members = data[assignments == cluster]
+            if len(members):
+                centroids[cluster] = members.mean(axis=0)
+        centroids = _normalize(centroids)
+    return centroids
+
+
+class _Collection:
+    """Memory-mapped vectors plus an id table and columnar metadata for one collection.
+
+    Vectors live in a ``vectors*.bin`` file opened with ``np.memmap`` so that
+    every worker process mapping it shares the OS page cache. The id table,
+    documents and metadata columns are checkpointed to ``meta.json``; writes
+    made since the checkpoint are appended to a log that readers replay, so
+    a write costs O(rows written) rather than a rewrite of the whole table.
+
+    Each collection has a single writer: the first process to write takes an
+    exclusive lock on ``write.lock``, and writes from any other process
+    raise. Within a process a lock orders writes against the snapshot each
+    read takes. Deleted rows are tombstoned and reclaimed by ``compact``
+    once they exceed ``VECTOR_INDEX_COMPACT_RATIO`` of the rows.
+    """
+
+    def __init__(self, path: str, dtype: str):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.meta_path = os.path.join(path, 'meta.json')
+        self.ivf_path = os.path.join(path, 'ivf.npz')
+        self.lock_path = os.path.join(path, 'write.lock')
+        self._lock = threading.RLock()
+        self._writer_lock = None
+        self._vectors: Optional[np.memmap] = None
+        self._ivf: Optional[Dict[str, np.ndarray]] = None
+        os.makedirs(path, exist_ok=True)
+        self._load()
+
+    @property
+    def vectors_path(self) -> str:
+        return os.path.join(self.path, self.vectors_file)
+
+    @property
+    def log_path(self) -> str:
+        return os.path.join(self.path, f'log.{self.generation}.jsonl')
+
+    # Persistence
+
+    def _load(self) -> None:
+        """Load the last checkpoint, replay the log written since, and map the vector file"""
+        self._meta_signature = _file_signature(self.meta_path)
+        if self._meta_signature:
+            with open(self.meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        else:
+            meta = {}
+        self._meta_size = os.path.getsize(self.meta_path) if self._meta_signature else 0
+
+        self.generation: int = meta.get('generation', 0)
+        self.vectors_file: str = meta.get('vectors_file', 'vectors.bin')
+        self.dim: Optional[int] = meta.get('dim')
+        self.capacity: int = meta.get('capacity', 0)
+        self.ids: List[str] = meta.get('ids', [])
+        self.documents: List[str] = meta.get('documents', [])
+        self.columns: Dict[str, List[Any]] = meta.get('columns', {})
+        self.deleted = np.zeros(len(self.ids), dtype=bool)
+        if meta.get('deleted'):
+            self.deleted[meta['deleted']] = True
+        self.row_of: Dict[str, int] = {
+            id: row for row, id in enumerate(self.ids) if not self.deleted[row]
+        }
+
+        self._vectors = None
+        if self.dim and self.capacity and os.path.exists(self.vectors_path):
+            self._vectors = np.memmap(
+                self.vectors_path,
+                dtype=self.dtype,
+                mode='r+',
+                shape=(self.capacity, self.dim)
+            )
+
+        self._log_offset = 0
+        self._load_ivf()
+        self._replay_log()
+
+    def _replay_log(self) -> None:
+        """Apply complete log records appended since the last replay"""
+        if not os.path.exists(self.log_path):
+            return
+        with open(self.log_path, 'rb') as f:
+            f.seek(self._log_offset)
+            data = f.read()
+        # A trailing partial line is a record the writer has not finished
+        end = data.rfind(b'\n') + 1
+        position = self._log_offset
+        for line in data[:end].splitlines(keepends=True):
+            record = json.loads(line)
+            if 'upsert' in record:
+                for row, id, document, metadata in record['upsert']:
+                    self._set_row(row, id, document, metadata)
+                self._grow_deleted()
+                # Assignments logged before the IVF file was written are already in it
+                if 'ivf' in record and self._ivf is not None and position >= self._ivf_log_offset:
+                    rows, lists = zip(*record['ivf'])
+                    self._assign_ivf(list(rows), np.array(lists, dtype=np.int32))
+            else:
+                self._tombstone(record['delete'])
+            position += len(line)
+        self._log_offset = position
+
+    def _load_ivf(self) -> None:
+        """Load the IVF index if it was written for the current vector file and log"""
+        self._ivf = None
+        self._ivf_log_offset = 0
+        self._ivf_signature = _file_signature(self.ivf_path)
+        if self._ivf_signature:
+            with np.load(self.ivf_path) as ivf:
+                data = {key: ivf[key] for key in ivf.files}
+            vectors_file = str(data.pop('vectors_file', np.array(['vectors.bin']))[0])
+            generation, log_offset = data.pop('log_position', np.array([-1, 0])).tolist()
+            # An index from another generation misses assignments from a truncated log;
+            # dropping it falls back to exact search until the next rebuild
+            if vectors_file == self.vectors_file and generation == self.generation:
+                self._ivf = data
+                self._ivf_log_offset = log_offset
+
+    def _acquire_writer(self) -> None:
+        """Take the collection's cross-process write lock, once per process"""
+        if self._writer_lock is not None or fcntl is None:
+            return
+        handle = open(self.lock_path, 'a')
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            raise RuntimeError(
+                f"Vector collection {self.path} is written by another process; "
+                "VectorIndex supports a single writer per collection"
+            )
+        self._writer_lock = handle
+        # Pick up anything a previous writer left behind
+        self._load()
+
+    def _append_log(self, record: Dict[str, Any], checkpoint: bool = False) -> None:
+        """Log a write, folding the log into a checkpoint once it outgrows meta.json"""
+        if self._vectors is not None:
+            self._vectors.flush()
+        if not checkpoint:
+            line = (json.dumps(record, default=str) + '\n').encode('utf-8')
+            with open(self.log_path, 'ab') as f:
+                f.write(line)
+            self._log_offset += len(line)
+            checkpoint = self._log_offset > max(self._meta_size, _MIN_CHECKPOINT_BYTES)
+        if checkpoint:
+            self._checkpoint()
+
+    def _checkpoint(self) -> None:
+        """Atomically write the full table to meta.json and start a new, empty log"""
+        if self._vectors is not None:
+            self._vectors.flush()
+
+        old_log_path = self.log_path
+        meta = {
+            'generation': self.generation + 1,
+            'vectors_file': self.vectors_file,
+            'dim': self.dim,
+            'capacity': self.capacity,
+            'ids': self.ids,
+            'documents': self.documents,
+            'columns': self.columns,
+            'deleted': np.flatnonzero(self.deleted).tolist(),
+        }
+        tmp_path = f"{self.meta_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, default=str)
+        os.replace(tmp_path, self.meta_path)
+
+        self.generation += 1
+        self._meta_signature = _file_signature(self.meta_path)
+        self._meta_size = os.path.getsize(self.meta_path)
+        self._log_offset = 0
+        # The log held the IVF assignments made since it was last saved
+        if self._ivf is not None:
+            self._save_ivf()
+        if os.path.exists(old_log_path):
+            os.remove(old_log_path)
+
+    def refresh(self) -> None:
+        """Catch up with writes made by another process"""
+        with self._lock:
+            if _file_signature(self.meta_path) != self._meta_signature:
+                self._load()
+                return
+            if _file_signature(self.ivf_path) != self._ivf_signature:
+                # A rebuilt index must be followed by the log written after it
+                self._load()
+                return
+            self._replay_log()
+
+    def _ensure_capacity(self, rows: int, dim: int) -> bool:
+        """Grow the vector file (by doubling) so it can hold ``rows`` rows; True if it grew"""
+        if self.dim is None:
+            self.dim = dim
+        elif self.dim != dim:
+            raise ValueError(f"Embedding dimension {dim} does not match collection dimension {self.dim}")
+
+        if rows <= self.capacity:
+            return False
+
+        new_capacity = max(rows, self.capacity * 2, 1024)
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._vectors = None
+        with open(self.vectors_path, 'ab') as f:
+            f.truncate(new_capacity * self.dim * self.dtype.itemsize)
+        self.capacity = new_capacity
+        self._vectors = np.memmap(
+            self.vectors_path,
+            dtype=self.dtype,
+            mode='r+',
+            shape=(self.capacity, self.dim)
+        )
+        return True
+
+    # Writes
+
+    def _set_row(self, row: int, id: str, document: str, metadata: Dict[str, Any]) -> None:
+        """Write the id, document and metadata of a new (appended) or existing row"""
+        if row == len(self.ids):
+            self.ids.append(id)
+            self.documents.append(document)
+            for column in self.columns.values():
+                column.append(None)
+        else:
+            self.documents[row] = document
+            for column in self.columns.values():
+                column[row] = None
+        self.row_of[id] = row
+
+        for key, value in metadata.items():
+            if key not in self.columns:
+                self.columns[key] = [None] * len(self.ids)
+            self.columns[key][row] = value
+
+    def _grow_deleted(self) -> None:
+        """Extend the tombstone mask over appended rows"""
+        if len(self.deleted) < len(self.ids):
+            self.deleted = np.concatenate([
+                self.deleted,
+                np.zeros(len(self.ids) - len(self.deleted), dtype=bool)
+            ])
+
+    def _tombstone(self, ids: List[str]) -> None:
+        for id in ids:
+            row = self.row_of.pop(id, None)
+            if row is not None:
+                self.deleted[row] = True
+
+    def upsert(
+        self,
+        ids: List[str],
+        vectors: np.ndarray,
+        documents: List[str],
+        metadatas: List[Dict[str, Any]]
+    ) -> None:
+        """Insert new rows or overwrite existing ones in place"""
+        vectors = _normalize(vectors)
+        with self._lock:
+            self._acquire_writer()
+            grew = self._ensure_capacity(len(self.ids) + len(ids), vectors.shape[1])
+
+            records = []
+            for id, vector, document, metadata in zip(ids, vectors, documents, metadatas):
+                row = self.row_of.get(id)
+                if row is None:
+                    row = len(self.ids)
+                self._vectors[row] = vector.astype(self.dtype)
+                self._set_row(row, id, document, metadata or {})
+                records.append([row, id, document, metadata or {}])
+            self._grow_deleted()
+
+            record: Dict[str, Any] = {'upsert': records}
+            assignments = self._update_ivf([row for row, _, _, _ in records])
+            if assignments:
+                record['ivf'] = assignments
+            # A grown vector file changes the capacity, which only a checkpoint records
+            self._append_log(record, checkpoint=grew)
+
+    def delete(self, ids: List[str]) -> None:
+        """Tombstone rows, compacting once enough of the collection is dead"""
+        with self._lock:
+            self._acquire_writer()
+            ids = [id for id in ids if id in self.row_of]
+            if not ids:
+                return
+            self._tombstone(ids)
+            self._append_log({'delete': ids})
+            if np.count_nonzero(self.deleted) > settings.VECTOR_INDEX_COMPACT_RATIO * len(self.ids):
+                self.compact()
+
+    def compact(self) -> None:
+        """Drop tombstoned rows, copying the live vectors into a fresh file"""
+        with self._lock:
+            self._acquire_writer()
+            live = np.flatnonzero(~self.deleted[:len(self.ids)])
+            if len(live) == len(self.ids):
+                return
+
+            old_vectors_path = self.vectors_path
+            vectors_file = f'vectors.{self.generation + 1}.bin'
+            capacity = max(len(live), 1024)
+            vectors = None
+            if self.dim and self._vectors is not None:
+                path = os.path.join(self.path, vectors_file)
+                with open(path, 'wb') as f:
+                    f.truncate(capacity * self.dim * self.dtype.itemsize)
+                vectors = np.memmap(path, dtype=self.dtype, mode='r+', shape=(capacity, self.dim))
+                block = settings.VECTOR_INDEX_BLOCK_SIZE
+                for start in range(0, len(live), block):
+                    rows = live[start:start + block]
+                    vectors[start:start + len(rows)] = self._vectors[rows]
+
+            # New lists rather than in-place edits, so snapshots held by readers stay valid
+            self.ids = [self.ids[row] for row in live]
+            self.documents = [self.documents[row] for row in live]
+            self.columns = {
+                key: [column[row] for row in live]
+                for key, column in self.columns.items()
+            }
+            self.deleted = np.zeros(len(self.ids), dtype=bool)
+            self.row_of = {id: row for row, id in enumerate(self.ids)}
+            if vectors is not None:
+                self.vectors_file, self.capacity, self._vectors = vectors_file, capacity, vectors
+            self._ivf = None
+
+            self._checkpoint()
+            if vectors is not None and os.path.exists(old_vectors_path):
+                os.remove(old_vectors_path)
+            if len(self.ids) >= settings.VECTOR_INDEX_IVF_THRESHOLD:
+                self._build_ivf()
+            elif os.path.exists(self.ivf_path):
+                os.remove(self.ivf_path)
+                self._ivf_signature = None
+
+    # IVF graph for large collections
+
+    def _update_ivf(self, rows: List[int]) -> Optional[List[List[int]]]:
+        """Build or rebuild the IVF index depending on collection size, or assign written rows.
+
+        Returns the (row, list) assignments to log with the write; they are
+        only saved to the IVF file on the next build or checkpoint.
+        """
+        count = len(self.ids)
+        if count < settings.VECTOR_INDEX_IVF_THRESHOLD:
+            return None
+
+        if self._ivf is None or count >= 2 * int(self._ivf['trained_on'][0]):
+            self._build_ivf()
+            return None
+
+        # Only appended and overwritten rows need to be (re)assigned to a list
+        vectors = np.asarray(self._vectors[rows], dtype=np.float32)
+        lists = np.argmax(vectors @ self._ivf['centroids'].T, axis=1).astype(np.int32)
+        self._assign_ivf(rows, lists)
+        return [[row, list_id] for row, list_id in zip(rows, lists.tolist())]
+
+    def _assign_ivf(self, rows: List[int], lists: np.ndarray) -> None:
+        """Set the IVF list of rows, extending the assignments over appended rows"""
+        assignments = self._ivf['assignments']
+        size = max(len(assignments), max(rows) + 1)
+        # A new array rather than an in-place edit, so snapshots held by readers stay valid
+        assignments = np.concatenate([assignments, np.zeros(size - len(assignments), dtype=np.int32)])
+        assignments[rows] = lists
+        self._ivf = {
+            key: value for key, value in self._ivf.items()
+            if key not in ('order', 'bounds')
+        }
+        self._ivf['assignments'] = assignments
+
+    def _build_ivf(self) -> None:
+        """Train centroids on a sample and assign every row to a list"""
+        count = len(self.ids)
+        n_clusters = max(1, int(np.sqrt(count)))
+        rng = np.random.default_rng(0)
+        sample_size = min(count, n_clusters * 40)
+        sample_rows = np.sort(rng.choice(count, sample_size, replace=False))
+        sample = np.asarray(self._vectors[sample_rows], dtype=np.float32)
+        centroids = _spherical_kmeans(sample, n_clusters)
+
+        assignments = np.empty(count, dtype=np.int32)
+        block = settings.VECTOR_INDEX_BLOCK_SIZE
+        for start in range(0, count, block):
+            rows = np.asarray(self._vectors[start:min(start + block, count)], dtype=np.float32)
+            assignments[start:start + len(rows)] = np.argmax(rows @ centroids.T, axis=1)
+
+        self._ivf = {
+            'centroids': centroids,
+            'assignments': assignments,
+            'trained_on': np.array([count]),
+        }
+        self._save_ivf()
+
+    def _save_ivf(self) -> None:
+        """Persist the IVF centroids and list assignments.
+
+        The file is tagged with the vector file it indexes and the log position
+        it is current up to, so readers replay only later assignments.
+        """
+        self._ivf = {
+            key: value for key, value in self._ivf.items()
+            if key not in ('order', 'bounds')
+        }
+        tmp_path = f"{self.ivf_path}.tmp.npz"
+        np.savez(
+            tmp_path,
+            vectors_file=np.array([self.vectors_file]),
+            log_position=np.array([self.generation, self._log_offset]),
+            **self._ivf
+        )
+        os.replace(tmp_path, self.ivf_path)
+        self._ivf_signature = _file_signature(self.ivf_path)
+        self._ivf_log_offset = self._log_offset
+
+    def _ivf_lists(self) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray, int]]:
+        """Centroids, rows sorted by list, list bounds and the number of assigned rows"""
+        if self._ivf is None:
+            return None
+
+        if 'order' not in self._ivf:
+            assignments = self._ivf['assignments']
+            order = np.argsort(assignments, kind='stable')
+            self._ivf = {
+                **self._ivf,
+                'order': order,
+                'bounds': np.searchsorted(
+                    assignments[order],
+                    np.arange(len(self._ivf['centroids']) + 1)
+                ),
+            }
+        ivf = self._ivf
+        return ivf['centroids'], ivf['order'], ivf['bounds'], len(ivf['assignments'])
+
+    # Reads
+
+    def where_mask(self, where: Optional[dict]) -> np.ndarray:
+        """Evaluate a Chroma-style where clause into a boolean row mask"""
+        count = len(self.ids)
+        if not where:
+            return np.ones(count, dtype=bool)
+
+        mask = np.ones(count, dtype=bool)
+        for key, condition in where.items():
+            if key == '$and':
+                for clause in condition:
+                    mask &= self.where_mask(clause)
+            elif key == '$or':
+                any_mask = np.zeros(count, dtype=bool)
+                for clause in condition:
+                    any_mask |= self.where_mask(clause)
+                mask &= any_mask
+            else:
+                column = self.columns.get(key, [None] * count)
+                if not isinstance(condition, dict):
+                    condition = {'$eq': condition}
+                for operator, target in condition.items():
+                    compare = _OPERATORS[operator]
+                    mask &= np.fromiter(
+                        (compare(value, target) for value in column),
+                        dtype=bool,
+                        count=count
+                    )
+        return mask
+
+    def _hit(self, row: int) -> Tuple[str, str, Dict[str, Any]]:
+        return self.ids[row], self.documents[row], self.metadata(row)
+
+    def query(
+        self,
+        queries: np.ndarray,
+        n_results: int,
+        where: Optional[dict] = None
+    ) -> List[List[Tuple[float, str, str, Dict[str, Any]]]]:
+        """Top-k (score, id, document, metadata) hits for each normalized query vector"""
+        # Snapshot under the lock; scoring runs outside it so writers are not held up
+        with self._lock:
+            count = len(self.ids)
+            if self._vectors is None or count == 0:
+                return [[] for _ in range(len(queries))]
+            allowed = ~self.deleted[:count] & self.where_mask(where)
+            ids, vectors = self.ids, self._vectors
+            ivf = self._ivf_lists()
+
+        if ivf is None:
+            # Exact brute force: every query scored per block of the mapped file in one matmul
+            indices, scores = top_k_similar_batch(
+                queries, vectors[:count], n_results, settings.VECTOR_INDEX_BLOCK_SIZE, mask=allowed
+            )
+            hits = [
+                [(float(score), int(row)) for row, score in zip(rows, row_scores)]
+                for rows, row_scores in zip(indices, scores)
+            ]
+        else:
+            centroids, order, bounds, assigned = ivf
+            # Rows appended since the assignments were last saved are always candidates
+            unassigned = np.arange(min(assigned, count), count)
+            hits = []
+            for query in queries:
+                probes = _top_k(centroids @ query, settings.VECTOR_INDEX_NPROBE)
+                candidates = np.concatenate([order[bounds[p]:bounds[p + 1]] for p in probes] + [unassigned])
+                candidates = np.sort(candidates[candidates < count])
+                candidates = candidates[allowed[candidates]]
+                scores = np.asarray(vectors[candidates], dtype=np.float32) @ query
+                top = _top_k(scores, n_results)
+                hits.append([(float(scores[i]), int(candidates[i])) for i in top])
+
+        with self._lock:
+            if ids is not self.ids:
+                # Compacted or reloaded meanwhile: rows were renumbered, so score the new layout
+                return self.query(queries, n_results, where)
+            return [
+                [(score, *self._hit(row)) for score, row in query_hits]
+                for query_hits in hits
+            ]
+
+    def get(self, ids: List[str], where: Optional[dict] = None) -> List[Tuple[str, str, Dict[str, Any]]]:
+        """Stored (id, document, metadata) for the given ids that pass the where clause"""
+        with self._lock:
+            rows = [self.row_of[id] for id in ids if id in self.row_of]
+            if not rows:
+                return []
+            allowed = self.where_mask(where) if where else None
+            return [
+                self._hit(row)
+                for row in rows
+                if allowed is None or allowed[row]
+            ]
+
+    def ids_where(self, where: dict) -> List[str]:
+        """Ids of the live rows that pass the where clause"""
+        with self._lock:
+            count = len(self.ids)
+            rows = np.flatnonzero(self.where_mask(where) & ~self.deleted[:count])
+            return [self.ids[row] for row in rows]
+
+    def metadata(self, row: int) -> Dict[str, Any]:
+        """Reassemble the metadata dict for a row from the columns"""
+        return {
+            key: column[row]
+            for key, column in self.columns.items()
+            if column[row] is not None
+        }
+
+
+# Open collections are shared by every VectorIndex instance in the process
+_collections: Dict[str, _Collection] = {}
+
+
+class VectorIndex:
+    """In-process, memory-mapped vector index with the VectorStoreService interface.
+
+    Intended for single-node deployments where the Chroma client's SQLite and
+    serialization overhead dominates query latency. Small collections are
+    searched exactly with a brute-force matrix product; collections above
+    ``VECTOR_INDEX_IVF_THRESHOLD`` rows use an IVF index probed at
+    ``VECTOR_INDEX_NPROBE`` lists. Each collection takes writes from a single
+    process; other processes sharing ``VECTOR_DB_PATH`` can only read it.
+    """
+
+    def __init__(
+        self,
+        embedding_function: Optional[EmbeddingFunction] = None,
+        refiner: Optional[Any] = None
+    ):
+        self.root = os.path.join(settings.VECTOR_DB_PATH, 'local')
+        self.code_collection_name = CODE_COLLECTION
+        self.lexical_index = get_lexical_index(self.code_collection_name)
+        self.symbol_index = get_symbol_index(self.code_collection_name)
+        self._embedding_function = embedding_function
+        self.query_refiner = refiner or query_refiner
+
+    async def _embed(self, texts: List[str]) -> np.ndarray:
+        """Embed a batch of texts with the configured embedding function"""
+        if self._embedding_function is None:
+            from .code_embedding import CodeEmbeddingService
+            self._embedding_function = CodeEmbeddingService().generate_batch_embeddings
+        return np.asarray(await self._embedding_function(texts), dtype=np.float32)
+
+    async def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed documents ahead of add_code_chunks, e.g. in a separate pipeline stage"""
+        return (await self._embed(texts)).tolist()
+
+    def _collection(self, name: str) -> _Collection:
+        """Get an open collection, creating it on first use"""
+        path = os.path.join(self.root, name)
+        collection = _collections.get(path)
+        if collection is None:
+            collection = _collections[path] = _Collection(path, settings.VECTOR_INDEX_DTYPE)
+        else:
+            collection.refresh()
+        return collection
+
+    def _code_shards(self) -> List[str]:
+        """Names of all collections holding code chunks"""
+        if not os.path.isdir(self.root):
+            return []
+        return [
+            name for name in os.listdir(self.root)
+            if name == self.code_collection_name
+            or name.startswith(self.code_collection_name + SHARD_SEPARATOR)
+        ]
+
+    async def initialize(self):
+        """Initialize collections"""
+        await self.create_collection(self.code_collection_name)
+
+    async def create_collection(self, name: str) -> None:
+        """Create a new collection"""
+        self._collection(name)
+
+    async def _embed_missing(
+        self,
+        texts: List[str],
+        embeddings: Optional[List[Optional[List[float]]]] = None
+    ) -> np.ndarray:
+        """Fill in embeddings for rows without a precomputed vector, in one batch"""
+        embeddings = list(embeddings or [None] * len(texts))
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            computed = await self._embed([texts[i] for i in missing])
+            for i, embedding in zip(missing, computed):
+                embeddings[i] = embedding
+        return np.asarray(embeddings, dtype=np.float32)
+
+    async def _upsert(
+        self,
+        collection_name: str,
+        ids: List[str],
+        texts: List[str],
+        metadatas: List[Dict[str, Any]],
+        vectors: np.ndarray
+    ) -> None:
+        """Write rows with their vectors to a collection"""
+        if not ids:
+            return
+
+        collection = self._collection(collection_name)
+        await asyncio.to_thread(collection.upsert, ids, vectors, texts, metadatas)
+
+    async def _query(
+        self,
+        collection_names: List[str],
+        queries: List[str],
+        n_results: int,
+        where: Optional[dict]
+    ) -> List[List[Tuple[float, str, str, Dict[str, Any]]]]:
+        """Embed the queries once, fan out across collections and merge the top-k"""
+        collections = [self._collection(name) for name in collection_names]
+        if not collections:
+            return [[] for _ in queries]
+
+        query_vectors = _normalize(await self._embed(queries))
+        per_collection = await asyncio.gather(*[
+            asyncio.to_thread(collection.query, query_vectors, n_results, where)
+            for collection in collections
+        ])
+
+        merged = []
+        for q in range(len(queries)):
+            merged.append(heapq.nlargest(
+                n_results,
+                (hit for hits in per_collection for hit in hits[q]),
+                key=lambda hit: hit[0]
+            ))
+        return merged
+
+    async def add_code_chunks(self, chunks: List[CodeChunk]) -> None:
+        """Add code chunks to their shards, reusing precomputed embeddings when present"""
+        vectors = await self._embed_missing(
+            [chunk.content for chunk in chunks],
+            [chunk.embedding for chunk in chunks]
+        )
+
+        shards: Dict[str, List[int]] = {}
+        metadatas = [code_chunk_metadata(chunk) for chunk in chunks]
+        for i, (chunk, metadata) in enumerate(zip(chunks, metadatas)):
+            shards.setdefault(code_shard_name(metadata['repository'], chunk.language), []).append(i)
+
+        await asyncio.gather(*[
+            self._upsert(
+                name,
+                [chunks[i].id for i in rows],
+                [chunks[i].content for i in rows],
+                [metadatas[i] for i in rows],
+                vectors[rows]
+            )
+            for name, rows in shards.items()
+        ])
+        self.lexical_index.upsert((chunk.id, chunk.content) for chunk in chunks)
+        self.symbol_index.upsert(chunks)
+        query_cache.bump(self.code_collection_name)
+
+    async def delete_stale_file_chunks(self, file_path: str, keep_ids: Iterable[str]) -> int:
+        """Delete the chunks stored for a file that are not in ``keep_ids``; returns how many"""
+        keep = set(keep_ids)
+        stale = [
+            id
+            for name in self._code_shards()
+            for id in self._collection(name).ids_where({'file_path': file_path})
+            if id not in keep
+        ]
+        if stale:
+            await self.delete_documents(self.code_collection_name, stale)
+        return len(stale)
+
+    async def search_code_chunks(
+        self,
+        query: str,
+        filters: Optional[Dict[str, Any]] = None,
+        limit: int = 10,
+        refine: bool = False
+    ) -> List[CodeChunk]:
+        """Search for similar code chunks"""
+        results = await self.search_many([query], filters=filters, k=limit, refine=refine)
+        return results[0]
+
+    async def search_many(
+        self,
+        queries: List[str],
+        filters: Optional[Dict[str, Any]] = None,
+        k: int = 10,
+        hybrid: bool = True,
+        refine: bool = False
+    ) -> List[List[CodeChunk]]:
+        """Search for similar code chunks for several queries in one pass"""
+        if not queries:
+            return []
+
+        keys = [query_cache.make_key(query, filters, k, hybrid, refine) for query in queries]
+        return await query_cache.get_many_or_compute(
+            self.code_collection_name,
+            keys,
+            lambda missing: self._search_many([queries[i] for i in missing], filters, k, hybrid, refine)
+        )
+
+    async def _search_many(
+        self,
+        queries: List[str],
+        filters: Optional[Dict[str, Any]],
+        k: int,
+        hybrid: bool,
+        refine: bool
+    ) -> List[List[CodeChunk]]:
+        """Uncached search_many; queries are embedded once and fanned out across shards"""
+        hits = await self._query(
+            select_code_shards(self._code_shards(), filters),
+            await refine_queries(self.query_refiner, queries) if refine else queries,
+            k,
+            build_code_where(filters)
+        )
+        vector_results = [
+            [
+                code_chunk_from_result(id, document, metadata)
+                for _, id, document, metadata in query_hits
+            ]
+            for query_hits in hits
+        ]
+        if not hybrid:
+            return vector_results
+
+        lexical_ids = [
+            [id for id, _ in self.lexical_index.search(query, k * 2 if filters else k)]
+            for query in queries
+        ]
+        known = {chunk.id for chunks in vector_results for chunk in chunks}
+        missing = list({id for ids in lexical_ids for id in ids} - known)
+        hydrated = {chunk.id: chunk for chunk in await self.get_code_chunks(missing, filters)}
+
+        return fuse_code_results(vector_results, lexical_ids, hydrated, k)
+
+    async def get_code_chunks(
+        self,
+        ids: List[str],
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[CodeChunk]:
+        """Fetch stored code chunks by id, dropping those that fail the filters"""
+        where = build_code_where(filters)
+        return [
+            code_chunk_from_result(id, document, metadata)
+            for name in select_code_shards(self._code_shards(), filters)
+            for id, document, metadata in self._collection(name).get(ids, where)
+        ]
+
+    async def batch_process_code_chunks(
+        self,
+        chunks: List[CodeChunk],
+        batch_size: int = 100
+    ) -> None:
+        """Process and store code chunks in batches"""
+        for i in range(0, len(chunks), batch_size):
+            await self.add_code_chunks(chunks[i:i + batch_size])
+
+    async def get_code_stats(self) -> Dict[str, Any]:
+        """Number of stored code chunks, in total and per shard"""
+        counts = {name: len(self._collection(name).row_of) for name in self._code_shards()}
+        return {
+            "total_chunks": sum(counts.values()),
+            "shards": counts,
+        }
+
+    async def add_documents(
+        self,
+        collection_name: str,
+        documents: List[VectorDocument],
+        embeddings: Optional[List[List[float]]] = None
+    ) -> None:
+        """Add documents to collection, reusing embeddings from embed_documents if given"""
+        texts = [doc.text for doc in documents]
+        await self._upsert(
+            collection_name,
+            [doc.id for doc in documents],
+            texts,
+            [doc.metadata or {} for doc in documents],
+            await self._embed_missing(texts, embeddings)
+        )
+        query_cache.bump(collection_name)
+
+    async def search(
+        self,
+        collection_name: str,
+        query: str,
+        n_results: int = 5,
+        where: Optional[dict] = None
+    ) -> List[VectorDocument]:
+        """Search for similar documents"""
+        results = await self.search_batch(collection_name, [query], n_results, where)
+        return results[0]
+
+    async def search_batch(
+        self,
+        collection_name: str,
+        queries: List[str],
+        n_results: int = 5,
+        where: Optional[dict] = None
+    ) -> List[List[VectorDocument]]:
+        """Search for similar documents for several queries in a single pass"""
+        if not queries:
+            return []
+
+        hits = await self._query([collection_name], queries, n_results, where)
+        return [
+            [
+                VectorDocument(id=id, text=document, metadata=metadata, score=score)
+                for score, id, document, metadata in query_hits
+            ]
+            for query_hits in hits
+        ]
+
+    async def delete_documents(
+        self,
+        collection_name: str,
+        ids: List[str]
+    ) -> None:
+        """Delete documents from collection"""
+        if collection_name == self.code_collection_name:
+            names = self._code_shards()
+            self.lexical_index.delete(ids)
+            self.symbol_index.delete(ids)
+        else:
+            names = [collection_name]
+        for name in names:
+            await asyncio.to_thread(self._collection(name).delete, ids)
+        query_cache.bump(collection_name)
+
+    async def get_document(
+        self,
+        collection_name: str,
+        id: str
+    ) -> Optional[VectorDocument]:
+        """Get a specific document by ID"""
+        hits = self._collection(collection_name).get([id])
+        if not hits:
+            return None
+        _, document, metadata = hits[0]
+        return VectorDocument(id=id, text=document, metadata=metadata)
@@ -1,18 +1,205 @@
-from typing import List, Optional, Dict, Any
+from typing import AsyncIterator, Iterable, List, Optional, Dict, Any, Tuple
+import asyncio
+import hashlib
+import heapq
+import os
+import re
+from datetime import datetime
+from functools import lru_cache
 import chromadb
 from chromadb.config import Settings
+from chromadb.utils import embedding_functions
 from pydantic import BaseModel
 
 from ..models.code import CodeChunk, CodeMetadata
 from ..config import get_settings
+from ..core.query_cache import query_cache
+from .symbol_index import get_symbol_index
+from .lexical_index import get_lexical_index, reciprocal_rank_fusion
+from .query_refiner import query_refiner
 
 settings = get_settings()
 
+CODE_COLLECTION = "code_chunks"
+SHARD_SEPARATOR = "__"
+
 class VectorDocument(BaseModel):
     """Model for vector store document"""
     id: str
     text: str
     metadata: Optional[dict] = None
+    score: Optional[float] = None  # Search similarity, higher is closer
+
+@lru_cache(maxsize=4096)
+def repository_for_path(file_path: str) -> str:
+    """Name of the git repository containing a file, or "default" outside one"""
+    directory = os.path.dirname(os.path.abspath(file_path))
+    while True:
+        if os.path.exists(os.path.join(directory, '.git')):
+            return os.path.basename(directory) or 'default'
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return 'default'
+        directory = parent
+
+def _shard_slug(value: str) -> str:
+    """Make a value safe for use inside a collection name"""
+    slug = re.sub(r'[^A-Za-z0-9-]+', '-', value).strip('-') or 'default'
+    if len(slug) > 24:
+        slug = f"{slug[:15]}-{hashlib.sha1(value.encode()).hexdigest()[:8]}"
+    return slug
+
+def code_shard_name(repository: Optional[str], language: Optional[str]) -> str:
+    """Collection a code chunk belongs to under the configured CODE_SHARDING mode"""
+    if settings.CODE_SHARDING == "none":
+        return CODE_COLLECTION
+
+    parts = [CODE_COLLECTION, _shard_slug(repository or 'default')]
+    if settings.CODE_SHARDING == "repository_language":
+        parts.append(_shard_slug(language or 'unknown'))
+    return SHARD_SEPARATOR.join(parts)
+
+def select_code_shards(shards: List[str], filters: Optional[Dict[str, Any]]) -> List[str]:
+    """Pick the code collections a query has to search, driven by its filters.
+
+    The unsharded base collection is always included so data written before
+    sharding was enabled stays searchable.
+    """
+    repository = filters.get('repository') if filters else None
+    language = filters.get('language') if filters else None
+
+    selected = []
+    for name in shards:
+        parts = name.split(SHARD_SEPARATOR)[1:]
+        if parts:
+            if repository and parts[0] != _shard_slug(repository):
+                continue
+            if language and len(parts) > 1 and parts[1] != _shard_slug(language):
+                continue
+        selected.append(name)
+    return selected
+
+def code_chunk_metadata(chunk: CodeChunk) -> Dict[str, Any]:
+    """Flatten a CodeChunk into the metadata stored alongside its vector.
+
+    The chunker leaves complexity as a metrics dict and git blame results
+    under ``metadata.git``; both are reduced to the scalar fields of
+    models.code.CodeMetadata. Missing values are left out because vector
+    store metadata cannot hold None.
+    """
+    complexity = chunk.metadata.complexity
+    if isinstance(complexity, dict):
+        complexity = complexity.get('cyclomatic')
+    git = getattr(chunk.metadata, 'git', None) or {}
+    author = chunk.metadata.author or git.get('author')
+    last_modified = chunk.metadata.last_modified or git.get('last_modified')
+
+    metadata = {
+        'repository': chunk.repository or repository_for_path(chunk.file_path),
+        'name': chunk.metadata.name or '',
+        'type': chunk.type,
+        'language': chunk.language,
+        'file_path': chunk.file_path,
+        'line_start': chunk.line_start,
+        'line_end': chunk.line_end,
+        'complexity': complexity or 1
+    }
+    if author:
+        metadata['author'] = author
+    if last_modified:
+        metadata['last_modified'] = (
+            last_modified.isoformat() if isinstance(last_modified, datetime) else str(last_modified)
+        )
+    return metadata
+
+def build_code_where(filters: Optional[Dict[str, Any]]) -> Optional[dict]:
+    """Translate code search filters into a Chroma-style where clause"""
+    if not filters:
+        return None
+
+    conditions = []
+    if 'repository' in filters:
+        conditions.append({'repository': filters['repository']})
+    if 'language' in filters:
+        conditions.append({'language': filters['language']})
+    if 'type' in filters:
+        conditions.append({'type': filters['type']})
+    if 'max_complexity' in filters:
+        conditions.append({'complexity': {'$lte': filters['max_complexity']}})
+
+    if not conditions:
+        return None
+    if len(conditions) == 1:
+        return conditions[0]
+    return {'$and': conditions}
+
+def code_chunk_from_result(id: str, document: str, metadata: dict) -> CodeChunk:
+    """Convert a stored vector entry back into a CodeChunk"""
+    return CodeChunk(
+        id=id,
+        content=document,
+        type=metadata['type'],
+        language=metadata['language'],
+        file_path=metadata['file_path'],
+        line_start=metadata['line_start'],
+        line_end=metadata['line_end'],
+        repository=metadata.get('repository'),
+        metadata=CodeMetadata(
+            name=metadata.get('name') or None,
+            complexity=metadata.get('complexity', 1),
+            author=metadata.get('author') or None,
+            last_modified=metadata.get('last_modified') or None
+        )
+    )
+
+def fuse_code_results(
+    vector_results: List[List[CodeChunk]],
+    lexical_ids: List[List[str]],
+    hydrated: Dict[str, CodeChunk],
+    k: int
+) -> List[List[CodeChunk]]:
+    """Merge per-query vector and lexical rankings with reciprocal rank fusion.
+
+    ``hydrated`` holds chunks for lexical-only hits that passed the filters;
+    lexical ids missing from it are dropped.
+    """
+    fused_results = []
+    for chunks, ids in zip(vector_results, lexical_ids):
+        by_id = {chunk.id: chunk for chunk in chunks}
+        ranking = reciprocal_rank_fusion([[chunk.id for chunk in chunks], ids])
+        fused = [by_id.get(id) or hydrated.get(id) for id in ranking]
+        fused_results.append([chunk for chunk in fused if chunk is not None][:k])
+    return fused_results
+
+async def refine_queries(refiner: Any, queries: List[str]) -> List[str]:
+    """Refine several queries concurrently, each falling back to itself on timeout"""
+    return list(await asyncio.gather(*[refiner.refine(query) for query in queries]))
+
+async def progressive_code_search(
+    store: Any,
+    query: str,
+    filters: Optional[Dict[str, Any]] = None,
+    k: int = 10
+) -> AsyncIterator[Tuple[str, List[CodeChunk]]]:
+    """Search code in stages, yielding (phase, chunks) as each stage completes.
+
+    ``lexical`` hits are exact symbol-name matches followed by BM25 hits from
+    the in-memory lexical index, and need no embedding. ``vector`` hits follow
+    once the query is embedded, and ``reranked`` fuses both rankings exactly
+    like the hybrid search_many.
+    Works with any store exposing lexical_index, symbol_index, get_code_chunks
+    and search_many.
+    """
+    symbol_ids = [symbol.chunk_id for symbol in store.symbol_index.exact(query.strip())]
+    lexical_ids = [id for id, _ in store.lexical_index.search(query, k * 2 if filters else k)]
+    lexical_ids = list(dict.fromkeys(symbol_ids + lexical_ids))
+    hydrated = {chunk.id: chunk for chunk in await store.get_code_chunks(lexical_ids, filters)}
+    yield 'lexical', [hydrated[id] for id in lexical_ids if id in hydrated][:k]
+
+    vector_results = await store.search_many([query], filters=filters, k=k, hybrid=False)
+    yield 'vector', vector_results[0]
+
+    yield 'reranked', fuse_code_results(vector_results, [lexical_ids], hydrated, k)[0]
 
 class VectorStoreService:
     """Service for managing vector embeddings using ChromaDB"""
@@ -25,7 +212,13 @@ class VectorStoreService:
                 allow_reset=True
             )
         )
-        self.code_collection_name = "code_chunks"
+        self.code_collection_name = CODE_COLLECTION
+        self.lexical_index = get_lexical_index(self.code_collection_name)
+        self.symbol_index = get_symbol_index(self.code_collection_name)
+        # Same function Chroma applies to documents, so queries can be embedded
+        # once and reused across every shard
+        self.embedding_function = embedding_functions.DefaultEmbeddingFunction()
+        self.query_refiner = query_refiner
         
     async def initialize(self):
         """Initialize collections"""
@@ -33,87 +226,179 @@ class VectorStoreService:
             self.client.create_collection(name=self.code_collection_name)
         except ValueError:  # Collection already exists
             pass
+
+    def _code_shards(self) -> List[str]:
+        """Names of all collections holding code chunks"""
+        return [
+            collection.name
+            for collection in self.client.list_collections()
+            if collection.name == self.code_collection_name
+            or collection.name.startswith(self.code_collection_name + SHARD_SEPARATOR)
+        ]
             
+    async def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed documents with the function Chroma uses, ahead of add_code_chunks"""
+        embeddings = await asyncio.to_thread(self.embedding_function, texts)
+        return [list(embedding) for embedding in embeddings]
+
     async def add_code_chunks(self, chunks: List[CodeChunk]) -> None:
-        """Add code chunks to vector store"""
-        collection = self.client.get_collection(self.code_collection_name)
-        
-        # Prepare data for insertion
-        ids = [chunk.id for chunk in chunks]
-        texts = [chunk.content for chunk in chunks]
-        metadatas = []
-        
+        """Add code chunks to vector store, routed to their repository/language shard"""
+        shards: Dict[str, List[CodeChunk]] = {}
+        metadatas: Dict[str, Dict[str, Any]] = {}
         for chunk in chunks:
-            metadata = {
-                'type': chunk.type,
-                'language': chunk.language,
-                'file_path': chunk.file_path,
-                'line_start': chunk.line_start,
-                'line_end': chunk.line_end,
-                'complexity': chunk.metadata.complexity.get('cyclomatic', 1) if chunk.metadata.complexity else 1,
-                'author': chunk.metadata.git.get('author') if chunk.metadata.git else None,
-                'last_modified': chunk.metadata.git.get('last_modified') if chunk.metadata.git else None
-            }
-            metadatas.append(metadata)
-            
-        # Add to collection
-        collection.add(
-            ids=ids,
-            documents=texts,
-            metadatas=metadatas
-        )
+            metadatas[chunk.id] = code_chunk_metadata(chunk)
+            shard = code_shard_name(metadatas[chunk.id]['repository'], chunk.language)
+            shards.setdefault(shard, []).append(chunk)
+
+        async def upsert_shard(name: str, shard_chunks: List[CodeChunk]) -> None:
+            collection = self.client.get_or_create_collection(name=name)
+            # Reuse embeddings from embed_documents; otherwise Chroma computes them
+            embeddings = [chunk.embedding for chunk in shard_chunks]
+            # Upsert so re-processing a file replaces its previous chunks
+            await asyncio.to_thread(
+                collection.upsert,
+                ids=[chunk.id for chunk in shard_chunks],
+                documents=[chunk.content for chunk in shard_chunks],
+                metadatas=[metadatas[chunk.id] for chunk in shard_chunks],
+                embeddings=embeddings if all(e is not None for e in embeddings) else None
+            )
+
+        await asyncio.gather(*[
+            upsert_shard(name, shard_chunks) for name, shard_chunks in shards.items()
+        ])
+        self.lexical_index.upsert((chunk.id, chunk.content) for chunk in chunks)
+        self.symbol_index.upsert(chunks)
+        query_cache.bump(self.code_collection_name)
         
+    async def delete_stale_file_chunks(self, file_path: str, keep_ids: Iterable[str]) -> int:
+        """Delete the chunks stored for a file that are not in ``keep_ids``; returns how many"""
+        keep = set(keep_ids)
+        results = await asyncio.gather(*[
+            asyncio.to_thread(self.client.get_collection(name).get, where={'file_path': file_path}, include=[])
+            for name in self._code_shards()
+        ])
+        stale = [id for result in results for id in result['ids'] if id not in keep]
+        if stale:
+            await self.delete_documents(self.code_collection_name, stale)
+        return len(stale)
+
     async def search_code_chunks(
         self,
         query: str,
         filters: Optional[Dict[str, Any]] = None,
-        limit: int = 10
+        limit: int = 10,
+        refine: bool = False
     ) -> List[CodeChunk]:
         """Search for similar code chunks"""
-        collection = self.client.get_collection(self.code_collection_name)
-        
-        # Prepare filter conditions
-        where = {}
-        if filters:
-            if 'language' in filters:
-                where['language'] = filters['language']
-            if 'type' in filters:
-                where['type'] = filters['type']
-            if 'max_complexity' in filters:
-                where['complexity'] = {'$lte': filters['max_complexity']}
-                
-        # Perform search
-        results = collection.query(
-            query_texts=[query],
-            n_results=limit,
-            where=where
+        results = await self.search_many([query], filters=filters, k=limit, refine=refine)
+        return results[0]
+
+    async def search_many(
+        self,
+        queries: List[str],
+        filters: Optional[Dict[str, Any]] = None,
+        k: int = 10,
+        hybrid: bool = True,
+        refine: bool = False
+    ) -> List[List[CodeChunk]]:
+        """Search for similar code chunks for several queries in one round trip.
+
+        All queries are embedded together and sent as a single multi-query
+        call per shard; results are returned in the same order as ``queries``. With
+        ``hybrid`` the vector hits are fused with BM25 hits from the lexical
+        index so exact identifier matches are not lost. With ``refine`` (off
+        by default; compare with benchmarks/query_refinement.py before turning
+        it on) the embedded text is expanded with knowledge terms by
+        ``query_refiner`` within its latency budget; BM25 always sees the raw query.
+        """
+        if not queries:
+            return []
+
+        keys = [query_cache.make_key(query, filters, k, hybrid, refine) for query in queries]
+        return await query_cache.get_many_or_compute(
+            self.code_collection_name,
+            keys,
+            lambda missing: self._search_many([queries[i] for i in missing], filters, k, hybrid, refine)
         )
-        
-        # Convert results to CodeChunks
-        chunks = []
-        for i in range(len(results['ids'][0])):
-            metadata = results['metadatas'][0][i]
-            
-            chunk = CodeChunk(
-                id=results['ids'][0][i],
-                content=results['documents'][0][i],
-                type=metadata['type'],
-                language=metadata['language'],
-                file_path=metadata['file_path'],
-                line_start=metadata['line_start'],
-                line_end=metadata['line_end'],
-                metadata=CodeMetadata(
-                    complexity={'cyclomatic': metadata.get('complexity', 1)},
-                    git={
-                        'author': metadata.get('author'),
-                        'last_modified': metadata.get('last_modified')
-                    }
-                )
+
+    async def _search_many(
+        self,
+        queries: List[str],
+        filters: Optional[Dict[str, Any]],
+        k: int,
+        hybrid: bool,
+        refine: bool
+    ) -> List[List[CodeChunk]]:
+        """Uncached search_many; queries are embedded once and fanned out across shards"""
+        shards = select_code_shards(self._code_shards(), filters)
+        where = build_code_where(filters)
+        query_embeddings = []
+        if shards:
+            texts = await refine_queries(self.query_refiner, queries) if refine else queries
+            query_embeddings = await asyncio.to_thread(self.embedding_function, texts)
+
+        shard_results = await asyncio.gather(*[
+            asyncio.to_thread(
+                self.client.get_collection(name).query,
+                query_embeddings=query_embeddings,
+                n_results=k,
+                where=where
             )
-            chunks.append(chunk)
-            
-        return chunks
-        
+            for name in shards
+        ])
+
+        # Merge per-shard hits into a single top-k by distance
+        vector_results = []
+        for q in range(len(queries)):
+            hits = heapq.nsmallest(
+                k,
+                (
+                    (result['distances'][q][i], result['ids'][q][i],
+                     result['documents'][q][i], result['metadatas'][q][i])
+                    for result in shard_results
+                    for i in range(len(result['ids'][q]))
+                ),
+                key=lambda hit: hit[0]
+            )
+            vector_results.append([
+                code_chunk_from_result(id, document, metadata)
+                for _, id, document, metadata in hits
+            ])
+        if not hybrid:
+            return vector_results
+
+        lexical_ids = [
+            [id for id, _ in self.lexical_index.search(query, k * 2 if filters else k)]
+            for query in queries
+        ]
+        known = {chunk.id for chunks in vector_results for chunk in chunks}
+        missing = list({id for ids in lexical_ids for id in ids} - known)
+        hydrated = {chunk.id: chunk for chunk in await self.get_code_chunks(missing, filters)}
+
+        return fuse_code_results(vector_results, lexical_ids, hydrated, k)
+
+    async def get_code_chunks(
+        self,
+        ids: List[str],
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[CodeChunk]:
+        """Fetch stored code chunks by id, dropping those that fail the filters"""
+        if not ids:
+            return []
+
+        where = build_code_where(filters)
+        results = await asyncio.gather(*[
+            asyncio.to_thread(self.client.get_collection(name).get, ids=ids, where=where)
+            for name in select_code_shards(self._code_shards(), filters)
+        ])
+        return [
+            code_chunk_from_result(id, document, metadata)
+            for result in results
+            for id, document, metadata in zip(
+                result['ids'], result['documents'], result['metadatas']
+            )
+        ]
+
     async def batch_process_code_chunks(
         self,
         chunks: List[CodeChunk],
@@ -123,6 +408,17 @@ class VectorStoreService:
         for i in range(0, len(chunks), batch_size):
             batch = chunks[i:i + batch_size]
             await self.add_code_chunks(batch)
+
+    async def get_code_stats(self) -> Dict[str, Any]:
+        """Number of stored code chunks, in total and per shard"""
+        shards = self._code_shards()
+        counts = await asyncio.gather(*[
+            asyncio.to_thread(self.client.get_collection(name).count) for name in shards
+        ])
+        return {
+            "total_chunks": sum(counts),
+            "shards": dict(zip(shards, counts)),
+        }
         
     async def create_collection(self, name: str) -> None:
         """Create a new collection"""
@@ -134,9 +430,10 @@ class VectorStoreService:
     async def add_documents(
         self,
         collection_name: str,
-        documents: List[VectorDocument]
+        documents: List[VectorDocument],
+        embeddings: Optional[List[List[float]]] = None
     ) -> None:
-        """Add documents to collection"""
+        """Add documents to collection, reusing embeddings from embed_documents if given"""
         collection = self.client.get_collection(collection_name)
         
         # Prepare data for insertion
@@ -145,11 +442,14 @@ class VectorStoreService:
         metadatas = [doc.metadata or {} for doc in documents]
         
         # Add to collection
-        collection.add(
+        await asyncio.to_thread(
+            collection.add,
             ids=ids,
             documents=texts,
-            metadatas=metadatas
+            metadatas=metadatas,
+            embeddings=embeddings
         )
+        query_cache.bump(collection_name)
         
     async def search(
         self,
@@ -159,25 +459,46 @@ class VectorStoreService:
         where: Optional[dict] = None
     ) -> List[VectorDocument]:
         """Search for similar documents"""
+        results = await self.search_batch(collection_name, [query], n_results, where)
+        return results[0]
+
+    async def search_batch(
+        self,
+        collection_name: str,
+        queries: List[str],
+        n_results: int = 5,
+        where: Optional[dict] = None
+    ) -> List[List[VectorDocument]]:
+        """Search for similar documents for several queries in a single call"""
+        if not queries:
+            return []
+
         collection = self.client.get_collection(collection_name)
         
-        results = collection.query(
-            query_texts=[query],
+        # Chroma's client is synchronous; keep the event loop free while it embeds and searches
+        results = await asyncio.to_thread(
+            collection.query,
+            query_texts=queries,
             n_results=n_results,
-            where=where
+            where=where or None
         )
         
-        # Convert results to VectorDocuments
-        documents = []
-        for i in range(len(results['ids'][0])):
-            doc = VectorDocument(
-                id=results['ids'][0][i],
-                text=results['documents'][0][i],
-                metadata=results['metadatas'][0][i] if results['metadatas'] else None
-            )
-            documents.append(doc)
+        # Convert results to VectorDocuments, one list per query
+        batches = []
+        for q in range(len(queries)):
+            documents = []
+            for i in range(len(results['ids'][q])):
+                doc = VectorDocument(
+                    id=results['ids'][q][i],
+                    text=results['documents'][q][i],
+                    metadata=results['metadatas'][q][i] if results['metadatas'] else None,
+                    # Map the distance onto (0, 1] so larger means more similar
+                    score=1.0 / (1.0 + results['distances'][q][i]) if results.get('distances') else None
+                )
+                documents.append(doc)
+            batches.append(documents)
             
-        return documents
+        return batches
         
     async def delete_documents(
         self,
@@ -185,8 +506,14 @@ class VectorStoreService:
         ids: List[str]
     ) -> None:
         """Delete documents from collection"""
-        collection = self.client.get_collection(collection_name)
-        collection.delete(ids=ids)
+        if collection_name == self.code_collection_name:
+            for name in self._code_shards():
+                self.client.get_collection(name).delete(ids=ids)
+            self.lexical_index.delete(ids)
+            self.symbol_index.delete(ids)
+        else:
+            self.client.get_collection(collection_name).delete(ids=ids)
+        query_cache.bump(collection_name)
         
     async def get_document(
         self,
@@ -0,0 +1,95 @@
+"""
+Measure code search latency with and without knowledge-based query refinement.
+
+Runs every query through the configured vector store three times: raw, refined
+with a cold refinement cache, and refined again with a warm cache. Prints
+p50/p95/mean latency for each pass.
+
+Usage (from the server directory):
+    python -m benchmarks.query_refinement --queries queries.txt --repeat 3
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Awaitable, Callable, Dict, List
+
+from app.core.query_cache import query_cache
+from app.dependencies import get_vector_store
+from app.services.query_refiner import QueryRefiner
+
+DEFAULT_QUERIES = [
+    "parse python functions into chunks",
+    "cache search results with invalidation",
+    "stream progress updates to the client",
+    "embed documents in batches",
+    "resume interrupted background jobs",
+    "tokenize camelCase identifiers",
+    "reciprocal rank fusion of rankings",
+    "discover files respecting gitignore",
+]
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+async def measure(queries: List[str], repeat: int, search: Callable[[str], Awaitable[None]]) -> List[float]:
+    samples = []
+    for _ in range(repeat):
+        for query in queries:
+            start_time = time.perf_counter()
+            await search(query)
+            samples.append((time.perf_counter() - start_time) * 1000)
+    return samples
+
+
+def report(name: str, samples: List[float]) -> None:
+    print(
+        f"{name:<16} n={len(samples):<5} p50={percentile(samples, 0.5):8.2f}ms "
+        f"p95={percentile(samples, 0.95):8.2f}ms mean={statistics.mean(samples):8.2f}ms"
+    )
+
+
+async def main(args: argparse.Namespace) -> None:
+    queries = DEFAULT_QUERIES
+    if args.queries:
+        with open(args.queries, 'r', encoding='utf-8') as f:
+            queries = [line.strip() for line in f if line.strip()]
+
+    vector_store = get_vector_store()
+    await vector_store.initialize()
+    refiner = vector_store.query_refiner = QueryRefiner(
+        vector_store,
+        timeout_seconds=args.budget,
+        max_tokens=args.max_tokens
+    )
+
+    async def raw(query: str) -> None:
+        # Code search results are cached too; invalidate them so every search runs
+        query_cache.bump(vector_store.code_collection_name)
+        await vector_store.search_code_chunks(query, limit=args.limit, refine=False)
+
+    async def refined(query: str) -> None:
+        query_cache.bump(vector_store.code_collection_name)
+        await vector_store.search_code_chunks(query, limit=args.limit, refine=True)
+
+    results: Dict[str, List[float]] = {}
+    results['raw'] = await measure(queries, args.repeat, raw)
+    query_cache.bump(refiner.collection_name)
+    results['refined (cold)'] = await measure(queries, 1, refined)
+    results['refined (warm)'] = await measure(queries, args.repeat, refined)
+
+    for name, samples in results.items():
+        report(name, samples)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--queries', help="File with one query per line")
+    parser.add_argument('--repeat', type=int, default=3, help="Passes over the queries per measurement")
+    parser.add_argument('--limit', type=int, default=10, help="Results per search")
+    parser.add_argument('--budget', type=float, default=None, help="Refinement budget in seconds")
+    parser.add_argument('--max-tokens', type=int, default=None, help="Maximum expansion terms")
+    asyncio.run(main(parser.parse_args()))
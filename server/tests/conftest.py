@@ -0,0 +1,5 @@
+import os
+import tempfile
+
+# Keep stores created at import time (e.g. the Chroma client) out of the checked-in vector_db
+os.environ.setdefault("VECTOR_DB_PATH", tempfile.mkdtemp(prefix="a-ui-tests-"))
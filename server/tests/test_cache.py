@@ -0,0 +1,95 @@
+import asyncio
+import pickle
+from typing import List
+
+import fakeredis
+
+from app.core.cache import CacheManager
+from app.services.code_chunker import CodeChunk, CodeMetadata
+
+
+class _Exploit:
+    ran = False
+
+    def __reduce__(self):
+        return (setattr, (_Exploit, "ran", True))
+
+
+def _manager(server, **kwargs):
+    return CacheManager(
+        max_bytes=1 << 20,
+        default_ttl=60,
+        redis_client=fakeredis.FakeAsyncRedis(server=server),
+        **kwargs,
+    )
+
+
+def test_memory_tier_keeps_plain_objects():
+    cache = CacheManager(max_bytes=1 << 20, default_ttl=60)
+    value = {"nested": [object()]}
+
+    async def run():
+        await cache.set("key", value)
+        return await cache.get("key")
+
+    assert asyncio.run(run()) is value
+
+
+def test_redis_round_trip_restores_registered_types(tmp_path):
+    source = tmp_path / "module.py"
+    source.write_text("def f():\n    return 1\n")
+    server = fakeredis.FakeServer()
+    chunks = [
+        CodeChunk(
+            id=f"{source}:f",
+            content="def f():\n    return 1",
+            type="function",
+            file_path=str(source),
+            line_start=1,
+            line_end=2,
+            language="python",
+            metadata=CodeMetadata(name="f", complexity={"cyclomatic": 1, "lines": 2}),
+        )
+    ]
+
+    async def run():
+        writer = _manager(server, namespace_types={"file_chunks": List[CodeChunk]})
+        await writer.set(str(source), chunks, namespace="file_chunks", path=str(source))
+        reader = _manager(server, namespace_types={"file_chunks": List[CodeChunk]})
+        hit = await reader.get(str(source), namespace="file_chunks", path=str(source))
+        stats = reader.stats()["namespaces"]["file_chunks"]
+        source.write_text("def f():\n    return 2  # changed\n")
+        stale = await _manager(server).get(str(source), namespace="file_chunks", path=str(source))
+        return hit, stats, stale
+
+    hit, stats, stale = asyncio.run(run())
+    assert hit == chunks
+    assert isinstance(hit[0], CodeChunk)
+    assert stats["hits"] == 1
+    assert stale is None
+
+
+def test_redis_pickles_are_never_loaded():
+    server = fakeredis.FakeServer()
+
+    async def run():
+        cache = _manager(server)
+        await cache.redis.set(cache._key("default", "key"), pickle.dumps((None, _Exploit())))
+        return await cache.get("key")
+
+    assert asyncio.run(run()) is None
+    assert not _Exploit.ran
+
+
+def test_unencodable_values_stay_in_memory():
+    server = fakeredis.FakeServer()
+
+    async def run():
+        cache = _manager(server)
+        value = object()
+        await cache.set("key", value)
+        return await cache.get("key") is value, await cache.redis.exists(cache._key("default", "key"))
+
+    in_memory, in_redis = asyncio.run(run())
+    assert in_memory
+    assert not in_redis
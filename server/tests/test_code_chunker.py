@@ -0,0 +1,43 @@
+import asyncio
+
+from app.services.code_chunker import CodeChunkerService
+
+SOURCE = '''import os
+
+
+class Store:
+    """Keeps things."""
+
+    def get(self, key):
+        return key
+
+
+@decorator
+def helper():
+    return Store()
+
+
+def helper():
+    return None
+'''
+
+
+def _chunk(path):
+    return asyncio.run(CodeChunkerService().process_file(str(path)))
+
+
+def test_python_chunk_ids_are_stable(tmp_path):
+    path = tmp_path / "store.py"
+    path.write_text(SOURCE)
+    first = _chunk(path)
+
+    assert [chunk.id for chunk in first] == [f"{path}:Store", f"{path}:helper", f"{path}:helper#1"]
+    assert [chunk.type for chunk in first] == ["class", "function", "function"]
+    assert first[0].metadata.documentation == "Keeps things."
+    assert first[1].content.startswith("@decorator\ndef helper():")
+
+    # Shifting every definition down keeps the ids, so re-processing replaces the chunks
+    path.write_text("# header\n\n" + SOURCE)
+    second = _chunk(path)
+    assert [chunk.id for chunk in second] == [chunk.id for chunk in first]
+    assert second[0].line_start == first[0].line_start + 2
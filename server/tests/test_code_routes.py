@@ -0,0 +1,23 @@
+import pytest
+
+pytest.importorskip("dspy")
+
+from app.routes import code
+
+
+def test_code_routes_are_registered():
+    routes = {(method, route.path) for route in code.router.routes for method in route.methods}
+
+    assert {
+        ("POST", "/code/process"),
+        ("POST", "/code/process/{task_id}/cancel"),
+        ("GET", "/code/metadata/{file_path:path}"),
+        ("POST", "/code/search"),
+        ("POST", "/code/search/stream"),
+        ("POST", "/code/search/structural"),
+        ("POST", "/code/search/batch"),
+        ("GET", "/code/symbols/complete"),
+        ("POST", "/code/batch-process"),
+        ("GET", "/code/stats"),
+        ("POST", "/code/analyze_code"),
+    } <= routes
@@ -0,0 +1,53 @@
+import asyncio
+
+from app.models.code import CodeChunk
+from app.services.ingest_pipeline import IngestPipeline
+
+
+class _Chunker:
+    async def process_file(self, path):
+        if path.endswith("broken.py"):
+            raise SyntaxError("unexpected EOF")
+        chunk = CodeChunk(
+            id=f"{path}:f",
+            content="def f(): pass",
+            type="function",
+            file_path=path,
+            line_start=1,
+            line_end=1,
+            language="python",
+        )
+        # The same definition reported twice is only stored once
+        return [chunk, chunk.model_copy()]
+
+
+class _VectorStore:
+    def __init__(self):
+        self.stored = []
+
+    async def embed_documents(self, texts):
+        return [[1.0, 0.0] for _ in texts]
+
+    async def add_code_chunks(self, chunks):
+        self.stored.extend(chunks)
+
+    async def delete_stale_file_chunks(self, file_path, keep_ids):
+        return 0
+
+
+def test_pipeline_reports_failed_files(tmp_path):
+    good = tmp_path / "good.py"
+    good.write_text("def f(): pass\n")
+    broken = tmp_path / "broken.py"
+    broken.write_text("def f(:\n")
+    vector_store = _VectorStore()
+
+    stats = asyncio.run(
+        IngestPipeline(vector_store, chunker=_Chunker()).run([str(good), str(broken)])
+    )
+
+    assert [chunk.id for chunk in vector_store.stored] == [f"{good}:f"]
+    assert stats["chunks"] == 1
+    assert stats["duplicates"] == 1
+    assert list(stats["failed"]) == [str(broken)]
+    assert stats["failed"][str(broken)].startswith("parse:")
@@ -0,0 +1,35 @@
+from app.services.knowledge_graph import KnowledgeGraphCache
+
+
+def _graph():
+    graph = KnowledgeGraphCache()
+    graph._reset(
+        [(1, 2, "references", 0.9), (2, 3, "extends", 0.8), (3, 1, "references", 0.5)],
+        [("svc", "service", 2, "documents"), ("svc", "service", 3, "documents")],
+    )
+    graph.loaded = True
+    return graph
+
+
+def test_compaction_drops_removed_items():
+    graph = _graph()
+    graph.remove_item(2)
+    assert graph.edges(1) == []
+
+    graph._compact()
+
+    assert graph._removed == set()
+    assert 2 not in graph._out.node_ids.tolist()
+    assert graph.edges(3) == [(1, "references", 0.5)]
+    assert graph.entity_links("svc", "service") == [(3, "documents")]
+
+
+def test_reused_item_id_does_not_inherit_old_edges():
+    graph = _graph()
+    graph.remove_item(2)
+
+    graph.add_relation(2, 1, "implements", 1.0)
+
+    assert graph.edges(2) == [(1, "implements", 1.0)]
+    assert graph.edges(1) == []
+    assert graph.edges(1, incoming=True) == [(2, "implements", 1.0), (3, "references", 0.5)]
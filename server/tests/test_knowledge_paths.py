@@ -0,0 +1,78 @@
+import asyncio
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.models.knowledge import entity_knowledge, knowledge_relation
+from app.services.knowledge import KnowledgeService
+from app.services.knowledge_graph import KnowledgeGraphCache
+
+RELATIONS = [
+    (1, 2, "references", 0.9),
+    (2, 3, "extends", 0.8),
+    (1, 4, "references", 0.4),
+    (4, 3, "references", 0.9),
+    (3, 5, "references", 0.7),
+    (6, 5, "references", 0.5),
+]
+
+
+async def _with_service(scenario):
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as connection:
+        await connection.run_sync(
+            lambda sync: knowledge_relation.metadata.create_all(sync, tables=[knowledge_relation, entity_knowledge])
+        )
+        await connection.execute(insert(knowledge_relation), [
+            {"source_id": source, "target_id": target, "relation_type": type, "confidence": confidence}
+            for source, target, type, confidence in RELATIONS
+        ])
+        await connection.execute(insert(entity_knowledge), [
+            {"entity_id": "svc", "entity_type": "service", "knowledge_id": 3, "relation_type": "documents"}
+        ])
+    try:
+        async with AsyncSession(engine) as db:
+            return await scenario(KnowledgeService(db, vector_store=None))
+    finally:
+        await engine.dispose()
+
+
+def test_uncached_paths_match_the_graph_cache():
+    graph = KnowledgeGraphCache()
+    graph._reset(RELATIONS, [("svc", "service", 3, "documents")])
+    cases = [
+        (1, 5, None, True),
+        (1, 6, None, True),
+        (1, 6, None, False),
+        (1, 3, ["references"], True),
+        (5, 1, None, True),
+        (2, 2, None, True),
+    ]
+
+    async def scenario(service):
+        return [await service.get_knowledge_path(*case) for case in cases]
+
+    paths = asyncio.run(_with_service(scenario))
+    for path, (source, target, types, directed) in zip(paths, cases):
+        expected = graph.shortest_path(source, target, types, directed=directed, max_depth=12)
+        if expected is None:
+            assert path is None
+            continue
+        # Ties may be broken differently, but the path must be as short and follow relations
+        assert len(path) == len(expected) and path[0] == source and path[-1] == target
+        edges = {
+            pair
+            for relation_source, relation_target, type, _ in RELATIONS
+            if not types or type in types
+            for pair in ([(relation_source, relation_target)] if directed else
+                         [(relation_source, relation_target), (relation_target, relation_source)])
+        }
+        assert all(step in edges for step in zip(path, path[1:]))
+    assert paths[4] is None
+
+
+def test_uncached_degree_counts_rows():
+    async def scenario(service):
+        return await service.get_knowledge_degree(3)
+
+    assert asyncio.run(_with_service(scenario)) == {"out": 1, "in": 2, "entities": 1}
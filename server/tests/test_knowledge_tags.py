@@ -0,0 +1,50 @@
+import asyncio
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.models.knowledge import (
+    TAG_MAX_LENGTH,
+    KnowledgeSearchRequest,
+    knowledge_tag,
+    knowledge_tag_count,
+    normalize_tags,
+)
+from app.services.knowledge import KnowledgeService
+
+LONG_TAG = "section:" + "Very long heading " * 20
+
+
+def test_normalize_tags_truncates_and_dedupes():
+    assert normalize_tags([LONG_TAG, LONG_TAG + " (continued)", "api", 7, "api"]) == [
+        LONG_TAG[:TAG_MAX_LENGTH], "api", "7"
+    ]
+    assert normalize_tags(None) == []
+
+
+def test_requests_filter_on_stored_tags():
+    request = KnowledgeSearchRequest(query="heading", tags=[LONG_TAG])
+    assert request.tags == [LONG_TAG[:TAG_MAX_LENGTH]]
+    assert KnowledgeSearchRequest(query="heading").tags is None
+
+
+def test_replace_tags_stores_truncated_tags():
+    async def scenario():
+        engine = create_async_engine("sqlite+aiosqlite://")
+        async with engine.begin() as connection:
+            await connection.run_sync(
+                lambda sync: knowledge_tag.metadata.create_all(sync, tables=[knowledge_tag, knowledge_tag_count])
+            )
+        try:
+            async with AsyncSession(engine) as db:
+                service = KnowledgeService(db, vector_store=None)
+                await service._replace_tags({1: [LONG_TAG, LONG_TAG + " (continued)", "api"]}, new_items=True)
+                tags = (await db.execute(select(knowledge_tag.c.tag).order_by(knowledge_tag.c.tag))).scalars().all()
+                counts = dict((await db.execute(select(knowledge_tag_count))).all())
+                return tags, counts
+        finally:
+            await engine.dispose()
+
+    tags, counts = asyncio.run(scenario())
+    assert tags == ["api", LONG_TAG[:TAG_MAX_LENGTH]]
+    assert counts == {"api": 1, LONG_TAG[:TAG_MAX_LENGTH]: 1}
@@ -0,0 +1,30 @@
+import json
+import os
+
+from app.services.code_tokenizer import tokenize_identifiers
+from app.services.lexical_index import LexicalIndex
+
+
+def test_writes_are_saved_together_in_the_background(tmp_path):
+    path = str(tmp_path / "lexical" / "code.json")
+    index = LexicalIndex(path)
+    index.persistence.delay = 60
+
+    index.upsert([("a", "def get_knowledge_item(): pass")])
+    index.upsert([("b", "class KnowledgeStore: pass")])
+    index.delete(["a"])
+    assert not os.path.exists(path)
+
+    index.persistence.flush()
+    with open(path, encoding="utf-8") as f:
+        assert list(json.load(f)) == ["b"]
+
+    reloaded = LexicalIndex(path)
+    assert [doc_id for doc_id, _ in reloaded.search("knowledge")] == ["b"]
+
+
+def test_tokenizing_non_python_is_quiet(capsys):
+    terms = tokenize_identifiers("function fetchUser(id) {\n  return id;\n")
+
+    assert "fetchuser" in terms and "user" in terms
+    assert capsys.readouterr().out == ""
@@ -0,0 +1,65 @@
+import asyncio
+
+from app.services.structural_search import Requirement, StructuralIndex, query_requirements
+
+
+def test_requirements_collect_mandatory_node_types():
+    assert query_requirements("(function_definition name: (identifier) @name body: (block))") == [
+        Requirement(frozenset({"function_definition", "identifier", "block"}), frozenset())
+    ]
+
+
+def test_alternations_and_optional_children_are_not_required():
+    assert query_requirements("(call function: [(identifier) (attribute)]) @call") == [
+        Requirement(frozenset({"call"}), frozenset())
+    ]
+    assert query_requirements("(class_definition (comment)? body: (block (decorated_definition)*))") == [
+        Requirement(frozenset({"class_definition", "block"}), frozenset())
+    ]
+
+
+def test_eq_predicates_require_identifiers():
+    pattern = '(call function: (attribute) @callee (#eq? @callee "session.commit"))'
+    assert query_requirements(pattern) == [
+        Requirement(frozenset({"call", "attribute"}), frozenset({"session", "commit"}))
+    ]
+    # Top-level predicates constrain the pattern before them
+    pattern = '((identifier) @name (#eq? @name "fetch")) (string) @s (#eq? @s "fetch")'
+    assert query_requirements(pattern) == [
+        Requirement(frozenset({"identifier"}), frozenset({"fetch"})),
+        Requirement(frozenset({"string"}), frozenset()),
+    ]
+
+
+def test_unindexed_top_level_patterns_disable_pruning():
+    assert query_requirements('(class_definition) @c "return" @r') == []
+    assert query_requirements("(class_definition) @c _ @any") == []
+    assert query_requirements("(function_definition) @f (class_definition) @c") == [
+        Requirement(frozenset({"function_definition"}), frozenset()),
+        Requirement(frozenset({"class_definition"}), frozenset()),
+    ]
+
+
+def test_search_only_prunes_files_that_cannot_match(tmp_path):
+    root = tmp_path / "src"
+    root.mkdir()
+    (root / "a.py").write_text("def f():\n    return 1\n")
+    (root / "b.py").write_text("class A:\n    pass\n")
+    index = StructuralIndex(str(tmp_path / "structural.json"), workers=1)
+
+    async def run():
+        classes = await index.search("(class_definition) @c", root=str(root))
+        mixed = await index.search('(class_definition) @c "return" @r', root=str(root))
+        return classes, mixed
+
+    try:
+        classes, mixed = asyncio.run(run())
+    finally:
+        index.executor.shutdown()
+
+    assert classes["files_searched"] == 1
+    assert mixed["files_searched"] == 2
+    assert {(match["file_path"], match["capture"]) for match in mixed["results"]} == {
+        (str(root / "a.py"), "r"),
+        (str(root / "b.py"), "c"),
+    }
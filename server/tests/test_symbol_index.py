@@ -0,0 +1,36 @@
+import json
+import os
+
+from app.models.code import CodeChunk, CodeMetadata
+from app.services.symbol_index import SymbolIndex
+
+
+def _chunk(id, name):
+    return CodeChunk(
+        id=id,
+        content=f"def {name}(): pass",
+        type="function",
+        file_path="app/services/knowledge.py",
+        line_start=1,
+        line_end=1,
+        language="python",
+        metadata=CodeMetadata(name=name),
+    )
+
+
+def test_writes_are_saved_together_in_the_background(tmp_path):
+    path = str(tmp_path / "symbols" / "code.json")
+    index = SymbolIndex(path)
+    index.persistence.delay = 60
+
+    index.upsert([_chunk("a", "get_knowledge_item")])
+    index.upsert([_chunk("b", "list_knowledge_items")])
+    index.delete(["a"])
+    assert not os.path.exists(path)
+
+    index.persistence.flush()
+    with open(path, encoding="utf-8") as f:
+        assert [row[0] for row in json.load(f)] == ["b"]
+
+    reloaded = SymbolIndex(path)
+    assert [symbol.chunk_id for symbol in reloaded.exact("list_knowledge_items")] == ["b"]
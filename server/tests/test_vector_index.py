@@ -0,0 +1,231 @@
+import asyncio
+import inspect
+import threading
+
+import numpy as np
+import pytest
+
+from app.services import vector_index
+from app.services.vector_index import VectorIndex, _Collection
+from app.services.vector_store import VectorStoreService
+
+
+def _public_methods(cls):
+    return {
+        name for name, member in inspect.getmembers(cls, inspect.isfunction)
+        if not name.startswith('_')
+    }
+
+
+def _rows(n, dim=8, seed=0):
+    vectors = np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+    ids = [f"doc-{i}" for i in range(n)]
+    return ids, vectors, [f"text {i}" for i in range(n)], [{"n": i} for i in range(n)]
+
+
+def _ids(hits):
+    return [hit[1] for hit in hits]
+
+
+def test_backends_expose_the_same_methods():
+    assert _public_methods(VectorIndex) == _public_methods(VectorStoreService)
+
+
+def test_writes_are_logged_and_replayed_by_readers(tmp_path):
+    writer = _Collection(str(tmp_path), "float32")
+    ids, vectors, documents, metadatas = _rows(20)
+    writer.upsert(ids[:10], vectors[:10], documents[:10], metadatas[:10])
+    checkpoint = vector_index._file_signature(writer.meta_path)
+
+    writer.upsert(ids[10:], vectors[10:], documents[10:], metadatas[10:])
+    writer.delete(["doc-3"])
+    # Small writes append to the log instead of rewriting meta.json
+    assert vector_index._file_signature(writer.meta_path) == checkpoint
+
+    reader = _Collection(str(tmp_path), "float32")
+    assert reader.ids == writer.ids
+    assert "doc-3" not in reader.row_of
+    assert reader.get(["doc-15"]) == [("doc-15", "text 15", {"n": 15})]
+
+    writer.upsert(["doc-15"], vectors[:1], ["changed"], [{"n": -1}])
+    reader.refresh()
+    assert reader.get(["doc-15"]) == [("doc-15", "changed", {"n": -1})]
+
+
+def test_ivf_assignments_are_logged_between_rebuilds(tmp_path, monkeypatch):
+    monkeypatch.setattr(vector_index.settings, "VECTOR_INDEX_IVF_THRESHOLD", 100)
+    writer = _Collection(str(tmp_path), "float32")
+    ids, vectors, documents, metadatas = _rows(180)
+    writer.upsert(ids[:120], vectors[:120], documents[:120], metadatas[:120])
+    built = vector_index._file_signature(writer.ivf_path)
+    assert built is not None
+
+    for start in range(120, 180, 20):
+        writer.upsert(ids[start:start + 20], vectors[start:start + 20], documents[start:start + 20], metadatas[start:start + 20])
+    writer.upsert(["doc-5"], vectors[170:171], ["moved"], [{"n": 5}])
+    # Writes below the rebuild size only append their assignments to the log
+    assert vector_index._file_signature(writer.ivf_path) == built
+
+    reader = _Collection(str(tmp_path), "float32")
+    assert np.array_equal(reader._ivf["assignments"], writer._ivf["assignments"])
+    assert len(reader._ivf["assignments"]) == 180
+    query = vector_index._normalize(vectors[150:151])
+    assert _ids(reader.query(query, 1)[0]) == ["doc-150"]
+
+    writer._checkpoint()
+    reopened = _Collection(str(tmp_path), "float32")
+    assert np.array_equal(reopened._ivf["assignments"], writer._ivf["assignments"])
+
+
+def test_second_writer_is_refused(tmp_path):
+    ids, vectors, documents, metadatas = _rows(2)
+    writer = _Collection(str(tmp_path), "float32")
+    writer.upsert(ids, vectors, documents, metadatas)
+
+    other = _Collection(str(tmp_path), "float32")
+    with pytest.raises(RuntimeError):
+        other.upsert(ids, vectors, documents, metadatas)
+
+
+def test_deletes_are_compacted(tmp_path):
+    collection = _Collection(str(tmp_path), "float32")
+    ids, vectors, documents, metadatas = _rows(40)
+    collection.upsert(ids, vectors, documents, metadatas)
+
+    collection.delete(ids[:20])
+
+    assert collection.ids == ids[20:]
+    assert not collection.deleted.any()
+    assert collection.vectors_file != "vectors.bin"
+    assert not (tmp_path / "vectors.bin").exists()
+    query = vector_index._normalize(vectors[25:26])
+    assert _ids(collection.query(query, 1)[0]) == ["doc-25"]
+    assert collection.get(["doc-5", "doc-30"]) == [("doc-30", "text 30", {"n": 30})]
+
+    reopened = _Collection(str(tmp_path), "float32")
+    assert _ids(reopened.query(query, 1)[0]) == ["doc-25"]
+
+
+def test_queries_run_against_concurrent_writes(tmp_path):
+    collection = _Collection(str(tmp_path), "float32")
+    ids, vectors, documents, metadatas = _rows(2000)
+    collection.upsert(ids[:100], vectors[:100], documents[:100], metadatas[:100])
+    query = vector_index._normalize(vectors[:4])
+    errors = []
+
+    def write():
+        for start in range(100, 2000, 50):
+            collection.upsert(
+                ids[start:start + 50], vectors[start:start + 50],
+                documents[start:start + 50], metadatas[start:start + 50]
+            )
+            collection.delete(ids[start:start + 5])
+
+    def read():
+        try:
+            for _ in range(200):
+                for hits in collection.query(query, 5, where={"n": {"$gte": 0}}):
+                    assert all(metadata["n"] == int(id.split("-")[1]) for _, id, _, metadata in hits)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write)] + [threading.Thread(target=read) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert _ids(collection.query(query[:1], 1)[0]) == ["doc-0"]
+
+
+def test_vector_index_round_trips_documents(tmp_path, monkeypatch):
+    monkeypatch.setattr(vector_index.settings, "VECTOR_DB_PATH", str(tmp_path))
+
+    async def embed(texts):
+        return [[float(len(text)), 1.0, float(text.count("a"))] for text in texts]
+
+    async def scenario():
+        from app.services.vector_store import VectorDocument
+        index = VectorIndex(embedding_function=embed)
+        await index.add_documents("knowledge", [
+            VectorDocument(id="a", text="aaaa", metadata={"type": "fact"}),
+            VectorDocument(id="b", text="b", metadata={"type": "rule"}),
+        ])
+        hits = await index.search("knowledge", "aaaa", n_results=1, where={"type": "fact"})
+        document = await index.get_document("knowledge", "b")
+        return hits, document
+
+    hits, document = asyncio.run(scenario())
+    assert [hit.id for hit in hits] == ["a"]
+    assert document.text == "b" and document.metadata == {"type": "rule"}
+
+
+def test_code_search_embeds_the_refined_query(tmp_path, monkeypatch):
+    from app.core.query_cache import query_cache
+    from app.models.code import CodeChunk, CodeMetadata
+
+    monkeypatch.setattr(vector_index.settings, "VECTOR_DB_PATH", str(tmp_path))
+    embedded = []
+
+    async def embed(texts):
+        embedded.extend(texts)
+        return [[1.0, float("cache" in text), float("graph" in text)] for text in texts]
+
+    class Refiner:
+        async def refine(self, query):
+            return f"{query} cache"
+
+    async def scenario():
+        index = VectorIndex(embedding_function=embed, refiner=Refiner())
+        await index.add_code_chunks([
+            CodeChunk(
+                id="cache.py:LruCache", content="class LruCache: ...", type="class",
+                file_path="cache.py", line_start=1, line_end=1, language="python",
+                repository="a-ui", metadata=CodeMetadata(name="LruCache", complexity=2)
+            ),
+            CodeChunk(
+                id="graph.py:Graph", content="class Graph: ...", type="class",
+                file_path="graph.py", line_start=1, line_end=1, language="python",
+                repository="a-ui", metadata=CodeMetadata(name="Graph")
+            ),
+        ])
+        embedded.clear()
+        query_cache.bump(index.code_collection_name)
+        refined = await index.search_code_chunks("store", limit=1, refine=True)
+        raw = await index.search_code_chunks("store", limit=1, refine=False)
+        return refined, raw
+
+    refined, raw = asyncio.run(scenario())
+    assert embedded == ["store cache", "store"]
+    assert [chunk.id for chunk in refined] == ["cache.py:LruCache"]
+    assert refined[0].metadata.complexity == 2
+    assert len(raw) == 1
+
+
+def test_reingesting_a_file_drops_chunks_of_renamed_functions(tmp_path, monkeypatch):
+    from app.services.ingest_pipeline import IngestPipeline
+
+    monkeypatch.setattr(vector_index.settings, "VECTOR_DB_PATH", str(tmp_path / "db"))
+    source = tmp_path / "helpers.py"
+
+    async def embed(texts):
+        return [[float(len(text)), 1.0, float(text.count("d"))] for text in texts]
+
+    async def ingest(index, code):
+        source.write_text(code)
+        await IngestPipeline(index).run([str(source)])
+
+    async def scenario():
+        index = VectorIndex(embedding_function=embed)
+        await ingest(index, "def load_config():\n    return {}\n\n\ndef keep():\n    return 1\n")
+        before = await index.get_code_chunks([f"{source}:load_config", f"{source}:keep"])
+        await ingest(index, "def read_config():\n    return {}\n\n\ndef keep():\n    return 1\n")
+        after = await index.get_code_chunks([f"{source}:load_config", f"{source}:read_config", f"{source}:keep"])
+        return index, before, after
+
+    index, before, after = asyncio.run(scenario())
+    assert {chunk.id for chunk in before} == {f"{source}:load_config", f"{source}:keep"}
+    assert {chunk.id for chunk in after} == {f"{source}:read_config", f"{source}:keep"}
+    assert f"{source}:load_config" not in index.lexical_index.doc_terms
+    assert not index.symbol_index.exact("load_config")
@@ -0,0 +1,57 @@
+from datetime import datetime
+
+from app.models.code import CodeChunk, CodeMetadata
+from app.services import code_chunker
+from app.services.vector_store import code_chunk_from_result, code_chunk_metadata
+
+
+def test_stored_chunk_round_trips():
+    chunk = CodeChunk(
+        id="app/main.py:function:startup",
+        content="async def startup():\n    pass\n",
+        type="function",
+        file_path="app/main.py",
+        line_start=10,
+        line_end=11,
+        language="python",
+        repository="a-ui",
+        metadata=CodeMetadata(
+            name="startup",
+            complexity=3,
+            author="dev",
+            last_modified=datetime(2024, 5, 1, 12, 30)
+        )
+    )
+
+    restored = code_chunk_from_result(chunk.id, chunk.content, code_chunk_metadata(chunk))
+
+    assert restored.model_dump(exclude={"metadata"}) == chunk.model_dump(exclude={"metadata"})
+    assert restored.metadata.name == "startup"
+    assert restored.metadata.complexity == 3
+    assert restored.metadata.author == "dev"
+    assert restored.metadata.last_modified == datetime(2024, 5, 1, 12, 30)
+
+
+def test_chunker_metadata_is_flattened():
+    chunk = code_chunker.CodeChunk(
+        id="lib.js:10",
+        content="function f() {}",
+        type="function",
+        file_path="lib.js",
+        line_start=10,
+        line_end=10,
+        language="javascript",
+        repository="a-ui"
+    )
+    chunk.metadata.complexity = {"lines": 1, "characters": 15, "cyclomatic": 2}
+    chunk.metadata.git = {"author": "dev", "last_modified": None}
+
+    metadata = code_chunk_metadata(chunk)
+    assert metadata["complexity"] == 2
+    assert metadata["author"] == "dev"
+    assert None not in metadata.values()
+
+    restored = code_chunk_from_result(chunk.id, chunk.content, metadata)
+    assert restored.metadata.complexity == 2
+    assert restored.metadata.author == "dev"
+    assert restored.metadata.last_modified is None